@@ -0,0 +1,357 @@
+"""
+Parallel, resumable version of the El Mundo cleaning in cleaning_el_mundo.py
+(process_files) and deepseek.py (process_article): OCR correction with
+FLAN-T5, summary of the long articles, translation to English.
+
+The notebook loop extracts the whole zip, then runs every chunk of every file
+through the models one at a time. Here:
+
+- files are read straight from the zip, and reading, sentence chunking and
+  tokenizing the OCR prompts happen in a process pool;
+- each model stage runs on batches of chunks from many files at once, sorted
+  by length and padded only to the longest sequence of their batch;
+- every output is written to a temporary file and renamed into place, and a
+  manifest (one JSON line per finished file) lets a rerun skip what's done.
+
+CPU only by default (DEVICE=cuda to use a GPU). Run:
+    python el_mundo_pipeline.py --zip ./data/elmundo_chunked_es_page1_40years.zip --out ./cleaned_articles
+    python el_mundo_pipeline.py --zip ... --out ... --compare 20   # files/min against the serial loop
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+# 🔹 Models and generation settings (same as the notebook)
+OCR_MODEL = os.getenv("OCR_MODEL", "./flan-t5-small" if os.path.isdir("./flan-t5-small") else "google/flan-t5-small")
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "mrm8488/bert2bert_shared-spanish-finetuned-summarization")
+TRANSLATION_MODEL = os.getenv("TRANSLATION_MODEL", "Helsinki-NLP/opus-mt-es-en")
+DEVICE = os.getenv("DEVICE", "cpu")
+OCR_PROMPT = ("Este texto es de un periodico llamado 'El Mundo' y contiene noticias de Puerto Rico del siglo XX. "
+              "Corrige errores OCR en este texto español manteniendo nombres propios y formato: ")
+CHUNK_CHARS = 1000
+SUMMARY_MIN_WORDS = 750  # Only summarize long articles
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+# ========== Chunking (runs in the worker processes) ==========
+try:
+    from sentence_splitter import SentenceSplitter
+    _splitter = SentenceSplitter(language='es')
+    split_sentences = _splitter.split
+except ImportError:
+    def split_sentences(text):
+        return [s for s in re.split(r"(?<=[.!?])\s+", text) if s]
+
+
+def chunk_text(text, max_chars=CHUNK_CHARS):
+    """
+    Split text into chunks of whole sentences of about max_chars characters.
+    """
+    chunks, current, current_len = [], [], 0
+    for sentence in split_sentences(text):
+        if current and current_len + len(sentence) > max_chars:
+            chunks.append(" ".join(current))
+            current, current_len = [], 0
+        current.append(sentence)
+        current_len += len(sentence)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+_worker = {}
+
+
+def init_worker(zip_path, ocr_model):
+    from transformers import AutoTokenizer
+    _worker["zip"] = zipfile.ZipFile(zip_path)
+    _worker["tokenizer"] = AutoTokenizer.from_pretrained(ocr_model)
+
+
+def prepare_file(name):
+    """
+    Read one article from the zip, chunk it and tokenize the OCR prompts.
+
+    Returns:
+    tuple: (name, list of token id lists, one per chunk)
+    """
+    with _worker["zip"].open(name) as f:
+        text = f.read().decode('utf-8', errors='ignore')
+    chunks = chunk_text(text)
+    tokenizer = _worker["tokenizer"]
+    ids = tokenizer([OCR_PROMPT + chunk for chunk in chunks], max_length=512, truncation=True)["input_ids"]
+    return name, ids
+
+
+# ========== Batching ==========
+def length_batches(sequences, max_batch=16, max_tokens=4096):
+    """
+    Indices of the sequences grouped into batches of similar length (longest
+    first), at most max_batch sequences and max_tokens padded tokens each.
+    """
+    order = sorted(range(len(sequences)), key=lambda i: len(sequences[i]), reverse=True)
+    batches, batch = [], []
+    for i in order:
+        width = len(sequences[batch[0]]) if batch else len(sequences[i])
+        if batch and (len(batch) >= max_batch or width * (len(batch) + 1) > max_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def pad_batch(sequences, pad_id):
+    """
+    input_ids and attention_mask tensors padded to the longest sequence of the batch.
+    """
+    import torch
+    width = max(len(seq) for seq in sequences)
+    input_ids = torch.full((len(sequences), width), pad_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+    for row, seq in enumerate(sequences):
+        input_ids[row, :len(seq)] = torch.tensor(seq, dtype=torch.long)
+        attention_mask[row, :len(seq)] = 1
+    return input_ids, attention_mask
+
+
+class Stage:
+    """
+    One seq2seq model that generates for batches of token sequences.
+
+    Parameters:
+    model_name (str): Hugging Face model name or local folder.
+    generate_kwargs (dict): Arguments for model.generate (beams, lengths...).
+    max_batch (int), max_tokens (int): Batch limits (see length_batches).
+    """
+
+    def __init__(self, model_name, generate_kwargs, max_batch=16, max_tokens=4096):
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name).to(DEVICE).eval()
+        self.generate_kwargs = generate_kwargs
+        self.max_batch = max_batch
+        self.max_tokens = max_tokens
+
+    def tokenize(self, texts, max_length=512):
+        return self.tokenizer(texts, max_length=max_length, truncation=True)["input_ids"]
+
+    def generate(self, sequences):
+        """
+        Decoded outputs for a list of token id lists, in the same order.
+        """
+        import torch
+        outputs = [None] * len(sequences)
+        for batch in length_batches(sequences, self.max_batch, self.max_tokens):
+            input_ids, attention_mask = pad_batch([sequences[i] for i in batch], self.tokenizer.pad_token_id)
+            with torch.inference_mode():
+                generated = self.model.generate(
+                    input_ids=input_ids.to(DEVICE), attention_mask=attention_mask.to(DEVICE), **self.generate_kwargs
+                )
+            for i, text in zip(batch, self.tokenizer.batch_decode(generated, skip_special_tokens=True)):
+                outputs[i] = text
+        return outputs
+
+
+def load_stages(num_beams=3, max_batch=16):
+    """
+    The three model stages with the notebook's generation settings.
+    """
+    return {
+        "ocr": Stage(OCR_MODEL, {"max_length": 1024, "num_beams": num_beams}, max_batch),
+        "summary": Stage(SUMMARY_MODEL, {"max_length": 512, "min_length": 256, "num_beams": 4, "early_stopping": True},
+                         max_batch=max(1, max_batch // 4)),
+        "translation": Stage(TRANSLATION_MODEL, {"max_length": 600}, max_batch),
+    }
+
+
+# ========== Outputs and manifest ==========
+def output_name(name):
+    return f"cleaned_{os.path.basename(name)}"
+
+
+def write_atomic(path, text):
+    """
+    Write text to path through a temporary file in the same folder, so a crash
+    never leaves a half-written output.
+    """
+    folder = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_manifest(output_dir):
+    """
+    Names of the files already processed (listed in the manifest and with their output on disk).
+    """
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    done = set()
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # last line cut short by a crash
+                if os.path.exists(os.path.join(output_dir, entry["output"])):
+                    done.add(entry["file"])
+    return done
+
+
+def record_done(manifest, name, output, **info):
+    manifest.write(json.dumps({"file": name, "output": output, **info}, ensure_ascii=False) + "\n")
+    manifest.flush()
+    os.fsync(manifest.fileno())
+
+
+def article_names(zip_path):
+    with zipfile.ZipFile(zip_path) as zf:
+        return sorted(name for name in zf.namelist() if name.endswith('.txt'))
+
+
+# ========== Pipeline ==========
+def finish_files(files, stages):
+    """
+    Summary (long articles only) and translation of a group of corrected
+    files, batched across the files.
+
+    Parameters:
+    files (dict): name -> corrected chunks.
+
+    Returns:
+    dict: name -> English text.
+    """
+    names = list(files)
+    corrected = {name: "\n".join(files[name]) for name in names}
+    summaries = dict(corrected)
+    long_names = [name for name in names if len(corrected[name].split()) > SUMMARY_MIN_WORDS]
+    if long_names:
+        summary_stage = stages["summary"]
+        for name, summary in zip(long_names, summary_stage.generate(summary_stage.tokenize([corrected[n] for n in long_names]))):
+            summaries[name] = summary
+    translation_stage = stages["translation"]
+    translated = translation_stage.generate(translation_stage.tokenize([summaries[name] for name in names]))
+    return dict(zip(names, translated))
+
+
+def run_pipeline(zip_path, output_dir, stages, workers=None, files_per_group=32, limit=None):
+    """
+    Process every article in the zip that isn't in the manifest yet.
+
+    Parameters:
+    files_per_group (int): Files whose chunks are batched together per stage.
+    limit (int): Only process the first `limit` pending files.
+
+    Returns:
+    int: Number of files processed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    done = load_manifest(output_dir)
+    pending = [name for name in article_names(zip_path) if name not in done]
+    if limit is not None:
+        pending = pending[:limit]
+    print(f"{len(done)} files already done, {len(pending)} to process")
+
+    ocr_stage = stages["ocr"]
+    processed = 0
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'a', encoding='utf-8') as manifest, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(zip_path, OCR_MODEL)) as pool:
+        groups = [pending[i:i + files_per_group] for i in range(0, len(pending), files_per_group)]
+        prepared = pool.map(prepare_file, groups[0], chunksize=4) if groups else None
+        for index in range(len(groups)):
+            group = list(prepared)
+            if index + 1 < len(groups):
+                # The workers read and tokenize the next group while the models run on this one
+                prepared = pool.map(prepare_file, groups[index + 1], chunksize=4)
+            start = time.perf_counter()
+
+            # OCR correction of every chunk of the group in one pass of batches
+            sequences = [ids for _, chunks in group for ids in chunks]
+            corrected = iter(ocr_stage.generate(sequences) if sequences else [])
+            files = {name: [next(corrected) for _ in chunks] for name, chunks in group}
+
+            for name, text in finish_files(files, stages).items():
+                output = output_name(name)
+                write_atomic(os.path.join(output_dir, output), text)
+                record_done(manifest, name, output, chunks=len(files[name]))
+            processed += len(group)
+            print(f"Processed {processed}/{len(pending)} files ({len(group)} in {time.perf_counter() - start:.1f} s)")
+    return processed
+
+
+def run_serial(zip_path, output_dir, stages, limit=None):
+    """
+    The notebook's loop (one file, one chunk at a time) with the same models,
+    for the throughput comparison.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    names = article_names(zip_path)[:limit]
+    with zipfile.ZipFile(zip_path) as zf:
+        for name in names:
+            text = zf.read(name).decode('utf-8', errors='ignore')
+            corrected = [stages["ocr"].generate(stages["ocr"].tokenize([OCR_PROMPT + chunk]))[0] for chunk in chunk_text(text)]
+            translated = finish_files({name: corrected}, stages)[name]
+            with open(os.path.join(output_dir, output_name(name)), 'w', encoding='utf-8') as f:
+                f.write(translated)
+    return len(names)
+
+
+def compare(zip_path, stages, n_files, workers=None):
+    """
+    Print files per minute of the serial loop and of the pipeline on the same files.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, run in [
+            ("serial loop", lambda out: run_serial(zip_path, out, stages, limit=n_files)),
+            ("pipeline", lambda out: run_pipeline(zip_path, out, stages, workers=workers, limit=n_files)),
+        ]:
+            start = time.perf_counter()
+            count = run(os.path.join(tmp, label.replace(" ", "_")))
+            minutes = (time.perf_counter() - start) / 60
+            rows.append((label, count, minutes * 60, count / minutes if minutes else float('nan')))
+    print(f"\n{'run':<12} {'files':>6} {'seconds':>9} {'files/min':>10}")
+    for label, count, seconds, rate in rows:
+        print(f"{label:<12} {count:>6} {seconds:>9.1f} {rate:>10.2f}")
+    print(f"speed-up: {rows[1][3] / rows[0][3]:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zip", default="./data/elmundo_chunked_es_page1_40years.zip")
+    parser.add_argument("--out", default="./cleaned_articles")
+    parser.add_argument("--workers", type=int, default=None, help="processes for reading and tokenizing")
+    parser.add_argument("--batch", type=int, default=16, help="sequences per generate() call")
+    parser.add_argument("--beams", type=int, default=3, help="beams of the OCR correction")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--compare", type=int, default=None, metavar="N",
+                        help="time the serial loop and the pipeline on the first N files")
+    args = parser.parse_args()
+
+    import torch
+    torch.set_num_threads(os.cpu_count() or 1)
+    stages = load_stages(num_beams=args.beams, max_batch=args.batch)
+    if args.compare:
+        compare(args.zip, stages, args.compare, workers=args.workers)
+    else:
+        run_pipeline(args.zip, args.out, stages, workers=args.workers, limit=args.limit)
+        print(f"\nAll cleaned files saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
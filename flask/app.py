@@ -1,13 +1,32 @@
 from dotenv import load_dotenv
 import os
+import copy
 from flask import Flask, render_template, request
 import openai
-from langchain_huggingface.embeddings import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
 import datetime
-from chatbot_funcs import get_weather
-from flask import session
-import pickle
+import chatbot_funcs
+from chatbot_funcs import get_weather, get_forecast_service, validate_date
+from flask import session, Response, stream_with_context
+import uuid
+from llm_cache import ResponseCache, MISS
+from weather_flags import WeatherFlags
+from intent_classifier import ConfirmIntentClassifier
+from session_store import make_session_store
+from landmarks import location_id, landmark_document
+from history import HistoryManager
+from vector_index import make_vector_store
+from embedding_cache import CachedEmbeddings
+from onnx_embeddings import load_embeddings
+from resources import ResourceRegistry
+from keyword_index import HybridRetriever, get_keyword_index, rrf_fuse
+from geo_index import location_coordinates, municipality_coordinates, nearby_first
+from itinerary import build_itinerary
+from name_resolver import get_name_resolver
+from interest_tables import InterestTables
+from date_parser import only_dates, parse_dates
+import telemetry
+from telemetry import Traced, TracedLLMClient
+from llm_gateway import LLMUnavailable, make_gateway
 
 app = Flask(__name__)
 ######################
@@ -17,25 +36,87 @@ load_dotenv('../.env')
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
 from openai import OpenAI
-client = OpenAI(
-    api_key=OPENAI_API_KEY
+
+# Heavy resources are built on first use (see resources.py); the names below are
+# lazy stand-ins, so importing this module and serving "/" take milliseconds.
+resources = ResourceRegistry()
+# LLM calls, searches and session I/O are timed by telemetry.py (see /metrics and /trace/<request_id>).
+# Every LLM call goes through the gateway (llm_gateway.py): concurrency limit, deadline, retries,
+# circuit breaker and single-flight, so the OpenAI client's own retries are off.
+resources.register("client", lambda: TracedLLMClient(make_gateway(OpenAI(api_key=OPENAI_API_KEY, max_retries=0))))
+# The SentenceTransformer embeddings: the pickled HuggingFaceEmbeddings,
+# or all-MiniLM-L6-v2 on ONNX Runtime with EMBEDDINGS_BACKEND=onnx (see onnx_embeddings.py).
+# They sit behind a query-vector cache that also batches concurrent encodes (embedding_cache.py).
+resources.register("embeddings", lambda: CachedEmbeddings(
+    load_embeddings(),
+    max_entries=int(os.getenv("EMBED_CACHE_SIZE", "4096")),
+    batch_window_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")),
+))
+# Chroma by default, or the in-process numpy index with VECTOR_BACKEND=numpy.
+# Landmark searches are fused with BM25 keyword results (keyword_index.py); HYBRID_SEARCH=0 turns that off.
+def make_db():
+    store = make_vector_store(resources.get("embeddings"), persist_directory='../chroma_db')
+    if os.getenv("HYBRID_SEARCH", "1") == "1":
+        store = HybridRetriever(store, get_keyword_index())
+    return Traced(store, {"similarity_search": "retrieval"})
+
+resources.register("db", make_db)
+# Resources /get needs before the worker reports ready
+READY_RESOURCES = ["client", "embeddings", "db"]
+
+client = resources.proxy("client")
+sentence_transformer_embeddings = resources.proxy("embeddings")
+db = resources.proxy("db")
+rag_response = None
+
+# Cache for the short JSON answers of gpt_extract_info and confirm_action.
+# Set LLM_CACHE_SEMANTIC=1 to also match near-duplicate inputs by embedding similarity
+# (extracted interests only: yes/no answers and dates need the exact input, see llm_cache.SEMANTIC_STEPS).
+llm_cache = ResponseCache(
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+    embeddings=sentence_transformer_embeddings if os.getenv("LLM_CACHE_SEMANTIC") == "1" else None,
 )
+# Precomputed weather-dependence flags for every landmark (built by weather_flags.py,
+# or in the background on first start when the table is missing)
+weather_flags = WeatherFlags()
+if os.getenv("WEATHER_FLAGS_BUILD", "1") == "1":
+    weather_flags.build_in_background(client)
+# Ranked landmarks for common interests like beaches or forts (built by interest_tables.py)
+interest_tables = InterestTables()
+# Local yes/no classifier, so plain "yes"/"no thanks" replies skip the LLM
+intent_classifier = ConfirmIntentClassifier(embeddings=sentence_transformer_embeddings)
+# Keeps chat() prompts within a token budget by folding old turns into a summary
+history_manager = HistoryManager(
+    client,
+    budget_tokens=int(os.getenv("HISTORY_BUDGET_TOKENS", "2000")),
+    keep_turns=int(os.getenv("HISTORY_KEEP_TURNS", "4")),
+)
+# Set SINGLE_SHOT=1 to extract the fields and write the reply in one LLM call per turn
+SINGLE_SHOT = os.getenv("SINGLE_SHOT") == "1"
+# Set WEATHER_PREFETCH=1 to keep every municipality's forecast warm in the background
+if os.getenv("WEATHER_PREFETCH") == "1":
+    get_forecast_service(WEATHER_API_KEY).start_background_prefetch()
 
-# Initialize the SentenceTransformer embeddings
-with open ('sentence_transformer_embeddings.pkl', 'rb') as f:
-    sentence_transformer_embeddings = pickle.load(f)
-# print("Initialized SentenceTransformer embeddings.")
 
-# print("\nLoading database...")
-db = Chroma(persist_directory='../chroma_db', embedding_function=sentence_transformer_embeddings)
-rag_response = None
+def warm_up_queries():
+    """
+    First queries after loading, so the model weights and the index are paged in
+    before the worker reports ready.
+    """
+    db.similarity_search("beaches", k=1, filter={'source': 'landmarks'})
+    intent_classifier.nearest_centroid("sounds good to me")
+
+
+# Load the model and the index in the background at boot (WARM_UP=0 to load them on first use)
+if os.getenv("WARM_UP", "1") == "1":
+    resources.warm_up(READY_RESOURCES, after=warm_up_queries)
 
 #
 import json
-def gpt_extract_info(user_input, current_step, conversation_state):
+def extract_info_prompt(user_input, current_step, conversation_state):
     """
-    Extract multiple pieces of information from the user's input.
-    For example, dates, interests, locations, and questions.
+    Build the extraction prompt for gpt_extract_info (shared with async_app.py).
     """
     if current_step == "start":
         prompt = f"""
@@ -75,8 +156,93 @@ def gpt_extract_info(user_input, current_step, conversation_state):
         If they accept, return a JSON like this {{'user_decision': 'accept'}}. If they decline, return a JSON like this {{'user_decision': 'decline'}}.
         User input: {user_input}"""
 
+    return prompt
+
+
+def extract_cache_step(current_step):
+    """
+    Cache step for gpt_extract_info answers, or None if the answer can't be cached.
+    """
+    if current_step == "received_location":
+        # The prompt includes the last messages, so the same input can mean different places
+        return None
+    if current_step == "start":
+        # Relative dates ("tomorrow") depend on today's date
+        return f"start:{datetime.date.today()}"
+    return current_step
+
+
+def location_name(location):
+    """
+    Short name of a location dict (landmark or municipality) or a plain name.
+    """
+    if isinstance(location, dict):
+        metadata = location.get("metadata", {})
+        return metadata.get("landmark") or metadata.get("municipality") or str(location)
+    return str(location)
+
+
+def local_extract_info(user_input, current_step):
+    """
+    Answer gpt_extract_info locally when possible, or return None to ask GPT.
+    """
+    if current_step == "start":
+        # Only dates ("March 15-18", "este fin de semana"): parse them here
+        if only_dates(user_input):
+            return {"travel_dates": parse_dates(user_input), "interests": None}
+    elif current_step == "ask_accept_location":
+        decision = intent_classifier.classify(user_input, current_step)
+        if decision is not None:
+            return {"user_decision": "accept" if decision else "decline"}
+    elif current_step == "received_location":
+        # The user wrote a landmark or municipality name: no need to ask GPT to pull it out
+        match = get_name_resolver().find(user_input)
+        if match is not None:
+            return {"current_location": match.name, "landmark_id": match.id if match.source == "landmarks" else None}
+    return None
+
+
+def with_local_dates(user_input, detected_info):
+    """
+    Extracted info with the travel dates the local parser finds in the input, if any
+    (they are exact, while the LLM sometimes gets the year or a relative day wrong).
+    """
+    dates = parse_dates(user_input)
+    if dates:
+        detected_info = dict(detected_info, travel_dates=dates)
+    return detected_info
+
+
+def set_travel_dates(conversation_state, travel_dates):
+    """
+    Save the travel dates and flag the ones the weather forecast doesn't cover.
+    """
+    conversation_state["travel_dates"] = travel_dates
+    conversation_state["dates_outside_forecast"] = [
+        date for date in travel_dates or [] if validate_date(str(date)) is None
+    ]
+    return conversation_state
+
+
+def gpt_extract_info(user_input, current_step, conversation_state):
+    """
+    Extract multiple pieces of information from the user's input.
+    For example, dates, interests, locations, and questions.
+    """
+    local_info = local_extract_info(user_input, current_step)
+    if local_info is not None:
+        return local_info
+
+    cache_step = extract_cache_step(current_step)
+    if cache_step is not None:
+        cached = llm_cache.get("gpt_extract_info", cache_step, user_input)
+        if cached is not MISS:
+            return dict(cached)
+
+    prompt = extract_info_prompt(user_input, current_step, conversation_state)
 
     response = client.chat.completions.create(
+        span_name="gpt_extract_info",
         model="gpt-4o-mini",
         messages=[{
             'role': 'user', 
@@ -92,24 +258,40 @@ def gpt_extract_info(user_input, current_step, conversation_state):
     gpt_response=json.loads(response.choices[0].message.content)
     
     print("inside gpt_extract_info")
+    if cache_step is not None:
+        llm_cache.put("gpt_extract_info", cache_step, user_input, gpt_response)
     
     return gpt_response
 
 
 
 #
-def is_weather_dependent(location):
+def weather_dependent_prompt(location):
     """
-    Ask GPT whether a location is weather dependent or not.
+    Build the prompt for is_weather_dependent (shared with async_app.py).
     """
-    prompt = f"""Is the location '{location}' highly dependent on weather conditions? (e.g., outdoor activities, beach, hiking). 
+    return f"""Is the location '{location}' highly dependent on weather conditions? (e.g., outdoor activities, beach, hiking). 
     For example, if the location is El Morrow, the model should return True. If its a museum, the model should return False.
     Return a JSON object with the key 'weather_dependent' and the boolean values of True (for highly dependant) or False (for not highly dependant).
     
     Once again: is the location '{location}' highly dependent on weather conditions?"""
 
-    
+
+def is_weather_dependent(location):
+    """
+    Ask GPT whether a location is weather dependent or not.
+    Known landmarks are looked up in the precomputed table; GPT is only asked
+    about unknown places, and its answer is remembered.
+    """
+    name = location_name(location)
+    flag = weather_flags.get(name)
+    if flag is not None:
+        return flag
+
+    prompt = weather_dependent_prompt(name)
+
     response = client.chat.completions.create(
+        span_name="is_weather_dependent",
         model="gpt-4o-mini",
         messages=[{
             'role': 'user', 
@@ -124,20 +306,44 @@ def is_weather_dependent(location):
     
     gpt_response=json.loads(response.choices[0].message.content)
     print("inside is_weather_dependent")
+    weather_flags.remember(name, gpt_response['weather_dependent'])
     return gpt_response['weather_dependent']
 
 
 #
+def weather_location(location):
+    """
+    Get the municipality to ask the weather API for, from a location dict
+    (as stored in conversation_state["current_location"]) or a plain name.
+    """
+    if isinstance(location, dict):
+        return location.get("metadata", {}).get("municipality", "San Juan")
+    return str(location)
+
+
+def bad_weather_prompt(weather):
+    """
+    Build the prompt for check_weather (shared with async_app.py).
+    """
+    return f"""You will tell me if the weather will be bad for outside activities. Respond in JSON format, with key "bad_weather" and boolean value.
+        The temperature will be of {weather['temp']['value']} deg Farenheit. The humidity level is of {weather["humidity"]['value']}%. 
+        A brief description of the weather is: {weather['weather']}."""
+
+
 def check_weather(location, travel_dates):
     """
     Ask GPT or an API to check the weather for the given location and travel dates.
     """
-    weather = get_weather(str(location), str(travel_dates[0]))
+    if not travel_dates:
+        return False
+    weather = get_weather(str(travel_dates[0]), weather_location(location), WEATHER_API_KEY)
     print(weather)
-    prompt = f"""You will tell me if the weather will be bad for outside activities. Respond in JSON format, with key "bad_weather" and boolean value.
-        The temperature will be of {weather['temp']['value']} deg Farenheit. The humidity level is of {weather["humidity"]['value']}%. 
-        A brief description of the weather is: {weather['weather']}."""
+    if isinstance(weather, str):
+        # No forecast for that date (or the API failed), so we can't warn the user
+        return False
+    prompt = bad_weather_prompt(weather)
     response = client.chat.completions.create(
+        span_name="check_weather",
         model="gpt-4o-mini",
         messages=[{
             'role': 'user', 
@@ -155,20 +361,44 @@ def check_weather(location, travel_dates):
 
 
 #
-def confirm_action(user_input, current_step):
+def confirm_action_prompt(user_input, current_step):
     """
-    Use GPT to detect if the user confirms or rejects an action.
-    For example, locking a location or proceeding with a decision.
+    Build the prompt for confirm_action (shared with async_app.py).
     """
-    print("inside confirm_action")
     if current_step == 'ask_lock_location' or current_step == 'lock_or_change':
         prompt = f""" The user was asked if they want to lock the location. Based on their input: '{user_input}', does the user want to lock the location?"""
     elif current_step == "end_or_suggest_alternatives":
         prompt = f""" The user was asked if they want to add another visit. Based on their input: '{user_input}', does the user want to add another visit?"""
 
     prompt += "Return a JSON object with the key 'confirm' and the boolean values of True (for confirmation) or False (for rejection)."
+    return prompt
+
+
+def confirm_action(user_input, current_step):
+    """
+    Use GPT to detect if the user confirms or rejects an action.
+    For example, locking a location or proceeding with a decision.
+    """
+    print("inside confirm_action")
+    # Clear "yes"/"no" replies are classified locally; only ambiguous ones go to GPT
+    decision = intent_classifier.classify(user_input, current_step)
+    if decision is not None:
+        return decision
+    return gpt_confirm_action(user_input, current_step)
+
+
+def gpt_confirm_action(user_input, current_step):
+    """
+    The GPT path of confirm_action.
+    """
+    cached = llm_cache.get("confirm_action", current_step, user_input)
+    if cached is not MISS:
+        return cached
+
+    prompt = confirm_action_prompt(user_input, current_step)
 
     response = client.chat.completions.create(
+        span_name="gpt_confirm_action",
         model="gpt-4o-mini",
         messages=[{
             'role': 'user', 
@@ -182,6 +412,7 @@ def confirm_action(user_input, current_step):
     )
 
     gpt_response = json.loads(response.choices[0].message.content)
+    llm_cache.put("confirm_action", current_step, user_input, gpt_response['confirm'])
     return gpt_response['confirm']
 
 
@@ -189,13 +420,15 @@ def confirm_action(user_input, current_step):
 # # Bot
 
 #
-def orchestrator(user_input, current_step, conversation_state):
+def orchestrator(user_input, current_step, conversation_state, extracted=None):
     """
     Orchestrates the conversation based on the current step and user input.
 
     Parameters:
     user_input (str): The input from the user.
     current_step (str): The current step in the conversation.
+    extracted (dict): Fields already extracted from the user input (single-shot
+        mode). When given, the extraction/confirmation LLM calls are skipped.
 
     Returns:
     str: The next step in the conversation.
@@ -204,15 +437,16 @@ def orchestrator(user_input, current_step, conversation_state):
     if current_step == "start":
         
         # Get user input and check for details
-        detected_info = gpt_extract_info(user_input, current_step, conversation_state)  ### fix gpt response format
+        detected_info = extracted or gpt_extract_info(user_input, current_step, conversation_state)  ### fix gpt response format
+        detected_info = with_local_dates(user_input, detected_info)
 
         if detected_info["travel_dates"] and detected_info["interests"]:  # If both dates and interests are detected
-            conversation_state["travel_dates"] = detected_info["travel_dates"]
+            set_travel_dates(conversation_state, detected_info["travel_dates"])
             conversation_state["interests"] = detected_info["interests"]
             return "suggest_locations", conversation_state
         
         elif detected_info["travel_dates"]:  # If only dates are detected
-            conversation_state["travel_dates"] = detected_info["travel_dates"]
+            set_travel_dates(conversation_state, detected_info["travel_dates"])
             return "ask_interests", conversation_state
         
         elif detected_info["interests"]:  # If only interests are detected
@@ -221,6 +455,12 @@ def orchestrator(user_input, current_step, conversation_state):
         return "ask_travel_dates", conversation_state
     
     elif current_step == "received_dates":
+        # The answer to "when are you travelling?"
+        travel_dates = parse_dates(user_input)
+        if travel_dates is None:
+            travel_dates = gpt_extract_info(user_input, "start", conversation_state).get("travel_dates")
+        if travel_dates:
+            set_travel_dates(conversation_state, travel_dates)
 
         if conversation_state.get("interests"):
             # If interests are already detected, suggest locations
@@ -231,7 +471,7 @@ def orchestrator(user_input, current_step, conversation_state):
     
     elif current_step == "received_interests":
         # save interests
-        detected_info = gpt_extract_info(user_input, current_step, conversation_state)              ######### fix gpt response format
+        detected_info = extracted or gpt_extract_info(user_input, current_step, conversation_state)              ######### fix gpt response format
         conversation_state["interests"] = detected_info["interests"]
 
         # Now suggest locations based on interests
@@ -240,10 +480,14 @@ def orchestrator(user_input, current_step, conversation_state):
     elif current_step == "received_location":
     # Extract current location or confirm the last suggested one
                 ################## here
-        curr_loc = gpt_extract_info(user_input, current_step, conversation_state)
+        curr_loc = extracted or gpt_extract_info(user_input, current_step, conversation_state)
+        if curr_loc.get('landmark_id'):
+            # Exact landmark name in the input: take it as is
+            conversation_state["current_location"] = landmark_document(curr_loc['landmark_id'])
+            return "ask_accept_location", conversation_state
         curr_loc=(str(curr_loc['current_location'])+" "+conversation_state['interests'])
         print(curr_loc)
-        current_location = db.similarity_search(curr_loc, k=1, filter={'source':'landmark'})
+        current_location = db.similarity_search(curr_loc, k=1, filter={'source':'landmarks'})
         if current_location:
             # Convert the first Document to a dictionary
             conversation_state["current_location"] = {
@@ -252,17 +496,14 @@ def orchestrator(user_input, current_step, conversation_state):
             }
         # current_location = gpt_extract_info(user_input, current_step, conversation_state)
         
-        if current_location:
-            conversation_state["current_location"] = current_location
-        
         # Ask if the user accepts the suggested location
         return "ask_accept_location", conversation_state
 
     elif current_step == "ask_accept_location":
         # Extract user's decision (accept or decline)
-        user_decision = gpt_extract_info(user_input, current_step, conversation_state)
+        user_decision = extracted or gpt_extract_info(user_input, current_step, conversation_state)
         
-        if user_decision == "accept":
+        if user_decision.get("user_decision") == "accept":
             # Move forward to lock the location or ask for further details
             return "lock_location", conversation_state
         else:
@@ -273,7 +514,7 @@ def orchestrator(user_input, current_step, conversation_state):
         #after answering questions, ask if user wants to lock in location
 
         ################################
-        want_to_lock = confirm_action(user_input, current_step) ######### fix gpt response format
+        want_to_lock = extracted["confirm"] if extracted else confirm_action(user_input, current_step) ######### fix gpt response format
 
         #we asked if "they want to go there." if they say yes, we lock in location (temporarily)
         
@@ -285,8 +526,7 @@ def orchestrator(user_input, current_step, conversation_state):
                 bad_weather = check_weather(conversation_state["current_location"], conversation_state["travel_dates"]) # fix gpt response format
                 if bad_weather:
                     return "bad_weather", conversation_state
-            else:
-                return "lock_location", conversation_state
+            return "lock_location", conversation_state
         # if they say no, we suggest other locations
         else:
             #suggest locations
@@ -294,7 +534,7 @@ def orchestrator(user_input, current_step, conversation_state):
             # return "suggest_alternatives" , conversation_state# create new step for this"
     elif current_step == "lock_or_change":
         # there was bad weather and we asked the user if they wanted to lock the location.
-        want_to_lock = confirm_action(user_input, current_step)           #########fix gpt response format
+        want_to_lock = extracted["confirm"] if extracted else confirm_action(user_input, current_step)           #########fix gpt response format
         if want_to_lock:
             conversation_state["locked_locations"].append(conversation_state["current_location"])
             return "lock_location", conversation_state
@@ -307,7 +547,7 @@ def orchestrator(user_input, current_step, conversation_state):
     
     elif current_step == "end_or_suggest_alternatives":
         # we asked the user if the would like to go anywhere else
-        want_to_go = confirm_action(user_input, current_step)           #########fix gpt response format
+        want_to_go = extracted["confirm"] if extracted else confirm_action(user_input, current_step)           #########fix gpt response format
         if want_to_go:
             return "suggest_locations", conversation_state
         else:
@@ -323,7 +563,10 @@ def orchestrator(user_input, current_step, conversation_state):
 
 
 #
-def chat(user_input, instructions ,conversation_state, rag_response = None):
+def chat_messages(user_input, instructions, conversation_state, rag_response = None):
+    """
+    Build the message list sent by chat (shared with async_app.py).
+    """
     prompt= f"""
         You are a bot that helps with tourism in Puerto Rico. The user said {user_input}.
         This are some basic instructions for you, to answer to the user {instructions}.
@@ -332,99 +575,223 @@ def chat(user_input, instructions ,conversation_state, rag_response = None):
     if rag_response:
         prompt += f"Use these RAGs we have for answering: {rag_response}"
         
-    message_history = conversation_state.get("messages", [])
+    # Summary of older turns + the last few turns verbatim, instead of the whole history
+    message_history = history_manager.prompt_history(conversation_state)
     messages = message_history + [{"role": "user", "content": prompt}]
+    history_manager.report(conversation_state, messages)
+    return messages
+
+
+def chat(user_input, instructions ,conversation_state, rag_response = None):
+    conversation_state = history_manager.compact(conversation_state)
+    messages = chat_messages(user_input, instructions, conversation_state, rag_response)
     response = client.chat.completions.create(
+        span_name="chat",
         model="gpt-4o-mini",
         messages=messages,
         max_tokens=500,
         temperature=1
     )
     print("inside chat")
+    if response.usage:
+        # Exact count from the API
+        conversation_state["last_prompt_tokens"] = response.usage.prompt_tokens
 
     return response.choices[0].message.content
 
+
+def chat_stream(user_input, instructions, conversation_state, rag_response = None):
+    """
+    Same as chat, but yields the reply's tokens as the model produces them.
+    """
+    conversation_state = history_manager.compact(conversation_state)
+    messages = chat_messages(user_input, instructions, conversation_state, rag_response)
+    stream = client.chat.completions.create(
+        span_name="chat_stream",
+        model="gpt-4o-mini",
+        messages=messages,
+        max_tokens=500,
+        temperature=1,
+        stream=True
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+# Instructions for the actions whose reply doesn't depend on retrieval or on the state
+ACTION_INSTRUCTIONS = {
+    "ask_travel_dates": "ask for the users travel dates",
+    "ask_interests": "Ask what kind of places do you they want to visit, like beaches, museums or other you want to say",
+    "bad_weather": "Inform the user that the weather is bad for their travel dates and ask if they still want to proceed with the location.",
+    "lock_location": "Confirm that you've locked the selected location for their trip and ask if they want to choose more locations.",
+    "suggest_alternatives": "Suggest alternative locations the user might be interested in if the previous location wasn't a good fit.",
+    "end_conversation": "Thank the user and wish them a great trip. Prepare to end the conversation.",
+}
+
 #
-def communicator(orchestrator_action, user_input, conversation_state):
+def named_municipality(user_input):
     """
-    Communicates with the user based on the orchestrator's action.
+    Name of the municipality mentioned in the input ("beaches near Fajardo"), or None.
+    """
+    match = get_name_resolver().find_in_text(user_input, sources={"municipalities"})
+    return match.name if match is not None else None
+
+
+def suggestion_anchors(user_input, conversation_state):
+    """
+    (lat, lon) points suggestions should be near: a municipality named in the
+    input ("beaches near Fajardo"), otherwise the locations already locked.
+    """
+    municipality = named_municipality(user_input)
+    if municipality is not None:
+        coordinates = municipality_coordinates(municipality)
+        if coordinates is not None:
+            return [coordinates]
+    anchors = [location_coordinates(location) for location in conversation_state.get("locked_locations", [])]
+    return [anchor for anchor in anchors if anchor is not None]
+
+
+def interest_suggestions(user_input, conversation_state, k):
+    """
+    Up to k location dicts for the user's interests. Known categories (beaches,
+    hiking, museums, forts, caves, food) come from the precomputed tables,
+    without a vector query; ad-hoc interests go to the vector search, whose
+    results are fused with the tables' lists.
+    """
+    categories, ad_hoc = interest_tables.categorize(conversation_state.get("interests"))
+    rankings = interest_tables.rankings(categories, named_municipality(user_input))
+    if not rankings or ad_hoc:
+        found = db.similarity_search(user_input, k=k, filter={'source': 'landmarks'})
+        searched = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in found]
+        if not rankings:
+            telemetry.count("chatbot_suggestions_total", source="vector")
+            return searched
+        searched_by_id = {location_id(location): location for location in searched if location_id(location)}
+        rankings.append(list(searched_by_id))
+    else:
+        searched_by_id = {}
+    telemetry.count("chatbot_suggestions_total", source="tables+vector" if ad_hoc else "tables")
+    return [searched_by_id.get(landmark_id) or landmark_document(landmark_id)
+            for landmark_id in rrf_fuse(rankings)[:k]]
+
+
+def plan_response(orchestrator_action, user_input, conversation_state):
+    """
+    Decide what the bot should say for the orchestrator's action, running any
+    retrieval it needs, without calling the LLM yet.
 
     Parameters:
     orchestrator_action (str): The action recommended by the orchestrator.
     user_input (str): The input from the user.
 
     Returns:
-    str: The response to the user.
+    tuple: (instructions, rag_response) to pass to chat.
     """
-    response = ""
+    rag_response = None
 
     if orchestrator_action == "ask_travel_dates":
         # Use GPT-4o-mini to rephrase the question
-        response= chat(user_input, "ask for the users travel dates", conversation_state)
+        instructions = ACTION_INSTRUCTIONS["ask_travel_dates"]
     elif orchestrator_action == "ask_interests":
         # GPT-4o-mini rephrasing
-        response= chat(user_input, "Ask what kind of places do you they want to visit, like beaches, museums or other you want to say", conversation_state)
+        instructions = ACTION_INSTRUCTIONS["ask_interests"]
 
     elif orchestrator_action == "ask_accept_location":
     # Rephrase the question to the user asking if they want to visit the current location
         current_location = conversation_state.get("current_location", "the suggested location")
-        response = chat(user_input, f"Do you want to visit {current_location}? Please answer 'yes' or 'no'.", conversation_state)
+        instructions = f"Do you want to visit {current_location}? Please answer 'yes' or 'no'."
         
 
     elif orchestrator_action == "suggest_locations":
         # Suggest locations based on interests (USE RAG)
+        anchors = suggestion_anchors(user_input, conversation_state)
         if not conversation_state.get("suggested_locations"):
-            rag_response = db.similarity_search(user_input, k=7, filter={'source': 'landmarks'})
-            # Convert Document objects to dictionaries
-            serialized_locations = [
-                {"page_content": doc.page_content, "metadata": doc.metadata}
-                for doc in rag_response
-            ]
-            conversation_state["suggested_locations"] = serialized_locations
+            # Take more candidates when they'll be filtered by distance
+            serialized_locations = interest_suggestions(user_input, conversation_state, k=25 if anchors else 7)
+            conversation_state["suggested_locations"] = nearby_first(serialized_locations, anchors)[:7]
            # 
         else:
             # Remove the current location from the list if declined
             current_location = conversation_state.get("current_location")
-            conversation_state["suggested_locations"] = [
-                loc for loc in conversation_state["suggested_locations"] if loc != current_location
-            ]
+            current_id = location_id(current_location)
+            conversation_state["suggested_locations"] = nearby_first([
+                loc for loc in conversation_state["suggested_locations"]
+                if loc != current_location and (current_id is None or location_id(loc) != current_id)
+            ], anchors)
         
         # GPT-4o-mini rephrasing to suggest locations based on RAG
-        response = chat(user_input, "Here is another location you might like: (description of first from RAG). Would you like to visit this one?", conversation_state)
+        instructions = "Here is another location you might like: (description of first from RAG). Would you like to visit this one?"
             
    
 
     elif orchestrator_action == "answer_questions":
         # Answer questions about the location
-        info = db.similarity_search(user_input) 
-        response = chat(user_input, f"Answer the user's questions about (or simply give info) {conversation_state['current_location']}, and ask if they want to visit.", conversation_state, info)
+        rag_response = db.similarity_search(user_input) 
+        instructions = f"Answer the user's questions about (or simply give info) {conversation_state['current_location']}, and ask if they want to visit."
     elif orchestrator_action == "bad_weather":
         # Inform user about bad weather
-        response = chat(user_input, "Inform the user that the weather is bad for their travel dates and ask if they still want to proceed with the location.", conversation_state)
+        instructions = ACTION_INSTRUCTIONS["bad_weather"]
     elif orchestrator_action == "lock_location":
         # Lock the location
                 ####### here
         conversation_state["locked_locations"].append(conversation_state["current_location"]) 
-        response = chat(user_input, "Confirm that you've locked the selected location for their trip and ask if they want to choose more locations.", conversation_state)
+        instructions = ACTION_INSTRUCTIONS["lock_location"]
     elif orchestrator_action == "suggest_alternatives":
         # Suggest alternative locations
-        response = chat(user_input, "Suggest alternative locations the user might be interested in if the previous location wasn't a good fit.", conversation_state)
+        instructions = ACTION_INSTRUCTIONS["suggest_alternatives"]
     elif orchestrator_action == "end_conversation":
         # End the conversation
-        response = chat(user_input, "Thank the user and wish them a great trip. Prepare to end the conversation.", conversation_state)
+        instructions = ACTION_INSTRUCTIONS["end_conversation"]
     elif orchestrator_action == "give_list":
-        # Provide the list of locked locations
-        lst = str(conversation_state.get("locked_locations", []))
-        response = chat(user_input, f"Give the user a list of the locations they have locked in for their trip. The locked locations are {lst}", conversation_state)
+        # Provide the locked locations as a day-by-day itinerary (see itinerary.py)
+        plan = build_itinerary(conversation_state.get("locked_locations", []), conversation_state.get("travel_dates"))
+        instructions = (
+            "Give the user the itinerary of the locations they have locked in for their trip, day by day and in "
+            "this order, mentioning the driving distances. Mention any place without a known position at the end. "
+            f"Itinerary (JSON): {json.dumps(plan, ensure_ascii=False)}"
+        )
     else:
         # Default fallback
-        response = chat(user_input, "I'm not sure how to respond to this action. Ask for clarification from the user.", conversation_state)
-    
+        instructions = "I'm not sure how to respond to this action. Ask for clarification from the user."
+
+    outside_forecast = conversation_state.pop("dates_outside_forecast", None)
+    if outside_forecast:
+        # Said once, right after the dates are given
+        instructions += (
+            f" Also mention briefly that the weather forecast only covers the next 5 days, so the weather "
+            f"can't be checked yet for {', '.join(map(str, outside_forecast))}."
+        )
+
+    return instructions, rag_response
+
+
+def record_turn(orchestrator_action, user_input, response, conversation_state):
+    """
+    Append the user's input and the bot's reply to the message history.
+    """
     conversation_state["messages"].append({'role':"user", "content": user_input})
     conversation_state["messages"].append({'role':"system", "content": response})
 
     print(f"orchestrator_action: {orchestrator_action}")
 
+    return conversation_state
+
+
+def communicator(orchestrator_action, user_input, conversation_state):
+    """
+    Communicates with the user based on the orchestrator's action.
+
+    Parameters:
+    orchestrator_action (str): The action recommended by the orchestrator.
+    user_input (str): The input from the user.
+
+    Returns:
+    str: The response to the user.
+    """
+    instructions, rag_response = plan_response(orchestrator_action, user_input, conversation_state)
+    response = chat(user_input, instructions, conversation_state, rag_response)
+    conversation_state = record_turn(orchestrator_action, user_input, response, conversation_state)
+
     return response, conversation_state
 
 #
@@ -453,6 +820,158 @@ def cur_step (orchestrator_action):
     return "default_response"
 
 
+# [markdown]
+# # Single-shot mode
+
+# Steps where the orchestrator calls the LLM: the fields it extracts (JSON schema),
+# the actions it can go to and how it picks one
+SINGLE_SHOT_STEPS = {
+    "start": {
+        "fields": {
+            "travel_dates": {"type": ["array", "null"], "items": {"type": "string"}},
+            "interests": {"type": ["string", "null"]},
+        },
+        "actions": ["suggest_locations", "ask_interests", "ask_travel_dates"],
+        "rule": "suggest_locations if both travel dates and interests were given, ask_interests if only travel dates, otherwise ask_travel_dates",
+    },
+    "received_interests": {
+        "fields": {"interests": {"type": "string"}},
+        "actions": ["suggest_locations"],
+        "rule": "always suggest_locations",
+    },
+    "received_location": {
+        "fields": {"current_location": {"type": "string"}},
+        "actions": ["ask_accept_location"],
+        "rule": "always ask_accept_location",
+    },
+    "ask_accept_location": {
+        "fields": {"user_decision": {"type": "string", "enum": ["accept", "decline"]}},
+        "actions": ["lock_location", "suggest_locations"],
+        "rule": "lock_location if they accept, otherwise suggest_locations",
+    },
+    "ask_lock_location": {
+        "fields": {"confirm": {"type": "boolean"}},
+        "actions": ["lock_location", "bad_weather", "suggest_locations"],
+        "rule": "lock_location if they confirm, otherwise suggest_locations",
+    },
+    "lock_or_change": {
+        "fields": {"confirm": {"type": "boolean"}},
+        "actions": ["lock_location", "suggest_alternatives"],
+        "rule": "lock_location if they confirm, otherwise suggest_alternatives",
+    },
+    "end_or_suggest_alternatives": {
+        "fields": {"confirm": {"type": "boolean"}},
+        "actions": ["suggest_locations", "end_conversation"],
+        "rule": "suggest_locations if they want another visit, otherwise end_conversation",
+    },
+}
+
+
+def single_shot_schema(current_step):
+    """
+    JSON schema of the single-shot answer for this step: the extracted fields,
+    the action the model expects and its reply for that action.
+    """
+    spec = SINGLE_SHOT_STEPS[current_step]
+    return {
+        "name": "single_shot_turn",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "fields": {
+                    "type": "object",
+                    "properties": spec["fields"],
+                    "required": list(spec["fields"]),
+                    "additionalProperties": False,
+                },
+                "assumed_action": {"type": "string", "enum": spec["actions"]},
+                "reply": {"type": "string"},
+            },
+            "required": ["fields", "assumed_action", "reply"],
+            "additionalProperties": False,
+        },
+    }
+
+
+def single_shot_messages(user_input, current_step, conversation_state):
+    """
+    Extraction prompt of the step plus instructions to pick the next action and reply to it.
+    """
+    spec = SINGLE_SHOT_STEPS[current_step]
+    if "confirm" in spec["fields"]:
+        extraction = confirm_action_prompt(user_input, current_step)
+    else:
+        extraction = extract_info_prompt(user_input, current_step, conversation_state)
+    replies = "\n".join(
+        f"- {action}: {ACTION_INSTRUCTIONS.get(action, 'no reply needed, write an empty string')}"
+        for action in spec["actions"]
+    )
+    prompt = f"""You are a bot that helps with tourism in Puerto Rico. Do two things in one JSON answer.
+
+    1. Put the extracted information in "fields":
+    {extraction}
+
+    2. Pick the next action in "assumed_action" ({spec["rule"]}) and write your reply to the user for
+    that action in "reply". Please be nice and professional, and keep the flow of the conversation.
+    {replies}"""
+    return history_manager.prompt_history(conversation_state) + [{"role": "user", "content": prompt}]
+
+
+def has_local_answer(user_input, current_step):
+    """
+    True if the step's extraction can be answered locally (then the normal path is already one LLM call).
+    """
+    if current_step in ("ask_lock_location", "lock_or_change", "end_or_suggest_alternatives"):
+        return intent_classifier.classify(user_input, current_step) is not None
+    return local_extract_info(user_input, current_step) is not None
+
+
+def single_shot_turn(user_input, current_step, conversation_state):
+    """
+    Run one turn with a single LLM call when possible.
+
+    The model returns the extracted fields and a reply written for the action it
+    expects. The state transition is still decided locally by the orchestrator;
+    the reply is regenerated only when the actual action is a different one, or
+    one whose reply needs retrieval or checks the model didn't see (including
+    the notice about dates outside the forecast window).
+
+    Returns:
+    tuple: (orchestrator_action, response, conversation_state), or None if the
+        step doesn't call the LLM for extraction (use the normal path).
+    """
+    if current_step not in SINGLE_SHOT_STEPS or has_local_answer(user_input, current_step):
+        return None
+
+    conversation_state = history_manager.compact(conversation_state)
+    response = client.chat.completions.create(
+        span_name="single_shot_turn",
+        model="gpt-4o-mini",
+        messages=single_shot_messages(user_input, current_step, conversation_state),
+        response_format={
+            "type": "json_schema",
+            "json_schema": single_shot_schema(current_step)
+            },
+        max_tokens=700,
+        temperature=0.7
+    )
+    result = json.loads(response.choices[0].message.content)
+    print("inside single_shot_turn")
+
+    orchestrator_action, conversation_state = orchestrator(user_input, current_step, conversation_state, extracted=result["fields"])
+    if orchestrator_action == result["assumed_action"] and orchestrator_action in ACTION_INSTRUCTIONS and result["reply"]:
+        # The model's reply can't mention dates outside the forecast window: it never saw that notice
+        notice_pending = bool(conversation_state.get("dates_outside_forecast"))
+        instructions, rag_response = plan_response(orchestrator_action, user_input, conversation_state)
+        reply = chat(user_input, instructions, conversation_state, rag_response) if notice_pending else result["reply"]
+        conversation_state = record_turn(orchestrator_action, user_input, reply, conversation_state)
+        return orchestrator_action, reply, conversation_state
+
+    reply, conversation_state = communicator(orchestrator_action, user_input, conversation_state)
+    return orchestrator_action, reply, conversation_state
+
+
 # current_step = "start"
 #######################
 
@@ -465,6 +984,109 @@ def shutdown():
 
 app.secret_key = '5678'
 
+def next_step(orchestrator_action, current_step):
+    """
+    Get the step the conversation moves to after the orchestrator's action.
+    """
+    # Update the flow based on the orchestrator's action
+    if orchestrator_action == "ask_travel_dates":
+        return "received_dates"
+    elif orchestrator_action == "ask_interests":
+        return "received_interests"
+    elif orchestrator_action == "suggest_locations":
+        #########################
+        return "received_location"
+    elif orchestrator_action == "ask_accept_location":
+        return "ask_lock_location"
+        # return "ask_accept_location"        #ask lock location
+
+    elif orchestrator_action == "bad_weather":
+        return "lock_or_change"
+    elif orchestrator_action == "lock_location":
+        return "end_or_suggest_alternatives"
+
+    elif orchestrator_action == "suggest_alternatives":
+        return "suggest_other_locations"
+    elif orchestrator_action == "end_conversation":
+        return "return_list_of_locked_locations"
+    elif orchestrator_action == "give_list":  
+        return "end"
+    return current_step
+
+
+# Conversations are kept server side; the cookie only holds the session id
+session_store = Traced(make_session_store(), {"load": "session_load", "save": "session_save"})
+
+
+def cache_metrics():
+    """
+    Cache and weather counters kept by their own objects, read at every /metrics scrape.
+    """
+    samples = []
+    caches = {"llm": llm_cache.stats()}
+    if resources.loaded("embeddings"):
+        caches["embeddings"] = resources.get("embeddings").stats()
+    for cache, stats in caches.items():
+        for result in ("hits", "semantic_hits", "misses"):
+            if result in stats:
+                samples.append(("chatbot_cache_lookups_total", "counter", "Cache lookups by result.",
+                                {"cache": cache, "result": result}, stats[result]))
+        samples.append(("chatbot_cache_entries", "gauge", "Entries in each cache.", {"cache": cache}, stats["size"]))
+    if chatbot_funcs.forecast_service is not None:
+        samples.append(("chatbot_weather_fetches_total", "counter", "Forecasts downloaded from OpenWeather.",
+                        {}, chatbot_funcs.forecast_service.fetches))
+    return samples
+
+
+telemetry.metrics.add_collector(cache_metrics)
+
+
+def advance(orchestrator_action, current_step):
+    """
+    next_step, counting the transition.
+    """
+    new_step = next_step(orchestrator_action, current_step)
+    telemetry.record_transition(current_step, new_step, orchestrator_action)
+    return new_step
+
+
+def session_id():
+    """
+    Id of the current browser session (created on the first request).
+    """
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+
+def load_conversation(sid):
+    """
+    (current_step, conversation_state) of a session, or a new conversation.
+    """
+    return session_store.load(sid) or ("start", new_conversation_state())
+
+
+def sse_event(data, event=None):
+    """
+    Format one server-sent event. Data is JSON-encoded so newlines in tokens survive.
+    """
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+def new_conversation_state():
+    """
+    Empty conversation state for a new session.
+    """
+    return {
+        "travel_dates": None,
+        "interests": None,
+        "locked_locations": [],  # Already serializable
+        "suggested_locations": [],  # Now stores dictionaries
+        "current_location": None,
+        "messages": []
+    }
+
 def get_completion(user_input, current_step, conversation_state):
     if current_step != "end":
         # user_input = input("You (tye 'exit' to close): ")  # Get user input
@@ -475,34 +1097,26 @@ def get_completion(user_input, current_step, conversation_state):
         
         print(f"> {user_input}")
         print("Current step:", current_step)
-
-        orchestrator_action, conversation_state = orchestrator(user_input, current_step, conversation_state)
-        response, conversation_state = communicator(orchestrator_action, user_input, conversation_state)
+        telemetry.set_step(current_step)
+
+        # The turn works on a copy, so one that fails halfway (e.g. after locking a place) changes nothing
+        turn_state = copy.deepcopy(conversation_state)
+        try:
+            single_shot = single_shot_turn(user_input, current_step, turn_state) if SINGLE_SHOT else None
+            if single_shot is not None:
+                orchestrator_action, response, turn_state = single_shot
+            else:
+                orchestrator_action, turn_state = orchestrator(user_input, current_step, turn_state)
+                response, turn_state = communicator(orchestrator_action, user_input, turn_state)
+        except LLMUnavailable as error:
+            # Canned reply; the step and the state stay the same so the user can just try again
+            print(f"LLM unavailable: {error.reason}")
+            return error.reply, current_step, conversation_state
+        conversation_state = turn_state
         
         
         # Update the flow based on the orchestrator's action
-        if orchestrator_action == "ask_travel_dates":
-            current_step = "received_dates"
-        elif orchestrator_action == "ask_interests":
-            current_step = "received_interests"
-        elif orchestrator_action == "suggest_locations":
-            #########################
-            current_step = "received_location"
-        elif orchestrator_action == "ask_accept_location":
-            current_step = "ask_lock_location"
-            # current_step = "ask_accept_location"        #ask lock location
-
-        elif orchestrator_action == "bad_weather":
-            current_step = "lock_or_change"
-        elif orchestrator_action == "lock_location":
-            current_step = "end_or_suggest_alternatives"
-
-        elif orchestrator_action == "suggest_alternatives":
-            current_step = "suggest_other_locations"
-        elif orchestrator_action == "end_conversation":
-            current_step = "return_list_of_locked_locations"
-        elif orchestrator_action == "give_list":  
-            current_step = "end"
+        current_step = advance(orchestrator_action, current_step)
 
         session['orchestrator_action'] = orchestrator_action
 
@@ -512,31 +1126,137 @@ def get_completion(user_input, current_step, conversation_state):
 
 
 ########################################################################################################################
+@app.before_request
+def begin_trace():
+    """
+    Start the request's trace; "X-Trace: 1" or ?trace=1 keeps it even if it isn't sampled.
+    """
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    force = request.headers.get("X-Trace") == "1" or request.args.get("trace") == "1"
+    telemetry.start_trace(route, request.headers.get("X-Request-Id"), force)
+
+@app.after_request
+def add_request_id(response):
+    trace = telemetry.current_trace()
+    if trace is not None:
+        trace.status = response.status_code
+        response.headers["X-Request-Id"] = trace.request_id
+    return response
+
+@app.teardown_request
+def end_trace(error=None):
+    # Streamed replies are torn down after their last event, so the trace covers the whole stream
+    telemetry.finish_trace(error)
+
 @app.route("/")
 def home():    
     return render_template("index.html")
 
+@app.route("/metrics")
+def metrics():
+    """
+    Prometheus metrics: span durations, tokens, cache hits, state transitions.
+    """
+    return Response(telemetry.render_metrics(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/trace/<request_id>")
+def trace(request_id):
+    """
+    Spans of a sampled request, by the id sent back in its X-Request-Id header.
+    """
+    found = telemetry.get_trace(request_id)
+    if found is None:
+        return {"error": "trace not found (not sampled or already evicted)"}, 404
+    return found
+
+@app.route("/healthz")
+def healthz():
+    """
+    Liveness: the process is up and serving.
+    """
+    return {"status": "ok"}
+
+@app.route("/readyz")
+def readyz():
+    """
+    Readiness: the embedding model and the vector store are loaded and warmed up (503 until then).
+    If they aren't and no warm-up is running (WARM_UP=0, or it failed), start one in the background.
+    """
+    ready = resources.ready(READY_RESOURCES) and not resources.warming()
+    if not ready and not resources.warming():
+        resources.warm_up(READY_RESOURCES, after=warm_up_queries)
+    return {"ready": ready, "resources": resources.status()}, 200 if ready else 503
+
 @app.route("/get")
 def get_bot_response():    
     userText = request.args.get('msg')  
-    current_step = session.get('current_step', 'start')
-    conversation_state = session.get('conversation_state', {
-        "travel_dates": None,
-        "interests": None,
-        "locked_locations": [],  # Already serializable
-        "suggested_locations": [],  # Now stores dictionaries
-        "current_location": None,
-        "messages": []
-    })
+    sid = session_id()
+    current_step, conversation_state = load_conversation(sid)
 
     response, current_step, conversation_state = get_completion(userText, current_step, conversation_state)  
     #return str(bot.get_response(userText)) 
     # current_step = cur_stp
     # conversation_state = conv_state
-    # Update the session with the new conversation state and step
-    session['current_step'] = current_step
-    session['conversation_state'] = conversation_state
+    # Save the new conversation state and step
+    session_store.save(sid, current_step, conversation_state)
 
     return response
+
+
+@app.route("/stream")
+def stream_bot_response():
+    """
+    Like /get, but streams the reply as server-sent events: one "message"
+    event per token, then a "done" event.
+    """
+    userText = request.args.get('msg')
+    sid = session_id()
+    current_step, conversation_state = load_conversation(sid)
+
+    if current_step == "end" or not userText:
+        return Response(sse_event("", "done"), mimetype="text/event-stream")
+
+    print(f"> {userText}")
+    print("Current step:", current_step)
+    telemetry.set_step(current_step)
+    # As in get_completion, the turn works on a copy that is dropped if the LLM fails
+    previous_state = conversation_state
+    try:
+        orchestrator_action, conversation_state = orchestrator(userText, current_step, copy.deepcopy(previous_state))
+        instructions, rag_response = plan_response(orchestrator_action, userText, conversation_state)
+    except LLMUnavailable as error:
+        print(f"LLM unavailable: {error.reason}")
+        return Response(sse_event(error.reply) + sse_event("", "done"), mimetype="text/event-stream")
+
+    # Save the step now, so it isn't lost if the client disconnects mid-stream
+    previous_step = current_step
+    current_step = advance(orchestrator_action, current_step)
+    session['orchestrator_action'] = orchestrator_action
+    session_store.save(sid, current_step, conversation_state)
+
+    def generate():
+        parts = []
+        try:
+            for token in chat_stream(userText, instructions, conversation_state, rag_response):
+                parts.append(token)
+                yield sse_event(token)
+        except LLMUnavailable as error:
+            # The reply was never written: go back to the previous step and state
+            print(f"LLM unavailable: {error.reason}")
+            session_store.save(sid, previous_step, previous_state)
+            yield sse_event(error.reply)
+            yield sse_event("", "done")
+            return
+        # Only the two new messages are written
+        session_store.save(sid, current_step, record_turn(orchestrator_action, userText, "".join(parts), conversation_state))
+        yield sse_event("", "done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
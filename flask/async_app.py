@@ -0,0 +1,455 @@
+"""
+Asyncio serving mode for the chatbot.
+
+Same conversation flow as app.py (orchestrator -> communicator), but served on
+an ASGI server with the async OpenAI client and an async HTTP client for the
+weather API. A user waiting on OpenAI no longer holds a whole worker, and the
+blocking local work (classifiers, cache lookups, vector search, SQLite) runs in
+worker threads so it doesn't stall the event loop for everyone else. Within a
+turn, when a place's weather dependence has to be asked to GPT, the forecast is
+fetched at the same time (and dropped if the place doesn't depend on the weather).
+
+Run it from the flask folder with an ASGI server, for example:
+    hypercorn async_app:app --bind 0.0.0.0:5000
+    uvicorn async_app:app --port 5000
+"""
+import asyncio
+import copy
+import json
+import uuid
+
+import httpx
+from openai import AsyncOpenAI
+from quart import Quart, Response, render_template, request, session
+
+from chatbot_funcs import get_weather_async
+from llm_cache import MISS
+from landmarks import landmark_document
+from date_parser import parse_dates
+import telemetry
+from telemetry import TracedLLMClient
+from llm_gateway import LLMUnavailable, make_gateway
+from app import (
+    OPENAI_API_KEY, WEATHER_API_KEY, db, llm_cache, weather_flags, intent_classifier,
+    extract_cache_step, location_name, local_extract_info,
+    extract_info_prompt, weather_dependent_prompt, bad_weather_prompt,
+    confirm_action_prompt, chat_messages, weather_location,
+    plan_response, record_turn, new_conversation_state,
+    session_store, load_conversation, sse_event, history_manager,
+    resources, READY_RESOURCES, warm_up_queries, with_local_dates, set_travel_dates, advance,
+)
+
+app = Quart(__name__)
+app.secret_key = '5678'
+
+# Through the same kind of gateway as app.py (llm_gateway.py), with its own slots and breaker
+aclient = TracedLLMClient(make_gateway(AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    max_retries=0
+), asynchronous=True), asynchronous=True)
+# Shared async HTTP client (connection pool) for the weather API, opened on startup
+http_client = None
+
+
+@app.before_serving
+async def open_http_client():
+    global http_client
+    http_client = httpx.AsyncClient(timeout=10)
+
+
+@app.after_serving
+async def close_http_client():
+    await http_client.aclose()
+
+
+def session_id():
+    """
+    Quart version of app.session_id.
+    """
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+
+async def ask_gpt_json(span_name, prompt, max_tokens=200):
+    """
+    Send a single-prompt JSON request to gpt-4o-mini and parse the answer.
+    span_name tags the call's span and metrics with the app function it stands for.
+    """
+    response = await aclient.chat.completions.create(
+        span_name=span_name,
+        model="gpt-4o-mini",
+        messages=[{
+            'role': 'user',
+            'content': prompt
+            }],
+        response_format={
+            "type": "json_object"
+            },
+        max_tokens=max_tokens,
+        temperature=0.5
+    )
+    return json.loads(response.choices[0].message.content)
+
+
+async def gpt_extract_info(user_input, current_step, conversation_state):
+    """
+    Async version of app.gpt_extract_info.
+    """
+    local_info = await asyncio.to_thread(local_extract_info, user_input, current_step)
+    if local_info is not None:
+        return local_info
+
+    cache_step = extract_cache_step(current_step)
+    if cache_step is not None:
+        cached = await asyncio.to_thread(llm_cache.get, "gpt_extract_info", cache_step, user_input)
+        if cached is not MISS:
+            return dict(cached)
+
+    gpt_response = await ask_gpt_json("gpt_extract_info", extract_info_prompt(user_input, current_step, conversation_state))
+    if cache_step is not None:
+        llm_cache.put("gpt_extract_info", cache_step, user_input, gpt_response)
+    return gpt_response
+
+
+async def is_weather_dependent(location):
+    """
+    Async version of app.is_weather_dependent.
+    """
+    name = location_name(location)
+    flag = weather_flags.get(name)
+    if flag is not None:
+        return flag
+
+    gpt_response = await ask_gpt_json("is_weather_dependent", weather_dependent_prompt(name))
+    weather_flags.remember(name, gpt_response['weather_dependent'])
+    return gpt_response['weather_dependent']
+
+
+async def check_weather(location, travel_dates):
+    """
+    Async version of app.check_weather.
+    """
+    if not travel_dates:
+        return False
+    weather = await get_weather_async(str(travel_dates[0]), weather_location(location), WEATHER_API_KEY, http_client)
+    if isinstance(weather, str):
+        return False
+    gpt_response = await ask_gpt_json("check_weather", bad_weather_prompt(weather))
+    return gpt_response['bad_weather']
+
+
+async def confirm_action(user_input, current_step):
+    """
+    Async version of app.confirm_action.
+    """
+    decision = await asyncio.to_thread(intent_classifier.classify, user_input, current_step)
+    if decision is not None:
+        return decision
+
+    cached = await asyncio.to_thread(llm_cache.get, "confirm_action", current_step, user_input)
+    if cached is not MISS:
+        return cached
+
+    gpt_response = await ask_gpt_json("gpt_confirm_action", confirm_action_prompt(user_input, current_step), max_tokens=50)
+    llm_cache.put("confirm_action", current_step, user_input, gpt_response['confirm'])
+    return gpt_response['confirm']
+
+
+async def chat(user_input, instructions, conversation_state, rag_response=None):
+    """
+    Async version of app.chat.
+    """
+    conversation_state = await history_manager.compact_async(conversation_state, aclient)
+    response = await aclient.chat.completions.create(
+        span_name="chat",
+        model="gpt-4o-mini",
+        messages=chat_messages(user_input, instructions, conversation_state, rag_response),
+        max_tokens=500,
+        temperature=1
+    )
+    if response.usage:
+        conversation_state["last_prompt_tokens"] = response.usage.prompt_tokens
+    return response.choices[0].message.content
+
+
+async def chat_stream(user_input, instructions, conversation_state, rag_response=None):
+    """
+    Async version of app.chat_stream.
+    """
+    conversation_state = await history_manager.compact_async(conversation_state, aclient)
+    stream = await aclient.chat.completions.create(
+        span_name="chat_stream",
+        model="gpt-4o-mini",
+        messages=chat_messages(user_input, instructions, conversation_state, rag_response),
+        max_tokens=500,
+        temperature=1,
+        stream=True
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def orchestrator(user_input, current_step, conversation_state):
+    """
+    Async version of app.orchestrator. The flow is the same; independent calls
+    are awaited together and the (blocking) Chroma search runs in a thread.
+    """
+    if current_step == "start":
+        detected_info = await gpt_extract_info(user_input, current_step, conversation_state)
+        detected_info = with_local_dates(user_input, detected_info)
+
+        if detected_info["travel_dates"] and detected_info["interests"]:
+            set_travel_dates(conversation_state, detected_info["travel_dates"])
+            conversation_state["interests"] = detected_info["interests"]
+            return "suggest_locations", conversation_state
+
+        elif detected_info["travel_dates"]:
+            set_travel_dates(conversation_state, detected_info["travel_dates"])
+            return "ask_interests", conversation_state
+
+        elif detected_info["interests"]:
+            conversation_state["interests"] = detected_info["interests"]
+        return "ask_travel_dates", conversation_state
+
+    elif current_step == "received_dates":
+        travel_dates = parse_dates(user_input)
+        if travel_dates is None:
+            travel_dates = (await gpt_extract_info(user_input, "start", conversation_state)).get("travel_dates")
+        if travel_dates:
+            set_travel_dates(conversation_state, travel_dates)
+        if conversation_state.get("interests"):
+            return "suggest_locations", conversation_state
+        return "ask_interests", conversation_state
+
+    elif current_step == "received_interests":
+        detected_info = await gpt_extract_info(user_input, current_step, conversation_state)
+        conversation_state["interests"] = detected_info["interests"]
+        return "suggest_locations", conversation_state
+
+    elif current_step == "received_location":
+        curr_loc = await gpt_extract_info(user_input, current_step, conversation_state)
+        if curr_loc.get('landmark_id'):
+            conversation_state["current_location"] = landmark_document(curr_loc['landmark_id'])
+            return "ask_accept_location", conversation_state
+        curr_loc = (str(curr_loc['current_location']) + " " + conversation_state['interests'])
+        current_location = await asyncio.to_thread(db.similarity_search, curr_loc, k=1, filter={'source': 'landmarks'})
+        if current_location:
+            conversation_state["current_location"] = {
+                "page_content": current_location[0].page_content,
+                "metadata": current_location[0].metadata
+            }
+        return "ask_accept_location", conversation_state
+
+    elif current_step == "ask_accept_location":
+        user_decision = await gpt_extract_info(user_input, current_step, conversation_state)
+        if user_decision.get("user_decision") == "accept":
+            return "lock_location", conversation_state
+        return "suggest_locations", conversation_state
+
+    elif current_step == "ask_lock_location":
+        want_to_lock = await confirm_action(user_input, current_step)
+
+        if want_to_lock:
+            location = conversation_state["current_location"]
+            if weather_flags.get(location_name(location)) is not None:
+                # Known locally: only weather-dependent places need the forecast
+                bad_weather = await is_weather_dependent(location) and await check_weather(
+                    location, conversation_state["travel_dates"])
+            else:
+                # Ask GPT and fetch the forecast at the same time; drop the forecast if it isn't needed
+                forecast = asyncio.create_task(check_weather(location, conversation_state["travel_dates"]))
+                forecast.add_done_callback(lambda task: task.cancelled() or task.exception())  # never "unretrieved"
+                try:
+                    weather_dependant = await is_weather_dependent(location)
+                except BaseException:
+                    forecast.cancel()
+                    raise
+                if weather_dependant:
+                    bad_weather = await forecast
+                else:
+                    forecast.cancel()
+                    bad_weather = False
+            if bad_weather:
+                return "bad_weather", conversation_state
+            return "lock_location", conversation_state
+        return "suggest_locations", conversation_state
+
+    elif current_step == "lock_or_change":
+        want_to_lock = await confirm_action(user_input, current_step)
+        if want_to_lock:
+            conversation_state["locked_locations"].append(conversation_state["current_location"])
+            return "lock_location", conversation_state
+        return "suggest_alternatives", conversation_state
+
+    elif current_step == "suggest_other_locations":
+        return "suggest_locations", conversation_state
+
+    elif current_step == "end_or_suggest_alternatives":
+        want_to_go = await confirm_action(user_input, current_step)
+        if want_to_go:
+            return "suggest_locations", conversation_state
+        return "end_conversation", conversation_state
+
+    elif current_step == "return_list_of_locked_locations":
+        return "give_list", conversation_state
+
+    return "default_response", conversation_state
+
+
+async def communicator(orchestrator_action, user_input, conversation_state):
+    """
+    Async version of app.communicator.
+    """
+    # plan_response only does (blocking) retrieval, so keep it off the event loop
+    instructions, rag_response = await asyncio.to_thread(plan_response, orchestrator_action, user_input, conversation_state)
+    response = await chat(user_input, instructions, conversation_state, rag_response)
+    conversation_state = record_turn(orchestrator_action, user_input, response, conversation_state)
+    return response, conversation_state
+
+
+async def get_completion(user_input, current_step, conversation_state):
+    """
+    Async version of app.get_completion.
+    """
+    if current_step == "end" or not user_input:
+        return "", current_step, conversation_state
+
+    telemetry.set_step(current_step)
+    turn_state = copy.deepcopy(conversation_state)
+    try:
+        orchestrator_action, turn_state = await orchestrator(user_input, current_step, turn_state)
+        response, turn_state = await communicator(orchestrator_action, user_input, turn_state)
+    except LLMUnavailable as error:
+        print(f"LLM unavailable: {error.reason}")
+        return error.reply, current_step, conversation_state
+    conversation_state = turn_state
+    current_step = advance(orchestrator_action, current_step)
+    session['orchestrator_action'] = orchestrator_action
+
+    return response, current_step, conversation_state
+
+
+########################################################################################################################
+@app.before_request
+async def begin_trace():
+    """
+    Same request tracing as app.py.
+    """
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    force = request.headers.get("X-Trace") == "1" or request.args.get("trace") == "1"
+    telemetry.start_trace(route, request.headers.get("X-Request-Id"), force)
+
+
+@app.after_request
+async def add_request_id(response):
+    trace = telemetry.current_trace()
+    if trace is not None:
+        trace.status = response.status_code
+        response.headers["X-Request-Id"] = trace.request_id
+    return response
+
+
+@app.teardown_request
+async def end_trace(error=None):
+    telemetry.finish_trace(error)
+
+
+@app.route("/")
+async def home():
+    return await render_template("index.html")
+
+
+@app.route("/metrics")
+async def metrics():
+    return Response(telemetry.render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/trace/<request_id>")
+async def trace(request_id):
+    found = telemetry.get_trace(request_id)
+    if found is None:
+        return {"error": "trace not found (not sampled or already evicted)"}, 404
+    return found
+
+
+@app.route("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.route("/readyz")
+async def readyz():
+    """
+    Same readiness check as app.py (model and index loaded and warmed up),
+    starting the warm-up in the background when none is running.
+    """
+    ready = resources.ready(READY_RESOURCES) and not resources.warming()
+    if not ready and not resources.warming():
+        resources.warm_up(READY_RESOURCES, after=warm_up_queries)
+    return {"ready": ready, "resources": resources.status()}, 200 if ready else 503
+
+
+@app.route("/get")
+async def get_bot_response():
+    userText = request.args.get('msg')
+    sid = session_id()
+    current_step, conversation_state = await asyncio.to_thread(load_conversation, sid)
+
+    response, current_step, conversation_state = await get_completion(userText, current_step, conversation_state)
+
+    await asyncio.to_thread(session_store.save, sid, current_step, conversation_state)
+
+    return response
+
+
+@app.route("/stream")
+async def stream_bot_response():
+    """
+    Async version of app.stream_bot_response.
+    """
+    userText = request.args.get('msg')
+    sid = session_id()
+    current_step, conversation_state = await asyncio.to_thread(load_conversation, sid)
+
+    if current_step == "end" or not userText:
+        return Response(sse_event("", "done"), mimetype="text/event-stream")
+
+    telemetry.set_step(current_step)
+    previous_state = conversation_state
+    try:
+        orchestrator_action, conversation_state = await orchestrator(userText, current_step, copy.deepcopy(previous_state))
+        instructions, rag_response = await asyncio.to_thread(plan_response, orchestrator_action, userText, conversation_state)
+    except LLMUnavailable as error:
+        print(f"LLM unavailable: {error.reason}")
+        return Response(sse_event(error.reply) + sse_event("", "done"), mimetype="text/event-stream")
+
+    previous_step = current_step
+    current_step = advance(orchestrator_action, current_step)
+    session['orchestrator_action'] = orchestrator_action
+    await asyncio.to_thread(session_store.save, sid, current_step, conversation_state)
+
+    async def generate():
+        parts = []
+        try:
+            async for token in chat_stream(userText, instructions, conversation_state, rag_response):
+                parts.append(token)
+                yield sse_event(token)
+        except LLMUnavailable as error:
+            print(f"LLM unavailable: {error.reason}")
+            await asyncio.to_thread(session_store.save, sid, previous_step, previous_state)
+            yield sse_event(error.reply)
+            yield sse_event("", "done")
+            return
+        recorded = record_turn(orchestrator_action, userText, "".join(parts), conversation_state)
+        await asyncio.to_thread(session_store.save, sid, current_step, recorded)
+        yield sse_event("", "done")
+
+    response = Response(generate(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+    response.timeout = None
+    return response
+
+
+if __name__ == "__main__":
+    app.run(debug=True)
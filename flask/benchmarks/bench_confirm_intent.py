@@ -0,0 +1,82 @@
+"""
+Accuracy and latency of the local yes/no classifier (intent_classifier.py)
+against the GPT path of confirm_action, on the labeled replies in
+data/confirm_intents.json (English and Spanish).
+
+Run from the flask folder:
+    python benchmarks/bench_confirm_intent.py          # lexicon (+ embeddings if the pickle is there)
+    python benchmarks/bench_confirm_intent.py --llm    # also time the GPT path (needs OPENAI_API_KEY)
+
+"coverage" is the share of replies answered locally; accuracy is measured on
+the answered replies that have a label (label null = genuinely ambiguous).
+Replies whose meaning depends on the question ("another one") carry the
+conversation step they are answered in.
+"""
+import argparse
+import json
+import os
+import pickle
+
+from bench_utils import DATA_DIR, latency_summary, print_table, timed
+
+from intent_classifier import ConfirmIntentClassifier
+
+
+def evaluate(name, classify, items):
+    answered, correct, labeled, latencies = 0, 0, 0, []
+    for item in items:
+        decision, elapsed = timed(classify, item["text"], item.get("step"))
+        latencies.append(elapsed)
+        if decision is None:
+            continue
+        answered += 1
+        if item["label"] is not None:
+            labeled += 1
+            correct += decision == item["label"]
+    row = {
+        "path": name,
+        "coverage": answered / len(items),
+        "accuracy": correct / labeled if labeled else float('nan'),
+    }
+    row.update(latency_summary(latencies))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm", action="store_true", help="also benchmark the GPT path")
+    args = parser.parse_args()
+
+    with open(os.path.join(DATA_DIR, 'confirm_intents.json'), encoding='utf-8') as f:
+        items = json.load(f)
+
+    rows = [evaluate("lexicon", ConfirmIntentClassifier().classify, items)]
+
+    embeddings = None
+    if os.path.exists('sentence_transformer_embeddings.pkl'):
+        with open('sentence_transformer_embeddings.pkl', 'rb') as f:
+            embeddings = pickle.load(f)
+        classifier = ConfirmIntentClassifier(embeddings=embeddings)
+        classifier.classify("warm up")
+        rows.append(evaluate("lexicon+centroid", classifier.classify, items))
+
+    if args.llm:
+        import app
+
+        def gpt(text, step=None):
+            app.llm_cache.clear()
+            return app.gpt_confirm_action(text, step or "ask_lock_location")
+
+        def hybrid(text, step=None):
+            decision = app.intent_classifier.classify(text, step)
+            return decision if decision is not None else gpt(text, step)
+
+        rows.append(evaluate("gpt", gpt, items))
+        rows.append(evaluate("local+gpt fallback", hybrid, items))
+
+    print(f"{len(items)} labeled replies")
+    print_table(rows, ["path", "coverage", "accuracy", "n", "p50_ms", "p99_ms", "mean_ms"])
+
+
+if __name__ == "__main__":
+    main()
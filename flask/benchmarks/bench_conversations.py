@@ -0,0 +1,219 @@
+"""
+Replays the scripted conversations in data/conversations.json through
+app.get_completion (orchestrator -> communicator) against the local mock
+OpenAI/OpenWeather server (mock_api_server.py), and reports:
+
+- turn latency p50/p95/p99, overall and per conversation step;
+- per-stage latency (extraction, confirmation, weather check, retrieval,
+  reply generation...), timed by wrapping the app's functions;
+- LLM calls, prompt tokens and forecast requests per turn;
+- turns whose action differs from the script's "expect".
+
+Each turn may set "llm" overrides for the mock's JSON answers (e.g.
+{"bad_weather": true}). Runs on a plain Linux box: no keys, no network, but
+it needs the embeddings and the vector store for retrieval.
+
+Run from the flask folder:
+    python benchmarks/bench_conversations.py --chat-latency lognormal:400:0.4 --repeat 3
+    python benchmarks/bench_conversations.py --json results.json                    # save the numbers
+    python benchmarks/bench_conversations.py --chat-latency fixed:0 --baseline results.json   # CI: fail on regressions
+"""
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import sys
+import time
+
+from bench_utils import DATA_DIR, latency_summary, print_table
+from mock_api_server import Latency, start_mock_api_server
+
+# app function -> stage name (inclusive times: "orchestrator" contains "extract", "communicator" contains "chat")
+STAGES = {
+    "orchestrator": "orchestrator",
+    "gpt_extract_info": "extract",
+    "confirm_action": "confirm",
+    "is_weather_dependent": "weather flag",
+    "check_weather": "weather check",
+    "communicator": "communicator",
+    "plan_response": "plan response",
+    "chat": "reply (LLM)",
+    "single_shot_turn": "single shot",
+}
+
+
+class StageRecorder:
+    """
+    Collects the time spent in each stage during the current turn.
+    """
+
+    def __init__(self):
+        self.turn = {}
+        self.last_action = None
+
+    def wrap(self, stage, func):
+        @functools.wraps(func)
+        def timed_stage(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                self.turn.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+            if stage == "orchestrator":
+                self.last_action = result[0]
+            return result
+        return timed_stage
+
+    def start_turn(self):
+        self.turn = {}
+        self.last_action = None
+
+
+def instrument(app, recorder):
+    for name, stage in STAGES.items():
+        setattr(app, name, recorder.wrap(stage, getattr(app, name)))
+    store = app.resources.get("db")
+    store.similarity_search = recorder.wrap("retrieval", store.similarity_search)
+
+
+def run_conversation(app, server, recorder, conversation):
+    """
+    Play one scripted conversation and return one record per turn.
+    """
+    records = []
+    current_step, state = "start", app.new_conversation_state()
+    for turn in conversation["turns"]:
+        server.overrides = turn.get("llm", {})
+        recorder.start_turn()
+        before = server.snapshot()
+        step = current_step
+        start = time.perf_counter()
+        with app.app.test_request_context(), contextlib.redirect_stdout(io.StringIO()):
+            _, current_step, state = app.get_completion(turn["user"], current_step, state)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        after = server.snapshot()
+        records.append({
+            "conversation": conversation["name"], "step": step, "user": turn["user"],
+            "action": recorder.last_action, "expected": turn.get("expect"), "turn_ms": elapsed_ms,
+            "stages": {stage: sum(times) for stage, times in recorder.turn.items()},
+            "llm_calls": after["llm_calls"] - before["llm_calls"],
+            "prompt_tokens": after["prompt_tokens"] - before["prompt_tokens"],
+            "forecast_requests": after["forecast_requests"] - before["forecast_requests"],
+        })
+    server.overrides = {}
+    return records
+
+
+def summarize(records):
+    """
+    Per-step and per-stage latency tables and per-turn counters.
+    """
+    def row(name, turns):
+        summary = latency_summary([r["turn_ms"] for r in turns])
+        return {
+            "name": name, "turns": len(turns), "p50_ms": summary["p50_ms"], "p95_ms": summary["p95_ms"],
+            "p99_ms": summary["p99_ms"], "llm_calls": sum(r["llm_calls"] for r in turns) / len(turns),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in turns) / len(turns),
+        }
+
+    steps = [row("all turns", records)]
+    for step in dict.fromkeys(r["step"] for r in records):
+        steps.append(row(step, [r for r in records if r["step"] == step]))
+
+    stages = []
+    for stage in dict.fromkeys(s for r in records for s in r["stages"]):
+        times = [r["stages"][stage] for r in records if stage in r["stages"]]
+        summary = latency_summary(times)
+        stages.append({"stage": stage, "turns": len(times), "p50_ms": summary["p50_ms"],
+                       "p95_ms": summary["p95_ms"], "p99_ms": summary["p99_ms"]})
+
+    mismatches = [r for r in records if r["expected"] and r["action"] != r["expected"]]
+    return {
+        "steps": steps, "stages": stages,
+        "forecast_requests_per_turn": sum(r["forecast_requests"] for r in records) / len(records),
+        "mismatches": [{k: r[k] for k in ("conversation", "step", "user", "action", "expected")} for r in mismatches],
+    }
+
+
+def regressions(result, baseline, tolerance, slack_ms=5.0):
+    """
+    Descriptions of the numbers that got worse than the baseline beyond the tolerance.
+    """
+    found = []
+    for key, name_key in (("steps", "name"), ("stages", "stage")):
+        before = {row[name_key]: row for row in baseline[key]}
+        for row in result[key]:
+            old = before.get(row[name_key])
+            if old is None:
+                continue
+            if row["p95_ms"] > old["p95_ms"] * (1 + tolerance) + slack_ms:
+                found.append(f"{row[name_key]}: p95 {old['p95_ms']:.1f} -> {row['p95_ms']:.1f} ms")
+            for counter in ("llm_calls", "prompt_tokens"):
+                if counter in row and row[counter] > old[counter] * (1 + tolerance) + 1e-9:
+                    found.append(f"{row[name_key]}: {counter} per turn {old[counter]:.2f} -> {row[counter]:.2f}")
+    if len(result["mismatches"]) > len(baseline["mismatches"]):
+        found.append(f"{len(result['mismatches'])} turns with an unexpected action (was {len(baseline['mismatches'])})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", default=os.path.join(DATA_DIR, 'conversations.json'))
+    parser.add_argument("--chat-latency", type=Latency.parse, default=Latency("lognormal", 400, 0.4),
+                        help="kind:median_ms[:spread], e.g. lognormal:400:0.4, uniform:300:0.2, fixed:0")
+    parser.add_argument("--weather-latency", type=Latency.parse, default=Latency("fixed", 80))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--single-shot", action="store_true", help="run with SINGLE_SHOT=1")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file to compare with; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative increase")
+    args = parser.parse_args()
+
+    server = start_mock_api_server(args.chat_latency, args.weather_latency)
+    # The app reads these at import time
+    os.environ.update(server.environ())
+    os.environ.setdefault("WARM_UP", "0")
+    os.environ.setdefault("WEATHER_FLAGS_BUILD", "0")  # no background GPT calls in the counts
+    if args.single_shot:
+        os.environ["SINGLE_SHOT"] = "1"
+    import app
+
+    app.resources.warm_up(app.READY_RESOURCES, after=app.warm_up_queries, background=False)
+    recorder = StageRecorder()
+    instrument(app, recorder)
+
+    with open(args.conversations, encoding='utf-8') as f:
+        conversations = json.load(f)
+    records = []
+    for _ in range(args.repeat):
+        for conversation in conversations:
+            records.extend(run_conversation(app, server, recorder, conversation))
+
+    result = summarize(records)
+    result["settings"] = {"chat_latency": repr(args.chat_latency), "weather_latency": repr(args.weather_latency),
+                          "single_shot": args.single_shot, "repeat": args.repeat}
+    print(f"{len(records)} turns in {len(conversations)} conversations x {args.repeat}, "
+          f"chat latency {args.chat_latency!r}, weather latency {args.weather_latency!r}\n")
+    print_table(result["steps"], ["name", "turns", "p50_ms", "p95_ms", "p99_ms", "llm_calls", "prompt_tokens"])
+    print()
+    print_table(result["stages"], ["stage", "turns", "p50_ms", "p95_ms", "p99_ms"])
+    print(f"\nforecast requests per turn: {result['forecast_requests_per_turn']:.2f}")
+    for mismatch in result["mismatches"]:
+        print(f"unexpected action: {mismatch}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=1)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            found = regressions(result, json.load(f), args.tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
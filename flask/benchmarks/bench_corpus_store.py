@@ -0,0 +1,70 @@
+"""
+Load time and peak memory of the pickled corpus against the columnar store
+(corpus_store.py). Each case runs in a fresh process, so peak RSS is its own.
+
+Cases: unpickle everything; open the store; select the landmarks and decode
+them; decode every document from the store.
+
+Run from the flask folder (needs saves/corpus, see corpus_store.py, and
+LangChain to unpickle):
+    python benchmarks/bench_corpus_store.py
+"""
+import argparse
+import json
+import pickle
+import resource
+import subprocess
+import sys
+import time
+
+from bench_utils import print_table
+
+from corpus_store import CORPUS_DIR, MERGED_PKL, CorpusStore
+
+CASES = ["pickle: load all", "store: open", "store: landmarks", "store: decode all"]
+
+
+def run_case(case):
+    if case == "pickle: load all":
+        with open(MERGED_PKL, 'rb') as f:
+            return len(pickle.load(f))
+    store = CorpusStore(CORPUS_DIR)
+    if case == "store: open":
+        return len(store)
+    if case == "store: landmarks":
+        return len(list(store.documents(source="landmarks")))
+    return len(list(store.documents()))
+
+
+def child(case):
+    from langchain_core.documents import Document  # imported up front so it isn't counted in the case
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    count = run_case(case)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"case": case, "documents": count, "load_ms": elapsed_ms,
+                      "peak_mb": peak_kb / 1024, "added_mb": (peak_kb - baseline_kb) / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    rows = []
+    for case in CASES:
+        runs = [json.loads(subprocess.check_output([sys.executable, __file__, "--child", case]))
+                for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run["load_ms"])
+        rows.append(dict(best, added_mb=max(run["added_mb"] for run in runs)))
+    print(f"best of {args.repeat} runs, each in a new process")
+    print_table(rows, ["case", "documents", "load_ms", "added_mb", "peak_mb"])
+
+
+if __name__ == "__main__":
+    main()
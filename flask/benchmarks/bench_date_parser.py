@@ -0,0 +1,52 @@
+"""
+Accuracy and latency of the local date parser (date_parser.py) on the English
+and Spanish date expressions in data/date_expressions.json.
+
+Each expression has the "today" it was written on, the dates it means (null if
+none) and whether it is only dates (then the start step skips the LLM).
+
+Run from the flask folder:
+    python benchmarks/bench_date_parser.py
+"""
+import datetime
+import json
+import os
+
+from bench_utils import DATA_DIR, latency_summary, print_table, timed
+
+from date_parser import only_dates, parse_dates
+
+
+def main():
+    with open(os.path.join(DATA_DIR, 'date_expressions.json'), encoding='utf-8') as f:
+        items = json.load(f)
+
+    groups = {"only dates": [], "dates + other info": [], "no dates": []}
+    for item in items:
+        name = "no dates" if item["dates"] is None else "only dates" if item["only_dates"] else "dates + other info"
+        groups[name].append(item)
+
+    rows, failures = [], []
+    for name, group in groups.items():
+        latencies, correct, skipped = [], 0, 0
+        for item in group:
+            today = datetime.date.fromisoformat(item["today"])
+            dates, elapsed = timed(parse_dates, item["text"], today)
+            latencies.append(elapsed * 1000)
+            local = only_dates(item["text"], today)
+            correct += dates == item["dates"] and local == item["only_dates"]
+            skipped += local
+            if dates != item["dates"] or local != item["only_dates"]:
+                failures.append((item["text"], dates, local))
+        row = {"expressions": name, "inputs": len(group), "correct": correct / len(group),
+               "no LLM": skipped / len(group)}
+        row.update({key.replace("_ms", "_us"): value for key, value in latency_summary(latencies).items()})
+        rows.append(row)
+
+    print_table(rows, ["expressions", "inputs", "correct", "no LLM", "p50_us", "p95_us", "p99_us"])
+    for text, dates, local in failures:
+        print(f"wrong: {text!r} -> {dates} (only dates: {local})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Cold start, memory and encode latency of the embedding backends: the pickled
+HuggingFaceEmbeddings (torch) versus all-MiniLM-L6-v2 on ONNX Runtime (fp32
+and int8), plus how close the ONNX vectors are to the pickled ones.
+
+Each backend is measured in a fresh process, so cold start includes the
+imports and RSS is the whole process. Run from the flask folder:
+    python benchmarks/bench_embedding_backends.py --model ../models/all-MiniLM-L6-v2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from bench_utils import BENCH_DIR, latency_summary, print_table
+
+QUERIES = [
+    "beaches", "hiking in the rainforest", "colonial forts in Old San Juan", "where can I see bioluminescence?",
+    "museos de arte en Ponce", "snorkeling and coral reefs near Fajardo", "coffee plantation tours",
+    "something fun for kids on a rainy day", "lighthouses", "Cueva Ventana",
+]
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def child(backend, model_dir, repeats):
+    """
+    Runs in the measured process: load, encode the queries, print JSON.
+    """
+    start = time.perf_counter()
+    if backend == "pickle":
+        import pickle
+        with open('sentence_transformer_embeddings.pkl', 'rb') as f:
+            embeddings = pickle.load(f)
+    else:
+        from onnx_embeddings import OnnxEmbeddings
+        embeddings = OnnxEmbeddings(model_dir, onnx_file=backend)
+    first = embeddings.embed_query(QUERIES[0])
+    cold_start = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    for _ in range(repeats):
+        for text in QUERIES:
+            t = time.perf_counter()
+            embeddings.embed_query(text)
+            latencies.append((time.perf_counter() - t) * 1000)
+    t = time.perf_counter()
+    embeddings.embed_documents(QUERIES * 10)
+    batch_ms = (time.perf_counter() - t) * 1000
+
+    print(json.dumps({
+        "cold_start_ms": cold_start, "rss_mb": rss_mb(), "latencies": latencies, "batch100_ms": batch_ms,
+        "vectors": [first] + [embeddings.embed_query(text) for text in QUERIES[1:]],
+    }))
+
+
+def measure(backend, model_dir, repeats):
+    output = subprocess.run(
+        [sys.executable, os.path.join(BENCH_DIR, os.path.basename(__file__)), "--child", backend,
+         "--model", model_dir, "--repeats", str(repeats)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def cosines(a, b):
+    import numpy as np
+    a, b = np.asarray(a), np.asarray(b)
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=os.path.join(os.path.dirname(os.path.dirname(BENCH_DIR)), 'models', 'all-MiniLM-L6-v2'))
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.model, args.repeats)
+        return
+
+    backends = ["pickle"] + [name for name in ("model.onnx", "model_int8.onnx")
+                             if os.path.exists(os.path.join(args.model, name))]
+    results = {backend: measure(backend, args.model, args.repeats) for backend in backends}
+
+    rows = []
+    for backend, result in results.items():
+        row = {"backend": backend, "cold_start_ms": result["cold_start_ms"], "rss_mb": result["rss_mb"],
+               "batch100_ms": result["batch100_ms"]}
+        row.update(latency_summary(result["latencies"]))
+        similarity = cosines(result["vectors"], results["pickle"]["vectors"])
+        row["min_cos_vs_pickle"] = float(similarity.min())
+        rows.append(row)
+    print(f"{len(QUERIES)} queries x {args.repeats} repeats, one process per backend")
+    print_table(rows, ["backend", "cold_start_ms", "rss_mb", "p50_ms", "p99_ms", "batch100_ms", "min_cos_vs_pickle"])
+
+
+if __name__ == "__main__":
+    main()
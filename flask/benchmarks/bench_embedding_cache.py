@@ -0,0 +1,74 @@
+"""
+Query encoding with and without CachedEmbeddings: the raw pickled
+embeddings, the cache alone (batch window 0) and the cache with
+micro-batching, for a stream of repeated queries sent by concurrent sessions.
+
+Run from the flask folder:
+    python benchmarks/bench_embedding_cache.py --queries 2000 --workers 16
+"""
+import argparse
+import pickle
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_utils import latency_summary, print_table, timed
+
+from embedding_cache import CachedEmbeddings
+from landmarks import load_landmarks
+
+COMMON_QUERIES = [
+    "beaches", "hiking", "yes", "no thanks", "museums", "snorkeling", "history", "food",
+    "El Yunque", "Old San Juan", "caves", "surfing", "waterfalls", "coffee", "nightlife",
+]
+
+
+def query_stream(n, seed=0):
+    """
+    Mostly repeated short queries, some landmark names (long tail).
+    """
+    rng = random.Random(seed)
+    names = [landmark["name"] for landmark in load_landmarks()]
+    return [rng.choice(COMMON_QUERIES) if rng.random() < 0.7 else rng.choice(names) for _ in range(n)]
+
+
+def run(name, embeddings, queries, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = [elapsed for _, elapsed in pool.map(lambda text: timed(embeddings.embed_query, text), queries)]
+    row = {"path": name, "queries/s": len(queries) / (time.perf_counter() - start)}
+    row.update(latency_summary(latencies))
+    row.update(hit_rate="-", mean_batch="-")
+    if isinstance(embeddings, CachedEmbeddings):
+        stats = embeddings.stats()
+        row.update(hit_rate=stats["hit_rate"], mean_batch=stats["mean_batch_size"])
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=16, help="concurrent sessions")
+    parser.add_argument("--window-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    with open('sentence_transformer_embeddings.pkl', 'rb') as f:
+        embeddings = pickle.load(f)
+    queries = query_stream(args.queries)
+    embeddings.embed_query("warm up")
+
+    rows = [
+        run("raw", embeddings, queries, args.workers),
+        run("cache", CachedEmbeddings(embeddings, batch_window_ms=0), queries, args.workers),
+        run("cache + batching", CachedEmbeddings(embeddings, batch_window_ms=args.window_ms), queries, args.workers),
+    ]
+    # All misses: what batching alone does for distinct queries
+    distinct = [f"{text} {i}" for i, text in enumerate(queries)]
+    rows.append(run("batching, no repeats", CachedEmbeddings(embeddings, batch_window_ms=args.window_ms), distinct, args.workers))
+
+    print(f"{args.queries} queries, {args.workers} concurrent sessions, {args.window_ms} ms batch window")
+    print_table(rows, ["path", "queries/s", "hit_rate", "mean_batch", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
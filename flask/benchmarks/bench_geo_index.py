@@ -0,0 +1,97 @@
+"""
+GeoIndex (KD-tree) k-nearest and radius queries versus a brute-force
+haversine scan over every landmark (plain Python and numpy), with a check
+that all of them return the same places.
+
+Run from the flask folder:
+    python benchmarks/bench_geo_index.py --queries 5000
+"""
+import argparse
+import random
+
+import numpy as np
+
+from bench_utils import latency_summary, print_table, timed
+
+from geo_index import EARTH_RADIUS_KM, GeoIndex, haversine_km
+from landmarks import load_landmarks
+
+# Bounding box of Puerto Rico (main island, Vieques and Culebra)
+LAT_RANGE = (17.9, 18.52)
+LON_RANGE = (-67.28, -65.22)
+
+
+def brute_force(points):
+    def scan(lat, lon):
+        return sorted((haversine_km(lat, lon, p_lat, p_lon), point_id) for point_id, p_lat, p_lon in points)
+    return scan
+
+
+def numpy_scan(points):
+    ids = [point[0] for point in points]
+    lats = np.radians([point[1] for point in points])
+    lons = np.radians([point[2] for point in points])
+
+    def distances(lat, lon):
+        lat, lon = np.radians(lat), np.radians(lon)
+        a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return ids, distances
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--radius-km", type=float, default=25)
+    args = parser.parse_args()
+
+    index, build_ms = timed(GeoIndex, [(l["id"], l["latitude"], l["longitude"]) for l in load_landmarks()])
+    points = index.points
+    scan = brute_force(points)
+    ids, np_distances = numpy_scan(points)
+
+    rng = random.Random(0)
+    queries = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(args.queries)]
+
+    paths = {
+        "kd-tree": (
+            lambda lat, lon: index.nearest(lat, lon, args.k),
+            lambda lat, lon: index.within(lat, lon, args.radius_km),
+        ),
+        "brute force (python)": (
+            lambda lat, lon: [(i, d) for d, i in scan(lat, lon)[:args.k]],
+            lambda lat, lon: [(i, d) for d, i in scan(lat, lon) if d <= args.radius_km],
+        ),
+        "brute force (numpy)": (
+            lambda lat, lon: [(ids[row], d[row]) for d in [np_distances(lat, lon)] for row in np.argsort(d)[:args.k]],
+            lambda lat, lon: [(ids[row], d[row]) for d in [np_distances(lat, lon)] for row in np.flatnonzero(d <= args.radius_km)],
+        ),
+    }
+
+    rows, answers = [], {}
+    for name, (nearest, within) in paths.items():
+        for query_type, func in (("knn", nearest), ("radius", within)):
+            results, latencies = [], []
+            for lat, lon in queries:
+                result, elapsed = timed(func, lat, lon)
+                results.append(result)
+                latencies.append(elapsed * 1000)
+            answers[name, query_type] = results
+            row = {"path": name, "query": query_type}
+            row.update({key.replace("_ms", "_us"): value for key, value in latency_summary(latencies).items()})
+            rows.append(row)
+
+    # Same distances (ties between places at the same coordinates can swap ids)
+    for query_type in ("knn", "radius"):
+        for name in paths:
+            for got, expected in zip(answers[name, query_type], answers["brute force (python)", query_type]):
+                assert sorted(round(d, 6) for _, d in got) == sorted(round(d, 6) for _, d in expected), (name, query_type)
+
+    print(f"{len(index)} landmarks with coordinates, index built in {build_ms:.1f} ms; "
+          f"{args.queries} queries, k={args.k}, radius={args.radius_km} km; all paths agree")
+    print_table(rows, ["path", "query", "p50_us", "p95_us", "p99_us", "mean_us"])
+
+
+if __name__ == "__main__":
+    main()
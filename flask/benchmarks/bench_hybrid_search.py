@@ -0,0 +1,82 @@
+"""
+Proper-noun recall and latency of dense, BM25 and hybrid (RRF) landmark
+search, and how many received_location inputs the name resolver answers
+without the LLM.
+
+Each landmark is queried by its name written the way users type it (no
+accents, lowercase, inside a sentence); a hit is the landmark in the top k.
+
+Run from the flask folder (dense/hybrid need the embeddings and a vector
+store; --keyword-only skips them):
+    python benchmarks/bench_hybrid_search.py --k 1
+"""
+import argparse
+import random
+
+from bench_utils import latency_summary, print_table, timed
+
+from keyword_index import HybridRetriever, KeywordIndex, fold
+from landmarks import file_id, load_landmarks
+from name_resolver import get_name_resolver
+
+TEMPLATES = ["{}", "I want to go to {}", "what about {}?", "can we visit {} tomorrow", "tell me more about {}"]
+
+
+def landmark_queries(n, seed=0):
+    rng = random.Random(seed)
+    landmarks = rng.sample(load_landmarks(), min(n, len(load_landmarks())))
+    return [(landmark["id"], rng.choice(TEMPLATES).format(fold(landmark["name"]))) for landmark in landmarks]
+
+
+def evaluate(name, search, queries, k):
+    latencies, hits = [], 0
+    for landmark_id, query in queries:
+        ids, elapsed = timed(search, query, k)
+        latencies.append(elapsed)
+        hits += landmark_id in ids
+    row = {"search": name, f"recall@{k}": hits / len(queries)}
+    row.update(latency_summary(latencies))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=1)
+    parser.add_argument("--keyword-only", action="store_true")
+    args = parser.parse_args()
+
+    keyword_index, build_ms = timed(KeywordIndex.build)
+    print(f"keyword index: {len(keyword_index.ids)} documents, {len(keyword_index.terms)} terms, built in {build_ms:.0f} ms")
+    queries = landmark_queries(args.queries)
+
+    def keyword_search(query, k):
+        return [doc_id for doc_id, _, _ in keyword_index.search(query, k, source="landmarks")]
+
+    rows = [evaluate("bm25", keyword_search, queries, args.k)]
+
+    if not args.keyword_only:
+        from onnx_embeddings import load_embeddings
+        from vector_index import make_vector_store
+
+        store = make_vector_store(load_embeddings())
+        hybrid = HybridRetriever(store, keyword_index)
+
+        def ids_of(docs):
+            return [file_id(doc.metadata.get("filename", "")) for doc in docs]
+
+        rows.append(evaluate("dense", lambda q, k: ids_of(store.similarity_search(q, k=k, filter={'source': 'landmarks'})), queries, args.k))
+        rows.append(evaluate("hybrid (rrf)", lambda q, k: ids_of(hybrid.similarity_search(q, k=k, filter={'source': 'landmarks'})), queries, args.k))
+
+    print(f"{len(queries)} landmark-name queries")
+    print_table(rows, ["search", f"recall@{args.k}", "p50_ms", "p95_ms", "p99_ms"])
+
+    resolver = get_name_resolver()
+    matches = [(landmark_id, resolver.find(query)) for landmark_id, query in queries]
+    matched = sum(match is not None for _, match in matches)
+    correct = sum(match is not None and match.id == landmark_id for landmark_id, match in matches)
+    print(f"\nname resolver (skips the LLM extraction): {matched}/{len(queries)} inputs, {correct} the right landmark")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Full vs incremental rebuild time of the vector index (index_builder.py): the
+merged corpus is indexed once, then a share of the documents is edited and
+the index is brought up to date again.
+
+Run from the flask folder (needs the corpus pickle and the embeddings):
+    python benchmarks/bench_index_builder.py --changed 0.01 0.1
+"""
+import argparse
+import os
+import tempfile
+
+from bench_utils import print_table, timed
+
+from index_builder import build_index, load_corpus
+from onnx_embeddings import load_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--changed", type=float, nargs="+", default=[0.001, 0.01, 0.1],
+                        help="shares of the documents edited before each incremental run")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    embeddings = load_embeddings()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vector_index")
+        _, elapsed = timed(build_index, path, corpus, embeddings)
+        rows.append({"run": "full", "embedded": len(corpus), "seconds": elapsed / 1000})
+        for share in args.changed:
+            for doc_id in list(corpus)[:max(1, int(share * len(corpus)))]:
+                text, metadata = corpus[doc_id]
+                corpus[doc_id] = (text + " (edited)", metadata)
+            index_diff, elapsed = timed(build_index, path, corpus, embeddings)
+            rows.append({"run": f"incremental {share:.1%}", "embedded": len(index_diff.changed),
+                         "seconds": elapsed / 1000})
+    print_table(rows, ["run", "embedded", "seconds"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+suggest_locations candidates from the interest tables (interest_tables.py)
+versus the vector search it replaces: latency per lookup, and how many of the
+vector search's top 7 landmarks the tables also return (overlap@7).
+
+The tables path needs only the tables file; --vector also loads the
+embeddings and the vector store as the app does (pickled model or
+EMBEDDINGS_BACKEND=onnx, Chroma or VECTOR_BACKEND=numpy).
+
+Run from the flask folder (after python interest_tables.py):
+    python benchmarks/bench_interest_tables.py
+    python benchmarks/bench_interest_tables.py --vector
+"""
+import argparse
+import os
+
+from bench_utils import latency_summary, print_table, timed
+
+from interest_tables import INTEREST_TABLES_PATH, InterestTables
+from landmarks import location_id
+
+# (extracted interests, user message); the last ones are ad-hoc or mixed
+QUERIES = [
+    ("beaches", "I love beaches"),
+    ("hiking", "I want to go hiking"),
+    ("museums", "museums please"),
+    ("forts", "I'd like to see old forts"),
+    ("caves", "caves!"),
+    ("food", "I want to try the local food"),
+    ("hiking, beaches", "hiking and beaches"),
+    ("beaches, Rincón", "beaches in Rincón"),
+    ("museums, Ponce", "museums near Ponce"),
+    ("forts, San Juan", "forts in San Juan"),
+    ("playas y comida", "me gustan las playas y la comida"),
+    ("caves, hiking", "caves and hiking in Arecibo"),
+    ("jazz bars", "jazz bars"),
+    ("beaches, lighthouses", "beaches and lighthouses"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", default=INTEREST_TABLES_PATH)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--vector", action="store_true", help="also time the vector search and compare results")
+    args = parser.parse_args()
+    if not os.path.exists(args.tables):
+        raise SystemExit(f"{args.tables} not found: run python interest_tables.py first")
+
+    tables = InterestTables(args.tables)
+    db = None
+    if args.vector:
+        os.environ.setdefault("WARM_UP", "0")
+        os.environ.setdefault("WEATHER_FLAGS_BUILD", "0")
+        import app
+        db = app.db
+        db.similarity_search("beaches", k=1, filter={'source': 'landmarks'})  # load and warm up
+
+    from name_resolver import get_name_resolver
+    resolver = get_name_resolver()
+
+    def from_tables(interests, message):
+        categories, _ = tables.categorize(interests)
+        match = resolver.find_in_text(message, sources={"municipalities"})
+        return tables.ranked(categories, match.name if match else None, args.k)
+
+    rows = []
+    table_ms, vector_ms = [], []
+    for interests, message in QUERIES:
+        categories, ad_hoc = tables.categorize(interests)
+        ranked = []
+        for _ in range(args.repeat):
+            ranked, ms = timed(from_tables, interests, message)
+            table_ms.append(ms)
+        row = {"interests": interests, "categories": ",".join(categories) or "-",
+               "ad_hoc": ",".join(ad_hoc) or "-", "tables": len(ranked)}
+        if db is not None:
+            found = []
+            for _ in range(max(1, args.repeat // 20)):
+                found, ms = timed(db.similarity_search, message, k=args.k, filter={'source': 'landmarks'})
+                vector_ms.append(ms)
+            vector_ids = [location_id({"metadata": doc.metadata}) for doc in found]
+            row["overlap@k"] = len(set(vector_ids) & set(ranked))
+        rows.append(row)
+
+    print_table(rows, ["interests", "categories", "ad_hoc", "tables"] + (["overlap@k"] if db is not None else []))
+    print()
+    summaries = [{"path": "tables", **latency_summary(table_ms)}]
+    if vector_ms:
+        summaries.append({"path": "vector search", **latency_summary(vector_ms)})
+    print_table(summaries, ["path", "n", "p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+
+
+if __name__ == "__main__":
+    main()
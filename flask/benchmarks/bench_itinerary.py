@@ -0,0 +1,59 @@
+"""
+Itinerary optimizer on random sets of landmarks: run time of
+build_itinerary and route length of nearest neighbour + 2-opt compared with
+nearest neighbour alone and with the order the places were locked in.
+
+Run from the flask folder:
+    python benchmarks/bench_itinerary.py --sizes 5 10 25 50 100 200 300 --trials 20
+"""
+import argparse
+import datetime
+import random
+
+from bench_utils import latency_summary, print_table, timed
+
+from itinerary import build_itinerary, distance_matrix, nearest_neighbour, path_length, shortest_path
+from landmarks import landmark_document, load_landmarks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 10, 25, 50, 100, 200, 300])
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--days", type=int, default=3, help="trip length for build_itinerary")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    placed = [landmark for landmark in load_landmarks() if landmark["latitude"] is not None]
+    start = datetime.date.today()
+    travel_dates = [str(start), str(start + datetime.timedelta(days=args.days - 1))]
+
+    rows = []
+    for size in args.sizes:
+        latencies, locked_km, nn_km, opt_km = [], [], [], []
+        for _ in range(args.trials):
+            sample = rng.sample(placed, min(size, len(placed)))
+            locked = [landmark_document(landmark["id"]) for landmark in sample]
+            _, elapsed = timed(build_itinerary, locked, travel_dates)
+            latencies.append(elapsed)
+
+            distances = distance_matrix([l["latitude"] for l in sample], [l["longitude"] for l in sample])
+            nodes = list(range(len(sample)))
+            locked_km.append(path_length(nodes, distances))
+            nn_km.append(path_length(nearest_neighbour(nodes, distances), distances))
+            opt_km.append(path_length(shortest_path(nodes, distances), distances))
+        row = {
+            "stops": size,
+            "locked_order_km": sum(locked_km) / len(locked_km),
+            "nn_km": sum(nn_km) / len(nn_km),
+            "nn_2opt_km": sum(opt_km) / len(opt_km),
+        }
+        row.update(latency_summary(latencies))
+        rows.append(row)
+
+    print(f"{args.trials} random instances per size, {args.days}-day trips; build_itinerary time in ms")
+    print_table(rows, ["stops", "locked_order_km", "nn_km", "nn_2opt_km", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Semantic lookups of the LLM response cache (llm_cache.py) on the pairs in
+data/semantic_cache_pairs.json: an answer is cached for one input, then a
+near-duplicate input is looked up. Pairs whose answers differ (a negation,
+another day, a yes/no step) must miss; the others may hit.
+
+Uses the pickled embedding model when it is there, otherwise a bag-of-words
+embedding, which ignores word order and so makes the near misses look even
+closer. The threshold defaults below the app's 0.95 so they reach the checks
+behind it. Exits with an error on any wrong hit.
+
+Run from the flask folder:
+    python benchmarks/bench_llm_cache.py
+    python benchmarks/bench_llm_cache.py --threshold 0.95
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+from collections import Counter
+
+from bench_utils import DATA_DIR, print_table
+
+from llm_cache import MISS, ResponseCache, normalize_text
+
+
+class BagOfWordsEmbeddings:
+    """
+    Word-count vectors over a fixed vocabulary, with the embed_query interface.
+    """
+
+    def __init__(self, texts):
+        words = sorted({word for text in texts for word in normalize_text(text).split()})
+        self.index = {word: i for i, word in enumerate(words)}
+
+    def embed_query(self, text):
+        vector = [0.0] * len(self.index)
+        for word, n in Counter(normalize_text(text).split()).items():
+            vector[self.index[word]] = float(n)
+        return vector
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    with open(os.path.join(DATA_DIR, 'semantic_cache_pairs.json'), encoding='utf-8') as f:
+        pairs = json.load(f)
+
+    if os.path.exists('sentence_transformer_embeddings.pkl'):
+        with open('sentence_transformer_embeddings.pkl', 'rb') as f:
+            embeddings, name = pickle.load(f), "sentence transformer"
+    else:
+        embeddings = BagOfWordsEmbeddings([p["cached"] for p in pairs] + [p["query"] for p in pairs])
+        name = "bag of words"
+
+    rows, wrong = [], 0
+    for pair in pairs:
+        cache = ResponseCache(embeddings=embeddings, similarity_threshold=args.threshold)
+        cache.put(pair["function"], pair["step"], pair["cached"], "cached answer")
+        hit = cache.get(pair["function"], pair["step"], pair["query"]) is not MISS
+        wrong += hit and not pair["same_answer"]
+        rows.append({"step": pair["step"], "cached": pair["cached"], "query": pair["query"],
+                     "same_answer": pair["same_answer"], "hit": hit})
+
+    print(f"{len(pairs)} pairs, {name} embeddings, threshold {args.threshold:g}\n")
+    print_table(rows, ["step", "cached", "query", "same_answer", "hit"])
+    print(f"\nwrong hits: {wrong}")
+    if wrong:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
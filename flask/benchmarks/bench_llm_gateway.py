@@ -0,0 +1,124 @@
+"""
+Load test of the LLM gateway (llm_gateway.py) against the local mock OpenAI
+server (mock_api_server.py), next to the bare OpenAI client the app used before.
+
+Scenarios, each played by --users concurrent threads sending --calls requests:
+- slowdown: OpenAI answers in ~2 s; the gateway caps the calls in flight and
+  gives up at the deadline instead of letting every worker pile up;
+- 5xx: 20% of the calls fail with 503; the gateway retries with backoff;
+- outage: every call fails; once the breaker opens, calls fail in microseconds;
+- identical burst: everyone asks the same is_weather_dependent question at
+  once; single-flight sends it upstream once per burst.
+
+Reported per client: outcomes (ok / canned reply / error), latency
+p50/p95/p99, upstream calls and the peak of concurrent upstream calls.
+
+Run from the flask folder:
+    python benchmarks/bench_llm_gateway.py
+    python benchmarks/bench_llm_gateway.py --users 128 --max-concurrency 16 --deadline 5
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from bench_utils import latency_summary, print_table
+from mock_api_server import Latency, start_mock_api_server
+
+from llm_gateway import LLMGateway, LLMUnavailable
+
+PROMPT = ("Is the location '{}' highly dependent on weather conditions? "
+          "Return a JSON object with the key 'weather_dependent' and a boolean value.")
+
+SCENARIOS = [
+    # name, chat latency, failure rate, same prompt for everyone
+    ("slowdown", Latency("lognormal", 2000, 0.3), 0.0, False),
+    ("5xx 20%", Latency("lognormal", 300, 0.3), 0.2, False),
+    ("outage", Latency("fixed", 50), 1.0, False),
+    ("identical burst", Latency("lognormal", 400, 0.3), 0.0, True),
+]
+
+
+def ask(client, place):
+    """
+    One JSON request like is_weather_dependent; returns (outcome, ms).
+    """
+    start = time.perf_counter()
+    try:
+        client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{'role': 'user', 'content': PROMPT.format(place)}],
+            response_format={"type": "json_object"},
+            max_tokens=200,
+            temperature=0.5,
+        )
+        outcome = "ok"
+    except LLMUnavailable:
+        outcome = "canned"
+    except Exception as error:
+        outcome = type(error).__name__
+    return outcome, (time.perf_counter() - start) * 1000
+
+
+def run_scenario(server, client, scenario, users, calls):
+    name, latency, failure_rate, identical = scenario
+    server.chat_latency = latency
+    server.failure_rate = failure_rate
+    server.reset_peak()
+    before = server.snapshot()
+
+    def user(u):
+        return [ask(client, "El Yunque" if identical else f"Place {u}-{i}") for i in range(calls)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        results = [r for rows in pool.map(user, range(users)) for r in rows]
+    wall_s = time.perf_counter() - start
+    after = server.snapshot()
+
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    summary = latency_summary([ms for _, ms in results])
+    return {
+        "ok": outcomes.pop("ok", 0), "canned": outcomes.pop("canned", 0), "errors": sum(outcomes.values()),
+        "p50_ms": summary["p50_ms"], "p95_ms": summary["p95_ms"], "p99_ms": summary["p99_ms"],
+        "upstream": after["llm_calls"] - before["llm_calls"], "peak": after["peak_in_flight"],
+        "wall_s": wall_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--calls", type=int, default=5, help="requests per user")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--deadline", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = start_mock_api_server()
+    rows = []
+    for scenario in SCENARIOS:
+        # A fresh client per scenario, so the breaker starts closed
+        clients = {
+            "direct": OpenAI(base_url=f"{server.url}/v1", api_key="mock", timeout=args.deadline),
+            "gateway": LLMGateway(
+                OpenAI(base_url=f"{server.url}/v1", api_key="mock", max_retries=0),
+                max_concurrency=args.max_concurrency, deadline=args.deadline,
+                breaker_failures=5, breaker_reset=30,
+            ),
+        }
+        for label, client in clients.items():
+            row = run_scenario(server, client, scenario, args.users, args.calls)
+            rows.append({"scenario": scenario[0], "client": label, **row})
+            print(f"{scenario[0]} / {label}: done in {row['wall_s']:.1f} s")
+
+    print(f"\n{args.users} users x {args.calls} calls, gateway: {args.max_concurrency} slots, "
+          f"{args.deadline:g} s deadline\n")
+    print_table(rows, ["scenario", "client", "ok", "canned", "errors", "p50_ms", "p95_ms", "p99_ms",
+                       "upstream", "peak"])
+
+
+if __name__ == "__main__":
+    main()
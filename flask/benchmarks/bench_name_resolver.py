@@ -0,0 +1,61 @@
+"""
+Accuracy and latency of the name resolver on place names written the way
+users type them: exact, without accents, without spaces, with one typo, in
+English, and inside a sentence.
+
+Run from the flask folder:
+    python benchmarks/bench_name_resolver.py
+"""
+import json
+import random
+
+from bench_utils import latency_summary, print_table, timed
+
+from landmarks import load_landmarks, load_municipalities
+from name_resolver import TRANSLATIONS_JSON, fold, get_name_resolver
+
+
+def typo(text, rng):
+    letters = [i for i, c in enumerate(text) if c.isalpha()]
+    i = rng.choice(letters)
+    return text[:i] + rng.choice("aeioursnlt") + text[i + 1:]
+
+
+def cases(rng):
+    places = [(m["id"], m["name"]) for m in load_municipalities()]
+    places += [(l["id"], l["name"]) for l in rng.sample(load_landmarks(), 150)]
+    with open(TRANSLATIONS_JSON, encoding='utf-8') as f:
+        translations = {fold(name): english for name, english in json.load(f).items()}
+    english = [(l["id"], translations[fold(l["name"])]) for l in load_landmarks()
+               if translations.get(fold(l["name"]), l["name"]) != l["name"]]
+    return {
+        "exact": [(place_id, name) for place_id, name in places],
+        "no accents": [(place_id, fold(name)) for place_id, name in places],
+        "no spaces": [(place_id, fold(name).replace(" ", "")) for place_id, name in places if " " in name],
+        "one typo": [(place_id, typo(name, rng)) for place_id, name in places if len(name) >= 6],
+        "english": rng.sample(english, min(150, len(english))),
+        "in a sentence": [(place_id, f"I'd like to visit {fold(name)} tomorrow") for place_id, name in places],
+    }
+
+
+def main():
+    rng = random.Random(0)
+    resolver, build_ms = timed(get_name_resolver)
+    rows = []
+    for name, items in cases(rng).items():
+        resolve = resolver.find if name == "in a sentence" else resolver.resolve
+        latencies, correct, answered = [], 0, 0
+        for place_id, text in items:
+            match, elapsed = timed(resolve, text)
+            latencies.append(elapsed * 1000)
+            answered += match is not None
+            correct += match is not None and match.id == place_id
+        row = {"case": name, "inputs": len(items), "answered": answered / len(items), "correct": correct / len(items)}
+        row.update({key.replace("_ms", "_us"): value for key, value in latency_summary(latencies).items()})
+        rows.append(row)
+    print(f"resolver: {len(resolver.targets)} places, {len(resolver.aliases)} aliases, built in {build_ms:.0f} ms")
+    print_table(rows, ["case", "inputs", "answered", "correct", "p50_us", "p99_us"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Turn latency and LLM calls per turn with and without single-shot mode
+(SINGLE_SHOT=1 in app.py), using the in-process FakeOpenAI with a simulated
+per-call latency, so the difference is the number of serial round trips.
+
+Run from the flask folder (needs the app's dependencies, the embeddings
+pickle and chroma_db, but no API keys):
+    python benchmarks/bench_single_shot.py --latency-ms 400 --conversations 5
+"""
+import argparse
+import os
+import time
+
+from bench_utils import latency_summary, print_table
+from fake_openai import FakeOpenAI
+
+os.environ.setdefault("WEATHER_FLAGS_BUILD", "0")  # no background GPT calls in the counts
+import app
+from landmarks import landmark_document, load_landmarks
+
+# Replies that the local classifiers can't answer, so both modes need the LLM for them
+SCRIPT = [
+    "Hi! I'll be in Puerto Rico tomorrow and I'd love to see some beaches",
+    "The one in Culebra looks amazing, tell me about Flamenco",
+    "hmm I think I'd like to go there",
+    "I guess I could look at one more place",
+    "Something with nice views of the ocean would be good",
+    "that one I think I'd like to go there too",
+    "I think that's enough for this trip",
+    "can I get the list of places?",
+]
+
+
+class FakeVectorStore:
+    """
+    Answers similarity_search with landmarks from the structured data, without embeddings.
+    """
+
+    def similarity_search(self, query, k=4, filter=None):
+        from langchain_core.documents import Document
+        docs = [landmark_document(landmark["id"]) for landmark in load_landmarks()[:k]]
+        return [Document(page_content=doc["page_content"], metadata=doc["metadata"]) for doc in docs]
+
+
+def run_conversations(fake, conversations, single_shot):
+    app.SINGLE_SHOT = single_shot
+    latencies, calls = [], []
+    for _ in range(conversations):
+        app.llm_cache.clear()
+        current_step, conversation_state = "start", app.new_conversation_state()
+        for user_input in SCRIPT:
+            if current_step == "end":
+                break
+            fake.reset_counters()
+            start = time.perf_counter()
+            with app.app.test_request_context():
+                _, current_step, conversation_state = app.get_completion(user_input, current_step, conversation_state)
+            latencies.append((time.perf_counter() - start) * 1000)
+            calls.append(fake.calls)
+    row = {"mode": "single-shot" if single_shot else "two calls", "llm_calls/turn": sum(calls) / len(calls)}
+    row.update(latency_summary(latencies))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=400, help="simulated latency of one LLM call")
+    parser.add_argument("--conversations", type=int, default=5)
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(latency_ms=args.latency_ms)
+    app.client = fake
+    app.history_manager.client = fake
+    app.db = FakeVectorStore()
+    app.check_weather = lambda location, travel_dates: False
+
+    rows = [
+        run_conversations(fake, args.conversations, single_shot=False),
+        run_conversations(fake, args.conversations, single_shot=True),
+    ]
+    print(f"{args.conversations} scripted conversations, {args.latency_ms} ms per LLM call")
+    print_table(rows, ["mode", "llm_calls/turn", "n", "p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Small helpers shared by the benchmark scripts in this folder.
+
+The scripts are run from the flask folder, e.g.
+    python benchmarks/bench_confirm_intent.py
+"""
+import math
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+
+# Make the app modules (one folder up) importable from the scripts
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers (pct in 0-100).
+    """
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def timed(func, *args, **kwargs):
+    """
+    Call func and return (result, elapsed milliseconds).
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def latency_summary(latencies_ms):
+    """
+    p50/p95/p99/mean of a list of latencies in milliseconds.
+    """
+    return {
+        "n": len(latencies_ms),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+        "mean_ms": sum(latencies_ms) / len(latencies_ms) if latencies_ms else float('nan'),
+    }
+
+
+def print_table(rows, columns):
+    """
+    Print a list of dicts as an aligned text table.
+    """
+    widths = {c: max(len(c), *(len(_fmt(row.get(c))) for row in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
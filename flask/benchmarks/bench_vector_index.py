@@ -0,0 +1,92 @@
+"""
+Startup time and query latency of the numpy vector index versus Chroma, on
+the same collection and the same (pre-embedded) queries, plus how many of
+Chroma's top-k results the numpy index returns.
+
+Run from the flask folder after exporting the index (python vector_index.py):
+    python benchmarks/bench_vector_index.py --chroma ../chroma_db --index ../vector_index
+"""
+import argparse
+import pickle
+import time
+
+from bench_utils import latency_summary, print_table, timed
+
+from landmarks import load_landmarks
+from vector_index import NumpyVectorIndex
+
+INTEREST_QUERIES = [
+    "beaches", "snorkeling and coral reefs", "hiking in the rainforest", "colonial history and forts",
+    "museums and art", "coffee plantations", "caves", "bioluminescent bay", "surfing", "waterfalls",
+    "churches", "lighthouses", "food and nightlife", "bird watching", "festivals",
+]
+
+
+def query_texts(n):
+    names = [landmark["name"] for landmark in load_landmarks()]
+    texts = INTEREST_QUERIES + names
+    return (texts * (n // len(texts) + 1))[:n]
+
+
+def run_queries(search, vectors, k, source_filter):
+    latencies, results = [], []
+    for vector in vectors:
+        docs, elapsed = timed(search, vector, k=k, filter=source_filter)
+        latencies.append(elapsed)
+        results.append([(doc.metadata.get("filename"), doc.page_content[:80]) for doc in docs])
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chroma", default='../chroma_db')
+    parser.add_argument("--index", default='../vector_index')
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=7)
+    args = parser.parse_args()
+
+    from langchain_chroma import Chroma
+
+    # Startup: open the store and answer one query
+    with open('sentence_transformer_embeddings.pkl', 'rb') as f:
+        embeddings = pickle.load(f)
+    vectors = embeddings.embed_documents(query_texts(args.queries))
+
+    def start_chroma():
+        db = Chroma(persist_directory=args.chroma, embedding_function=embeddings)
+        db.similarity_search_by_vector(vectors[0], k=args.k)
+        return db
+
+    def start_numpy():
+        index = NumpyVectorIndex(args.index, embeddings)
+        index.similarity_search_by_vector(vectors[0], k=args.k)
+        return index
+
+    chroma, chroma_startup = timed(start_chroma)
+    index, numpy_startup = timed(start_numpy)
+
+    rows = []
+    for source_filter in (None, {'source': 'landmarks'}):
+        chroma_latencies, chroma_results = run_queries(chroma.similarity_search_by_vector, vectors, args.k, source_filter)
+        numpy_latencies, numpy_results = run_queries(index.similarity_search_by_vector, vectors, args.k, source_filter)
+        overlap = sum(len(set(a) & set(b)) for a, b in zip(chroma_results, numpy_results))
+        recall = overlap / max(1, sum(len(a) for a in chroma_results))
+        for name, startup, latencies in (("chroma", chroma_startup, chroma_latencies),
+                                         ("numpy", numpy_startup, numpy_latencies)):
+            row = {"backend": name, "filter": "landmarks" if source_filter else "none", "startup_ms": startup,
+                   "recall@k": 1.0 if name == "chroma" else recall}
+            row.update(latency_summary(latencies))
+            rows.append(row)
+
+    print(f"{len(index)} documents, {args.queries} queries, k={args.k}")
+    print_table(rows, ["backend", "filter", "startup_ms", "recall@k", "p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+
+    # Same check with the query embedded inside the call, as app.py does it
+    start = time.perf_counter()
+    for text in query_texts(50):
+        index.similarity_search(text, k=args.k, filter={'source': 'landmarks'})
+    print(f"\nnumpy similarity_search with query embedding: {(time.perf_counter() - start) * 1000 / 50:.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
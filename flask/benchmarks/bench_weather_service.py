@@ -0,0 +1,75 @@
+"""
+Weather lookups through the old per-call find_weather_forecast versus the
+pooled, cached ForecastService, against the local OpenWeather stub.
+
+Run from the flask folder:
+    python benchmarks/bench_weather_service.py --lookups 300 --latency-ms 80
+
+Simulates many sessions asking for random (municipality, date) pairs, then
+times a full prefetch sweep of all 78 municipalities.
+"""
+import argparse
+import datetime
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_utils import latency_summary, print_table, timed
+from openweather_stub import start_openweather_stub
+
+from chatbot_funcs import find_weather_forecast, valid_locations
+from weather_service import ForecastService
+
+
+def run_lookups(name, lookup, requests, workers, stub):
+    served_before = stub.requests_served
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = [elapsed for _, elapsed in pool.map(lambda args: timed(lookup, *args), requests)]
+    row = {
+        "path": name,
+        "wall_s": time.perf_counter() - start,
+        "api_calls": stub.requests_served - served_before,
+    }
+    row.update(latency_summary(latencies))
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=16, help="concurrent sessions")
+    parser.add_argument("--latency-ms", type=float, default=80, help="simulated API latency")
+    args = parser.parse_args()
+
+    stub = start_openweather_stub(latency_ms=args.latency_ms)
+    rng = random.Random(0)
+    today = datetime.date.today()
+    requests = [
+        (str(today + datetime.timedelta(days=rng.randint(0, 4))), rng.choice(valid_locations))
+        for _ in range(args.lookups)
+    ]
+
+    rows = [run_lookups(
+        "find_weather_forecast",
+        lambda date, location: find_weather_forecast(date, location, "stub", base_url=stub.forecast_url),
+        requests, args.workers, stub,
+    )]
+
+    service = ForecastService("stub", base_url=stub.forecast_url, pool_size=args.workers)
+    rows.append(run_lookups("ForecastService (cold)", lambda date, location: service.daily(location, date), requests, args.workers, stub))
+    rows.append(run_lookups("ForecastService (warm)", lambda date, location: service.daily(location, date), requests, args.workers, stub))
+
+    print(f"{args.lookups} lookups, {args.workers} concurrent sessions, {args.latency_ms} ms simulated API latency")
+    print_table(rows, ["path", "wall_s", "api_calls", "p50_ms", "p99_ms", "mean_ms"])
+
+    sweep_service = ForecastService("stub", base_url=stub.forecast_url, pool_size=args.workers)
+    served_before = stub.requests_served
+    warmed, elapsed = timed(sweep_service.prefetch_all)
+    print(f"\nprefetch sweep: {warmed} municipalities warmed in {elapsed:.0f} ms "
+          f"with {stub.requests_served - served_before} API calls")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
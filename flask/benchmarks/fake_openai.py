@@ -0,0 +1,139 @@
+"""
+In-process stand-in for the OpenAI client, for benchmarks that compare code
+paths without a real API key.
+
+FakeOpenAI mimics client.chat.completions.create (plain, JSON-object,
+JSON-schema and streaming requests), sleeps for a configurable latency to
+simulate the network + generation time, and answers with canned structured
+results picked from patterns in the prompt. It counts calls and prompt tokens.
+"""
+import datetime
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from history import count_tokens
+
+CANNED_REPLY = (
+    "Sounds great! Puerto Rico has a lot to offer. Let me know if you have any questions "
+    "about this place, or if you'd like me to add it to your trip."
+)
+
+
+def canned_fields(properties):
+    """
+    Plausible values for the extracted fields of a JSON schema.
+    """
+    tomorrow = str(datetime.date.today() + datetime.timedelta(days=1))
+    values = {
+        "travel_dates": [tomorrow],
+        "interests": "beaches",
+        "current_location": "Flamenco Beach",
+        "user_decision": "accept",
+        "confirm": True,
+    }
+    return {name: values.get(name) for name in properties}
+
+
+def canned_json(prompt):
+    """
+    Canned answer to one of the app's JSON-object prompts, picked by pattern.
+    """
+    if "'results'" in prompt:
+        names = [place["name"] for place in json.loads(prompt.split("Places: ", 1)[1])]
+        return {"results": {name: True for name in names}}
+    if "'confirm'" in prompt:
+        return {"confirm": True}
+    if "user_decision" in prompt:
+        return {"user_decision": "accept"}
+    if "current_location" in prompt:
+        return {"current_location": "Flamenco Beach"}
+    if "'weather_dependent'" in prompt:
+        return {"weather_dependent": True}
+    if '"bad_weather"' in prompt:
+        return {"bad_weather": False}
+    if "travel_dates" in prompt:
+        return canned_fields(["travel_dates", "interests"])
+    if "interests" in prompt:
+        return {"interests": "beaches"}
+    return {}
+
+
+def canned_answer(kwargs):
+    """
+    Content of the answer to a chat.completions.create request.
+    """
+    prompt = kwargs["messages"][-1]["content"]
+    response_format = kwargs.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]["properties"]
+        return json.dumps({
+            "fields": canned_fields(schema["fields"]["properties"]),
+            "assumed_action": schema["assumed_action"]["enum"][0],
+            "reply": CANNED_REPLY,
+        })
+    if response_format.get("type") == "json_object":
+        return json.dumps(canned_json(prompt))
+    return CANNED_REPLY
+
+
+class _Completions:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def create(self, **kwargs):
+        self.fake.record(kwargs)
+        content = canned_answer(kwargs)
+        if kwargs.get("stream"):
+            return self.fake.stream(content)
+        time.sleep(self.fake.latency())
+        return self.fake.completion(kwargs, content)
+
+
+class FakeOpenAI:
+    """
+    Parameters:
+    latency_ms (float): Mean simulated latency of one completion.
+    jitter (float): Relative spread of the latency (0.3 = +-30%).
+    token_ms (float): Simulated time per streamed token.
+    """
+
+    def __init__(self, latency_ms=400, jitter=0.3, token_ms=0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.token_ms = token_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def latency(self):
+        with self._lock:
+            spread = self._rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.latency_ms * (1 + spread)) / 1000
+
+    def record(self, kwargs):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += count_tokens(kwargs["messages"])
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls = 0
+            self.prompt_tokens = 0
+
+    def completion(self, kwargs, content):
+        message = SimpleNamespace(role="assistant", content=content)
+        usage = SimpleNamespace(prompt_tokens=count_tokens(kwargs["messages"]), completion_tokens=len(content) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage)
+
+    def stream(self, content):
+        time.sleep(self.latency())  # time to first token
+        for word in content.split(" "):
+            if self.token_ms:
+                time.sleep(self.token_ms / 1000)
+            delta = SimpleNamespace(content=word + " ")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
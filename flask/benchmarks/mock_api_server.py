@@ -0,0 +1,246 @@
+"""
+Local HTTP stand-in for the OpenAI chat-completions API and the OpenWeather
+forecast API, so the whole app (the real OpenAI client, requests to
+OpenWeather) can be benchmarked without keys or network.
+
+- POST /v1/chat/completions answers plain, JSON-object, JSON-schema and
+  streaming requests with the canned answers of fake_openai.py (picked by
+  patterns in the prompt). `server.overrides` replaces fields of the JSON
+  answers, e.g. {"bad_weather": True} for a scripted turn.
+- GET /data/2.5/forecast answers like openweather_stub.py.
+- Each API sleeps for a latency drawn from its own distribution
+  (fixed, uniform or lognormal), and the server counts calls and prompt tokens.
+- `server.failure_rate` makes that share of chat calls fail with
+  `server.failure_status` (503 by default, or 429), to test retries and the
+  circuit breaker; the server also records the peak of concurrent chat calls.
+
+Point the app at it before importing app.py:
+    server = start_mock_api_server(chat_latency=Latency("lognormal", 400, 0.4))
+    os.environ.update(server.environ())
+"""
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from fake_openai import canned_answer
+from openweather_stub import fake_forecast
+
+from history import count_tokens
+
+
+class Latency:
+    """
+    Latency distribution in milliseconds.
+
+    Parameters:
+    kind (str): "fixed", "uniform" (median_ms +- spread) or "lognormal"
+        (median median_ms, spread = sigma of the log).
+    median_ms (float): Median latency.
+    spread (float): Relative spread (uniform) or log-sigma (lognormal).
+    """
+
+    def __init__(self, kind="lognormal", median_ms=400, spread=0.4, seed=0):
+        self.kind = kind
+        self.median_ms = median_ms
+        self.spread = spread
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Latency from "kind:median_ms[:spread]", e.g. "lognormal:400:0.4" or "fixed:0".
+        """
+        parts = text.split(":")
+        return cls(parts[0], float(parts[1]) if len(parts) > 1 else 0, float(parts[2]) if len(parts) > 2 else 0.4)
+
+    def sample(self):
+        """
+        One latency in seconds.
+        """
+        with self._lock:
+            if self.kind == "fixed":
+                ms = self.median_ms
+            elif self.kind == "uniform":
+                ms = self.median_ms * (1 + self._rng.uniform(-self.spread, self.spread))
+            else:
+                ms = self.median_ms * math.exp(self._rng.gauss(0, self.spread))
+        return max(0.0, ms) / 1000
+
+    def __repr__(self):
+        return f"{self.kind}:{self.median_ms:g}:{self.spread:g}"
+
+
+def scripted_answer(body, overrides):
+    """
+    Canned answer to a chat-completions request, with the override fields applied.
+    """
+    content = canned_answer(body)
+    if not overrides or (body.get("response_format") or {}).get("type") not in ("json_object", "json_schema"):
+        return content
+    answer = json.loads(content)
+    fields = answer.get("fields", answer)
+    for key, value in overrides.items():
+        if key in fields:
+            fields[key] = value
+    return json.dumps(answer)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/data/2.5/forecast":
+            self.send_error(404)
+            return
+        params = parse_qs(url.query)
+        time.sleep(self.server.weather_latency.sample())
+        self.server.count("forecast_requests")
+        self._send_json(fake_forecast(params.get("q", params.get("lat", ["0"]))[0]))
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/v1/chat/completions":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.enter()
+        try:
+            self._answer(body)
+        finally:
+            self.server.leave()
+
+    def _answer(self, body):
+        prompt_tokens = count_tokens(body.get("messages", []))
+        self.server.count("llm_calls")
+        self.server.count("prompt_tokens", prompt_tokens)
+        content = scripted_answer(body, self.server.overrides)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "gpt-4o-mini")
+
+        time.sleep(self.server.chat_latency.sample())  # time to first token
+        if self.server.should_fail():
+            self.server.count("failures")
+            self._send_json({"error": {"message": "mock failure", "type": "server_error", "code": None}},
+                            status=self.server.failure_status)
+            return
+        if not body.get("stream"):
+            self._send_json({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                          "total_tokens": prompt_tokens + len(content) // 4},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            if self.server.token_ms:
+                time.sleep(self.server.token_ms / 1000)
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")},
+                                  "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, chat_latency, weather_latency, token_ms=0, port=0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.chat_latency = chat_latency
+        self.weather_latency = weather_latency
+        self.token_ms = token_ms
+        self.overrides = {}
+        self.failure_rate = 0.0
+        self.failure_status = 503
+        self.counters = {"llm_calls": 0, "prompt_tokens": 0, "forecast_requests": 0, "failures": 0}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._rng = random.Random(1)
+        self._lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def should_fail(self):
+        with self._lock:
+            return self._rng.random() < self.failure_rate
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.counters, "peak_in_flight": self.peak_in_flight}
+
+    def reset_peak(self):
+        with self._lock:
+            self.peak_in_flight = self.in_flight
+
+    def environ(self):
+        """
+        Environment variables that point the OpenAI client and the weather service here.
+        """
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_KEY": "mock",
+            "WEATHER_API_KEY": "mock",
+            "OPENWEATHER_FORECAST_URL": f"{self.url}/data/2.5/forecast",
+        }
+
+
+def start_mock_api_server(chat_latency=None, weather_latency=None, token_ms=0, port=0):
+    """
+    Start the server on a background thread and return it.
+    """
+    server = MockApiServer(chat_latency or Latency("fixed", 0), weather_latency or Latency("fixed", 0), token_ms, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mock OpenAI + OpenWeather server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chat-latency", type=Latency.parse, default=Latency("lognormal", 400, 0.4))
+    parser.add_argument("--weather-latency", type=Latency.parse, default=Latency("fixed", 80))
+    args = parser.parse_args()
+    mock = start_mock_api_server(args.chat_latency, args.weather_latency, port=args.port)
+    print(f"Mock API server on {mock.url}")
+    for name, value in mock.environ().items():
+        print(f"export {name}={value}")
+    threading.Event().wait()
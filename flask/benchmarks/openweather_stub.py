@@ -0,0 +1,92 @@
+"""
+Local stand-in for the OpenWeather 5-day forecast API (/data/2.5/forecast),
+for benchmarks that must run without a real API key or network.
+
+It answers any q= or lat=/lon= request with a deterministic 40-slot forecast
+starting today, after an optional artificial delay, and counts the requests
+it served.
+
+    server = start_openweather_stub(latency_ms=80)
+    url = server.forecast_url        # http://127.0.0.1:<port>/data/2.5/forecast
+    ...
+    server.shutdown()
+"""
+import datetime
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CONDITIONS = ["clear sky", "few clouds", "scattered clouds", "light rain", "moderate rain", "thunderstorm"]
+
+
+def fake_forecast(seed, start=None):
+    """
+    A deterministic 40-slot (5 days x 8) forecast in OpenWeather's format.
+    """
+    rng = random.Random(seed)
+    start = start or datetime.datetime.combine(datetime.date.today(), datetime.time())
+    slots = []
+    for i in range(40):
+        when = start + datetime.timedelta(hours=3 * i)
+        temp = 24 + 6 * rng.random()
+        slots.append({
+            "dt": int(when.timestamp()),
+            "dt_txt": when.strftime("%Y-%m-%d %H:%M:%S"),
+            "main": {
+                "temp": temp, "feels_like": temp + 2, "temp_min": temp - 1, "temp_max": temp + 1,
+                "pressure": 1013, "sea_level": 1013, "grnd_level": 1005, "humidity": rng.randint(60, 95),
+            },
+            "weather": [{"description": rng.choice(CONDITIONS)}],
+        })
+    return {"cod": "200", "cnt": 40, "list": slots}
+
+
+class _ForecastHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection pooling is visible
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/data/2.5/forecast":
+            self.send_error(404)
+            return
+        params = parse_qs(url.query)
+        seed = params.get("q", params.get("lat", ["0"]))[0]
+
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+        with self.server.lock:
+            self.server.requests_served += 1
+
+        body = json.dumps(fake_forecast(seed)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_openweather_stub(latency_ms=0, port=0):
+    """
+    Start the stub on a background thread and return the server
+    (with .forecast_url and .requests_served).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), _ForecastHandler)
+    server.daemon_threads = True
+    server.latency_ms = latency_ms
+    server.requests_served = 0
+    server.lock = threading.Lock()
+    server.forecast_url = f"http://127.0.0.1:{server.server_address[1]}/data/2.5/forecast"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    stub = start_openweather_stub()
+    print(f"OpenWeather stub listening on {stub.forecast_url}")
+    threading.Event().wait()
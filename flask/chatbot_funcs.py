@@ -1,8 +1,10 @@
 import requests
 
+from weather_service import ForecastService, OPENWEATHER_FORECAST_URL
+from name_resolver import get_name_resolver
+
 # 🔹 Function to get the weather forecast for a specific location and date using OpenWeather API
-def find_weather_forecast(date, location, openweather_api_key):
-    base_url = "https://api.openweathermap.org/data/2.5/forecast"
+def find_weather_forecast(date, location, openweather_api_key, base_url=OPENWEATHER_FORECAST_URL):
 
     # Make a request to OpenWeather API with the location and date
     params = {
@@ -15,31 +17,34 @@ def find_weather_forecast(date, location, openweather_api_key):
     response = requests.get(base_url, params=params)
 
     if response.status_code == 200:
-        data = response.json()
-
-        # Check for available forecasts for the requested date
-        for forecast in data['list']:
-            if forecast['dt_txt'].startswith(date):  # Date format: "YYYY-MM-DD"
-                # Convert temperature from Celsius to Fahrenheit
-                temp_fahrenheit = (forecast['main']['temp'] * 9/5) + 32
-                feels_like_fahrenheit = (forecast['main']['feels_like'] * 9/5) + 32
-
-                # Return the data along with the units
-                return {
-                    'temp': {'value': temp_fahrenheit, 'unit': '°F'},
-                    'feels_like': {'value': feels_like_fahrenheit, 'unit': '°F'},
-                    'temp_min': {'value': (forecast['main']['temp_min'] * 9/5) + 32, 'unit': '°F'},
-                    'temp_max': {'value': (forecast['main']['temp_max'] * 9/5) + 32, 'unit': '°F'},
-                    'pressure': {'value': forecast['main']['pressure'], 'unit': 'hPa'},
-                    'sea_level': {'value': forecast['main']['sea_level'], 'unit': 'hPa'},
-                    'grnd_level': {'value': forecast['main']['grnd_level'], 'unit': 'hPa'},
-                    'humidity': {'value': forecast['main']['humidity'], 'unit': '%'},
-                    'weather': forecast['weather'][0]['description']
-                }
-
-        return "No forecast available for this date."
+        return parse_forecast(response.json(), date)
     else:
         return "Error fetching data from OpenWeather API."
+
+
+# 🔹 Pick the forecast for the requested date out of the OpenWeather response
+def parse_forecast(data, date):
+    # Check for available forecasts for the requested date
+    for forecast in data['list']:
+        if forecast['dt_txt'].startswith(date):  # Date format: "YYYY-MM-DD"
+            # Convert temperature from Celsius to Fahrenheit
+            temp_fahrenheit = (forecast['main']['temp'] * 9/5) + 32
+            feels_like_fahrenheit = (forecast['main']['feels_like'] * 9/5) + 32
+
+            # Return the data along with the units
+            return {
+                'temp': {'value': temp_fahrenheit, 'unit': '°F'},
+                'feels_like': {'value': feels_like_fahrenheit, 'unit': '°F'},
+                'temp_min': {'value': (forecast['main']['temp_min'] * 9/5) + 32, 'unit': '°F'},
+                'temp_max': {'value': (forecast['main']['temp_max'] * 9/5) + 32, 'unit': '°F'},
+                'pressure': {'value': forecast['main']['pressure'], 'unit': 'hPa'},
+                'sea_level': {'value': forecast['main']['sea_level'], 'unit': 'hPa'},
+                'grnd_level': {'value': forecast['main']['grnd_level'], 'unit': 'hPa'},
+                'humidity': {'value': forecast['main']['humidity'], 'unit': '%'},
+                'weather': forecast['weather'][0]['description']
+            }
+
+    return "No forecast available for this date."
     
 
 from datetime import datetime, timedelta
@@ -56,23 +61,11 @@ valid_locations = [
     "yabucoa", "yauco"
 ]
 
-# 🔹 Mapping variations of municipalities with special characters or spaces to their canonical names
-location_mapping = {
-    "anasco": "añasco", "bayamon": "bayamón", "canovanas": "canóvanas", "catano": "cataño",
-    "comerio": "comerío", "guanica": "guánica", "juana diaz": "juana díaz", "las marias": "las marías",
-    "loiza": "loíza", "manati": "manatí", "mayaguez": "mayagüez", "penuelas": "peñuelas", "rincon": "rincón",
-    "rio grande": "río grande", "san german": "san germán", "san sebastian": "san sebastián", "juanadiaz": "juana díaz",
-    "lasmarias": "las marías", "laspiedras": "las piedras", "riogrande": "río grande", "sabanagrande": "sabana grande",
-    "sangerman": "san germán", "sanjuan": "san juan", "sanlorenzo": "san lorenzo", "sansebastian": "san sebastián",
-    "santaisabel": "santa isabel", "toaalta": "toa alta", "toabaja": "toa baja", "trujilloalto": "trujillo alto",
-    "vegaalta": "vega alta", "vegabaja": "vega baja"
-}
-
 # 🔹 Function to validate the date format (YYYY-MM-DD) and ensure it's within the next 5 days
 def validate_date(date):
     try:
         valid_date = datetime.strptime(date, "%Y-%m-%d")
-        today = datetime.today()
+        today = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
         if valid_date < today or valid_date > today + timedelta(days=5):
             return None  # Out of the valid date range (more than 5 days ahead)
         return valid_date
@@ -81,24 +74,12 @@ def validate_date(date):
 
 # 🔹 Function to normalize and validate location (case-insensitive, check for valid locations)
 def validate_location(location):
-    # Remove extra spaces and convert to lowercase
-    location = location.strip().lower()
-
-    # Replace location variations with their canonical names
-    for key, value in location_mapping.items():
-        if key in location:
-            location = value
-            break  # Stop checking further once a match is found
-
-    # Normalize input by handling cases like 'San Juan', 'san juan', 'San Juan, PR'
-    if location.endswith(", pr"):
-        location = location.replace(", pr", "")  # Remove the ", pr" part for simpler comparison
-
-    # Check if location is in the list of valid Puerto Rican municipalities
-    if location in valid_locations:
-        return location.capitalize()  # Return the location with proper capitalization
-
-    return None  # If not found, return None
+    """
+    Canonical name of the Puerto Rican municipality in `location` ("sanjuan",
+    "San Juan, PR", "mayaguex"...), or None if it isn't one.
+    """
+    match = get_name_resolver().resolve(location, sources={"municipalities"})
+    return match.name if match is not None else None
 
 # 🔹 Function to validate weather preferences and handle contradictory preferences (e.g., 'sunny' and 'rainy')
 def validate_weather_preferences(user_preferences):
@@ -123,10 +104,40 @@ def get_weather(date, location, openweather_api_key):
     valid_date = validate_date(date)
     # Validate location (check if it's a valid Puerto Rican municipality)
     validated_location = validate_location(location)
+    if valid_date is None:
+        # Past or beyond the 5-day forecast: don't spend a request on it
+        return "No forecast available for this date."
 
     
-    forecast = find_weather_forecast(date, location, openweather_api_key)
+    # Daily aggregate from the shared, cached forecast (one fetch per municipality per refresh window)
+    forecast = get_forecast_service(openweather_api_key).daily(location, date)
     # Generate the recommendation based on the weather
+    return weather_recommendation(forecast)
+
+
+# 🔹 Async version of get_weather (same validation, non-blocking fetch)
+async def get_weather_async(date, location, openweather_api_key, http_client):
+    valid_date = validate_date(date)
+    validated_location = validate_location(location)
+    if valid_date is None:
+        # Past or beyond the 5-day forecast: don't spend a request on it
+        return "No forecast available for this date."
+
+    forecast = await get_forecast_service(openweather_api_key).daily_async(location, date, http_client)
+    return weather_recommendation(forecast)
+
+
+# 🔹 One forecast service for the whole process, so every session shares its cache and connection pool
+forecast_service = None
+
+def get_forecast_service(openweather_api_key):
+    global forecast_service
+    if forecast_service is None:
+        forecast_service = ForecastService(openweather_api_key)
+    return forecast_service
+
+
+def weather_recommendation(forecast):
     if forecast == "No forecast available for this date.":
         return "No forecast available for this date."
     elif forecast == "Error fetching data from OpenWeather API.":
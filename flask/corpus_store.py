@@ -0,0 +1,193 @@
+"""
+Columnar, memory-mapped store for the document corpus (news, landmarks,
+municipalities) that lives in saves/*.pkl as pickled lists of Documents.
+
+Every consumer of the pickles had to unpickle all ~2,300 Documents, and the
+notebooks picked a source by index ranges (merged_data[1668:1673]). A store
+is a directory of numpy columns, in the same spirit as vector_index.py:
+
+    source.npy, year.npy, municipality.npy   small codes (int8/int16/int32)
+    latitude.npy, longitude.npy              float64, NaN when unknown
+    text.npy, text_offsets.npy               utf-8 bytes of every page_content
+    metadata.npy, metadata_offsets.npy       utf-8 JSON of every metadata dict
+    strings.json                             ids, names, dates and the code tables
+
+Columns are memory-mapped, so opening a store reads only strings.json.
+Filters on source, year and municipality run on the small code columns
+(no text is touched), and Documents are decoded lazily, one row at a time.
+
+Convert the pickles from the flask folder:
+    python corpus_store.py                                   # merged pickle -> saves/corpus
+    python corpus_store.py --pickle ../saves/all_docs.pkl --out ../saves/all_docs
+"""
+import json
+import os
+import pickle
+import re
+
+import numpy as np
+
+from landmarks import SAVES_DIR
+from name_resolver import fold
+
+CORPUS_DIR = os.path.join(SAVES_DIR, 'corpus')
+MERGED_PKL = os.path.join(SAVES_DIR, 'news_landmarks_municipalities_merged.pkl')
+STRINGS_FILE = 'strings.json'
+
+
+def document_year(metadata):
+    """
+    Year of a news article ("May 27, 1922" or filename 19220527_1.txt), or None.
+    """
+    match = re.search(r"\b(1[89]\d\d|20\d\d)\b", str(metadata.get("date", "")))
+    if match is None:
+        match = re.match(r"(1[89]\d\d|20\d\d)\d{4}_", str(metadata.get("filename", "")))
+    return int(match.group(1)) if match else None
+
+
+def _municipality(metadata):
+    # Some landmarks have NaN instead of a municipality
+    municipality = metadata.get("municipality")
+    return municipality if isinstance(municipality, str) and municipality else None
+
+
+def _blob(texts):
+    # utf-8 bytes of all texts back to back, and the offsets of each one
+    encoded = [text.encode('utf-8') for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def write_store(documents, out_dir):
+    """
+    Write Documents (anything with page_content and metadata) as a store directory.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    metadatas = [dict(doc.metadata) for doc in documents]
+    sources = sorted({str(metadata.get("source")) for metadata in metadatas})
+    municipalities = sorted({_municipality(m) for m in metadatas} - {None})
+
+    columns = {
+        "source": np.array([sources.index(str(m.get("source"))) for m in metadatas], dtype=np.int8),
+        "year": np.array([document_year(m) or -1 for m in metadatas], dtype=np.int16),
+        "municipality": np.array([municipalities.index(_municipality(m)) if _municipality(m) else -1
+                                  for m in metadatas], dtype=np.int32),
+        "latitude": np.array([m.get("latitude", np.nan) or np.nan for m in metadatas], dtype=np.float64),
+        "longitude": np.array([m.get("longitude", np.nan) or np.nan for m in metadatas], dtype=np.float64),
+    }
+    columns["text"], columns["text_offsets"] = _blob([doc.page_content for doc in documents])
+    columns["metadata"], columns["metadata_offsets"] = _blob(
+        [json.dumps(m, ensure_ascii=False, separators=(',', ':')) for m in metadatas])
+    for name, values in columns.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), values)
+
+    strings = {
+        "ids": [f"{m.get('source')}/{m.get('filename')}" for m in metadatas],
+        "names": [m.get("landmark") or (_municipality(m) if m.get("source") == "municipalities" else None)
+                  or m.get("filename") for m in metadatas],
+        "dates": [m.get("date") for m in metadatas],
+        "sources": sources,
+        "municipalities": municipalities,
+    }
+    with open(os.path.join(out_dir, STRINGS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(strings, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Saved {len(documents)} documents to {out_dir}")
+
+
+def convert(pickle_path=MERGED_PKL, out_dir=CORPUS_DIR):
+    """
+    Convert a pickled list of Documents into a store directory.
+    """
+    with open(pickle_path, 'rb') as f:
+        documents = pickle.load(f)
+    write_store(documents, out_dir)
+
+
+class CorpusStore:
+    """
+    Read side of a store directory.
+
+    Parameters:
+    path (str): Store directory.
+    """
+
+    def __init__(self, path=CORPUS_DIR):
+        self.path = path
+        with open(os.path.join(path, STRINGS_FILE), encoding='utf-8') as f:
+            strings = json.load(f)
+        self.ids = strings["ids"]
+        self.names = strings["names"]
+        self.dates = strings["dates"]
+        self.sources = strings["sources"]
+        self.municipalities = strings["municipalities"]
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def column(self, name):
+        """
+        Memory-mapped column (source, year, municipality, latitude, longitude...).
+        """
+        values = self._columns.get(name)
+        if values is None:
+            values = self._columns[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+        return values
+
+    def select(self, source=None, year=None, municipality=None):
+        """
+        Rows matching every given predicate, in store order.
+
+        Parameters:
+        source (str or set): "news", "landmarks", "municipalities".
+        year (int or tuple): A year or an inclusive (first, last) range (news only have years).
+        municipality (str or set): Municipality names, accents and case ignored.
+
+        Returns:
+        numpy.ndarray: Row numbers.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if source is not None:
+            wanted = {source} if isinstance(source, str) else set(source)
+            mask &= np.isin(self.column("source"), [i for i, name in enumerate(self.sources) if name in wanted])
+        if year is not None:
+            first, last = year if isinstance(year, tuple) else (year, year)
+            years = self.column("year")
+            mask &= (years >= first) & (years <= last)
+        if municipality is not None:
+            wanted = {fold(municipality)} if isinstance(municipality, str) else {fold(m) for m in municipality}
+            codes = [i for i, name in enumerate(self.municipalities) if fold(name) in wanted]
+            mask &= np.isin(self.column("municipality"), codes)
+        return np.flatnonzero(mask)
+
+    def _decode(self, name, row):
+        offsets = self.column(f"{name}_offsets")
+        return bytes(self.column(name)[offsets[row]:offsets[row + 1]]).decode('utf-8')
+
+    def text(self, row):
+        return self._decode("text", row)
+
+    def metadata(self, row):
+        return json.loads(self._decode("metadata", row))
+
+    def document(self, row):
+        from vector_index import make_document
+        return make_document(self.text(row), self.metadata(row))
+
+    def documents(self, **filters):
+        """
+        Documents of the rows matching the filters (see select), decoded one at a time.
+        """
+        for row in self.select(**filters):
+            yield self.document(int(row))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a pickled list of Documents into a corpus store")
+    parser.add_argument("--pickle", default=MERGED_PKL)
+    parser.add_argument("--out", default=CORPUS_DIR)
+    args = parser.parse_args()
+    convert(args.pickle, args.out)
@@ -0,0 +1,260 @@
+"""
+Deterministic parser for the travel dates in English and Spanish messages.
+
+The start step used to send every opening message to gpt-4o-mini mostly to
+turn "February 15" or "next weekend" into YYYY-MM-DD. parse_dates() handles
+the usual expressions locally (microseconds):
+
+- absolute dates: "2025-03-15", "3/15", "March 15th", "15 de marzo de 2025",
+  "the 15th of March", "el día 15"
+- ranges: "March 15-18", "15–18 de marzo", "del 15 al 18 de marzo",
+  "from March 30 to April 2", "between the 15th and 18th of March"
+- relative days: "today", "tomorrow", "the day after tomorrow", "in 3 days",
+  "hoy", "mañana", "pasado mañana", "dentro de tres días", "next week"
+- weekdays and weekends: "on Friday", "next Friday", "el próximo viernes",
+  "this weekend", "el fin de semana que viene"
+
+Dates without a year are this year, or next year if they already passed.
+Ranges are expanded to every day in them.
+"""
+import datetime
+import re
+import unicodedata
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8, "september": 9,
+    "sept": 9, "sep": 9, "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12,
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6, "julio": 7, "agosto": 8,
+    "septiembre": 9, "setiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+    "lunes": 0, "martes": 1, "miercoles": 2, "jueves": 3, "viernes": 4, "sabado": 5, "domingo": 6,
+}
+NUMBERS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "a": 1, "un": 1, "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6, "siete": 7,
+    "ocho": 8, "nueve": 9, "diez": 10,
+}
+SPANISH_HINTS = {"de", "del", "el", "al", "hoy", "manana", "dia", "dias", "semana", "proximo", "este", "voy", "quiero"}
+
+# Longest ranges expanded into days
+MAX_RANGE_DAYS = 31
+
+_MONTH = "(?P<{}>" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+_DAY = r"(?P<{}>[0-3]?\d)(?:st|nd|rd|th|ro|do|to|vo|mo|no)?"
+_YEAR = r"(?:,?\s*(?:de(?:l)?\s+)?(?P<{}>\d{{4}}))?"
+_WEEKDAY = "(?P<weekday>" + "|".join(WEEKDAYS) + ")"
+_RANGE = r"\s*(?:-|to|through|thru|until|till|al|a|hasta)\s*"
+_NUMBER = r"(?P<n>\d{1,2}|" + "|".join(sorted(NUMBERS, key=len, reverse=True)) + ")"
+
+
+# (name, regex) in priority order; matched text is blanked out so later patterns can't reuse it
+PATTERNS = [
+    ("iso", re.compile(r"\b(?P<y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})\b")),
+    ("numeric", re.compile(r"\b(?P<a>\d{1,2})/(?P<b>\d{1,2})(?:/(?P<y>\d{2,4}))?\b")),
+    # March 30 to April 2 / 30 de marzo al 2 de abril
+    ("range_two_months", re.compile(
+        r"\b(?:from\s+|between\s+|del\s+|desde\s+(?:el\s+)?|entre\s+(?:el\s+)?)?(?:the\s+)?"
+        + "(?:" + _MONTH.format("m1") + r"\s+(?:the\s+)?" + _DAY.format("d1")
+        + "|" + _DAY.format("d1b") + r"\s+(?:of\s+|de\s+)?" + _MONTH.format("m1b") + ")"
+        + r"\s*(?P<sep>-|to|through|thru|until|till|al|a|hasta|and|y)\s*(?:el\s+|the\s+)?"
+        + "(?:" + _MONTH.format("m2") + r"\s+(?:the\s+)?" + _DAY.format("d2")
+        + "|" + _DAY.format("d2b") + r"\s+(?:of\s+|de\s+)?" + _MONTH.format("m2b") + ")"
+        + _YEAR.format("y") + r"\b"
+    )),
+    # March 15-18 / March 15 to 18
+    ("range_month_first", re.compile(
+        r"\b" + _MONTH.format("m") + r"\s+(?:the\s+)?" + _DAY.format("d1") + _RANGE
+        + r"(?:the\s+)?" + _DAY.format("d2") + _YEAR.format("y") + r"\b"
+    )),
+    # 15-18 de marzo / del 15 al 18 de marzo / between the 15th and 18th of March
+    ("range_day_first", re.compile(
+        r"\b(?:from\s+|between\s+|del\s+|desde\s+(?:el\s+)?|entre\s+(?:el\s+)?)?(?:the\s+)?" + _DAY.format("d1")
+        + r"\s*(?P<sep>-|to|through|thru|until|till|al|a|hasta|and|y)\s*(?:el\s+|the\s+)?" + _DAY.format("d2")
+        + r"\s+(?:of\s+|de\s+)?" + _MONTH.format("m") + _YEAR.format("y") + r"\b"
+    )),
+    ("month_first", re.compile(r"\b" + _MONTH.format("m") + r"\s+(?:the\s+)?" + _DAY.format("d") + _YEAR.format("y") + r"\b")),
+    ("day_first", re.compile(r"\b(?:the\s+)?" + _DAY.format("d") + r"\s+(?:of\s+|de\s+)?" + _MONTH.format("m") + _YEAR.format("y") + r"\b")),
+    ("day_after_tomorrow", re.compile(r"\b(?:the\s+)?day\s+after\s+tomorrow\b|\bpasado\s+manana\b")),
+    ("today", re.compile(r"\b(?:today|tonight|hoy|esta\s+noche)\b")),
+    ("tomorrow", re.compile(r"\btomorrow\b|(?<!la )(?<!esta )\bmanana\b")),
+    ("in_days", re.compile(r"\b(?:in|en|dentro\s+de)\s+" + _NUMBER + r"\s+(?:days?|dias?)\b")),
+    ("next_weekend", re.compile(
+        r"\bnext\s+weekend\b|\b(?:el\s+)?(?:proximo\s+fin\s+de\s+semana|fin\s+de\s+semana\s+que\s+viene)\b")),
+    ("next_week", re.compile(r"\bnext\s+week\b|\b(?:la\s+)?(?:proxima\s+semana|semana\s+que\s+viene)\b")),
+    ("weekend", re.compile(r"\b(?:this|the)\s+weekend\b|\b(?:este|el)\s+fin\s+de\s+semana\b")),
+    ("next_weekday", re.compile(r"\bnext\s+" + _WEEKDAY + r"\b|\b(?:el\s+)?proximo\s+" + _WEEKDAY.replace("weekday", "weekday2")
+                              + r"\b|\b(?:el\s+)?" + _WEEKDAY.replace("weekday", "weekday3") + r"\s+que\s+viene\b")),
+    ("weekday", re.compile(r"\b(?:(?:this|on|este|el)\s+)?" + _WEEKDAY + r"\b")),
+    ("day_only", re.compile(r"\b(?:the\s+(?P<d>[0-3]?\d)(?:st|nd|rd|th)|el\s+dia\s+(?P<d2>[0-3]?\d))\b")),
+]
+
+
+def fold(text):
+    """
+    Lowercase, accent-free text with dashes as "-".
+    """
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[‐-―]", "-", text)
+
+
+def _date(year, month, day):
+    try:
+        return datetime.date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _with_year(month, day, year, today):
+    """
+    Date from month/day, this year unless it already passed (then next year).
+    """
+    if year:
+        year = int(year)
+        return _date(year + 2000 if year < 100 else year, month, day)
+    date = _date(today.year, month, day)
+    if date is not None and date < today:
+        date = _date(today.year + 1, month, day)
+    return date
+
+
+def _days(start, end, match=None):
+    if match is not None and match.group("sep") in ("and", "y") and not re.match(r"(between|entre)\b", match.group(0)):
+        return [day for day in (start, end) if day is not None]  # "March 3 and March 5" are two dates
+    if start is None or end is None or end < start or (end - start).days >= MAX_RANGE_DAYS:
+        return [start] if start is not None else []
+    return [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _weekend(today, weeks_ahead=0):
+    # Saturday and Sunday of this week (only Sunday if today is Sunday), plus weeks_ahead weeks
+    saturday = today + datetime.timedelta(days=(5 - today.weekday()) % 7)
+    if today.weekday() == 6:
+        days = [today]
+    else:
+        days = [saturday, saturday + datetime.timedelta(days=1)]
+    if weeks_ahead:
+        if today.weekday() == 6:
+            days = [today + datetime.timedelta(days=6), today + datetime.timedelta(days=7)]
+        else:
+            days = [day + datetime.timedelta(days=7 * weeks_ahead) for day in days]
+    return days
+
+
+def _match_dates(name, match, today, spanish):
+    groups = match.groupdict()
+    if name == "iso":
+        return [_date(int(groups["y"]), int(groups["m"]), int(groups["d"]))]
+    if name == "numeric":
+        a, b = int(groups["a"]), int(groups["b"])
+        # month/day in English, day/month in Spanish, unless only one order is possible
+        month, day = (b, a) if (spanish and a <= 31 and b <= 12) or a > 12 else (a, b)
+        return [_with_year(month, day, groups["y"], today)]
+    if name == "range_two_months":
+        m1, d1 = groups["m1"] or groups["m1b"], groups["d1"] or groups["d1b"]
+        m2, d2 = groups["m2"] or groups["m2b"], groups["d2"] or groups["d2b"]
+        start = _with_year(MONTHS[m1], int(d1), groups["y"], today)
+        end = _with_year(MONTHS[m2], int(d2), groups["y"], today)
+        if start is not None and end is not None and end < start and not groups["y"]:
+            end = _date(end.year + 1, end.month, end.day)
+        return _days(start, end, match)
+    if name in ("range_month_first", "range_day_first"):
+        month = MONTHS[groups["m"]]
+        start = _with_year(month, int(groups["d1"]), groups["y"], today)
+        end = _date(start.year, month, int(groups["d2"])) if start is not None else None
+        return _days(start, end, match if name == "range_day_first" else None)
+    if name in ("month_first", "day_first"):
+        return [_with_year(MONTHS[groups["m"]], int(groups["d"]), groups["y"], today)]
+    if name == "today":
+        return [today]
+    if name == "tomorrow":
+        return [today + datetime.timedelta(days=1)]
+    if name == "day_after_tomorrow":
+        return [today + datetime.timedelta(days=2)]
+    if name == "in_days":
+        n = groups["n"]
+        return [today + datetime.timedelta(days=int(n) if n.isdigit() else NUMBERS[n])]
+    if name == "next_week":
+        monday = today + datetime.timedelta(days=7 - today.weekday())
+        return _days(monday, monday + datetime.timedelta(days=6))
+    if name == "weekend":
+        return _weekend(today)
+    if name == "next_weekend":
+        return _weekend(today, weeks_ahead=1)
+    if name in ("weekday", "next_weekday"):
+        weekday = WEEKDAYS[groups.get("weekday") or groups.get("weekday2") or groups.get("weekday3")]
+        date = today + datetime.timedelta(days=(weekday - today.weekday()) % 7)
+        if name == "next_weekday" and date.isocalendar()[1] == today.isocalendar()[1]:
+            date += datetime.timedelta(days=7)  # "next Friday" is the Friday of next week
+        return [date]
+    if name == "day_only":
+        day = int(groups["d"] or groups["d2"])
+        date = _date(today.year, today.month, day)
+        if date is not None and date < today:
+            month = today.month % 12 + 1
+            date = _date(today.year + (month == 1), month, day)
+        return [date]
+    return []
+
+
+def find_dates(text, today=None):
+    """
+    Dates mentioned in the text and the character spans they came from.
+
+    Returns:
+    tuple: (sorted list of datetime.date, list of (start, end) spans in the folded text)
+    """
+    today = today or datetime.date.today()
+    folded = fold(text)
+    spanish = bool(SPANISH_HINTS & set(re.findall(r"\w+", folded)))
+    dates, spans = set(), []
+    remaining = folded
+    for name, pattern in PATTERNS:
+        for match in pattern.finditer(remaining):
+            found = [date for date in _match_dates(name, match, today, spanish) if date is not None]
+            if not found:
+                continue
+            dates.update(found)
+            spans.append(match.span())
+        # Blank out what this pattern used (same length, so spans stay valid)
+        for start, end in spans:
+            remaining = remaining[:start] + " " * (end - start) + remaining[end:]
+    return sorted(dates), sorted(spans)
+
+
+def parse_dates(text, today=None):
+    """
+    Travel dates in the text as YYYY-MM-DD strings, or None if there are none.
+    """
+    dates, _ = find_dates(text, today)
+    return [str(date) for date in dates] or None
+
+
+# 🔹 Words that can surround a date without saying anything else ("Hi! I'll be there on March 15")
+FILLER_WORDS = {
+    "hi", "hello", "hey", "hola", "buenas", "buenos", "good", "morning", "afternoon", "evening", "tardes", "dias",
+    "i", "im", "ill", "we", "well", "were", "will", "be", "am", "are", "is", "its", "it", "my", "our", "me", "us",
+    "on", "in", "at", "for", "from", "to", "the", "a", "an", "and", "of", "around", "about", "between",
+    "there", "here", "trip", "travel", "traveling", "travelling", "visiting", "visit", "going", "go", "coming",
+    "arrive", "arriving", "arrival", "staying", "stay", "want", "wanna", "need", "dates", "date", "plan", "planning", "would", "like",
+    "puerto", "rico", "pr", "island", "thanks", "thank", "you", "please", "so", "just", "then", "only",
+    "el", "la", "los", "las", "de", "del", "al", "y", "en", "a", "para", "desde", "hasta", "entre", "voy",
+    "vamos", "vengo", "venimos", "estare", "estaremos", "estoy", "llego", "llegamos", "viajo", "viajamos",
+    "viaje", "mi", "nuestro", "gracias", "por", "favor", "s", "ll", "m", "re",
+}
+
+
+def only_dates(text, today=None):
+    """
+    True if the text is dates and filler words only (no interests or questions to extract).
+    """
+    dates, spans = find_dates(text, today)
+    if not dates:
+        return False
+    folded = fold(text)
+    for start, end in spans:
+        folded = folded[:start] + " " * (end - start) + folded[end:]
+    return all(word in FILLER_WORDS for word in re.findall(r"[a-z]+", folded))
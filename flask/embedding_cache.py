@@ -0,0 +1,212 @@
+"""
+Query-embedding cache and micro-batching in front of the sentence-transformer
+embeddings.
+
+Every similarity_search (received_location, suggest_locations,
+answer_questions), the intent classifier and the semantic LLM cache encode
+their query on CPU, which is the biggest local cost of a turn, and many
+queries repeat ("beaches", "hiking", "yes"). CachedEmbeddings wraps the
+pickled HuggingFaceEmbeddings with the same embed_query/embed_documents
+interface and:
+
+- keeps the vectors of the last `max_entries` queries (LRU), keyed on the
+  normalized text. all-MiniLM-L6-v2 has an uncased tokenizer that also strips
+  accents, so "Beaches", "beaches " and "béaches" really have the same vector.
+- sends cache misses through a queue: a worker thread waits up to
+  `batch_window_ms` for queries from other requests and encodes them all in a
+  single encode call. The same text requested twice while in flight is
+  encoded once.
+
+stats() gives the hit rate and the batch sizes.
+"""
+import queue
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def embedding_key(text):
+    """
+    Cache key of a query: lowercase, no accents, single spaces (what the
+    uncased tokenizer sees anyway).
+    """
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+class CachedEmbeddings:
+    """
+    Parameters:
+    embeddings: LangChain embeddings object to wrap (e.g. sentence_transformer_embeddings).
+    max_entries (int): Query vectors kept before the least recently used is evicted
+        (384 floats = 1.5 KB each for all-MiniLM-L6-v2).
+    batch_window_ms (float): How long the encoder waits to fill a batch; 0 encodes
+        every miss right away in the calling thread.
+    max_batch (int): Max queries per encode call.
+    """
+
+    def __init__(self, embeddings, max_entries=4096, batch_window_ms=5, max_batch=32):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+
+        self._vectors = OrderedDict()  # key -> float32 vector
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.max_batch_seen = 0
+
+    def __getattr__(self, name):
+        # Anything else (model_name, client...) comes from the wrapped object
+        if "embeddings" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.__dict__["embeddings"], name)
+
+    def __getstate__(self):
+        return {"embeddings": self.embeddings, "max_entries": self.max_entries,
+                "batch_window_ms": self.batch_window * 1000, "max_batch": self.max_batch}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    # 🔹 Cache
+
+    def _cached(self, key):
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+                self.hits += 1
+                return vector, None
+            self.misses += 1
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = Future()
+                return None, (future, True)
+            return None, (future, False)
+
+    def _store(self, keys, vectors):
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._vectors[key] = vector
+                self._vectors.move_to_end(key)
+                future = self._inflight.pop(key, None)
+                if future is not None:
+                    future.set_result(vector)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+    def _fail(self, keys, error):
+        with self._lock:
+            for key in keys:
+                future = self._inflight.pop(key, None)
+                if future is not None:
+                    future.set_exception(error)
+
+    # 🔹 Encoding
+
+    def _encode(self, keys):
+        try:
+            vectors = np.asarray(self.embeddings.embed_documents(keys), dtype=np.float32)
+        except Exception as error:
+            self._fail(keys, error)
+            raise
+        with self._lock:
+            self.batches += 1
+            self.batched_queries += len(keys)
+            self.max_batch_seen = max(self.max_batch_seen, len(keys))
+        self._store(keys, list(vectors))
+        return vectors
+
+    def _run_worker(self):
+        while True:
+            keys = [self._queue.get()]
+            # Gather whatever else arrives within the window
+            deadline = time.monotonic() + self.batch_window
+            while len(keys) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    keys.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._encode(keys)
+            except Exception as error:
+                print(f"embedding batch of {len(keys)} failed: {error}")
+
+    def _submit(self, key):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_worker, name="embedding-batcher", daemon=True)
+                self._worker.start()
+        self._queue.put(key)
+
+    def _vector(self, text):
+        key = embedding_key(text)
+        vector, pending = self._cached(key)
+        if vector is not None:
+            return vector
+        future, owner = pending
+        if owner:
+            if self.batch_window > 0:
+                self._submit(key)
+            else:
+                self._encode([key])
+        return future.result()
+
+    # 🔹 LangChain Embeddings interface
+
+    def embed_query(self, text):
+        return self._vector(text).tolist()
+
+    def embed_documents(self, texts):
+        """
+        Cached rows come from the cache, the rest are encoded in one call.
+        """
+        keys = [embedding_key(text) for text in texts]
+        with self._lock:
+            # Cached vectors are taken now: they may be evicted while the rest is encoded
+            vectors = {}
+            for key in dict.fromkeys(keys):
+                if key in self._vectors:
+                    vectors[key] = self._vectors[key]
+                    self._vectors.move_to_end(key)
+            missing = [key for key in dict.fromkeys(keys) if key not in vectors and key not in self._inflight]
+            for key in missing:
+                self._inflight[key] = Future()
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+            pending = {key: self._inflight[key] for key in keys if key not in vectors}
+        if missing:
+            vectors.update(zip(missing, self._encode(missing)))
+        return [(vectors[key] if key in vectors else pending[key].result()).tolist() for key in keys]
+
+    def stats(self):
+        """
+        Hit rate and batch-size counters, e.g. for logging or a debug endpoint.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._vectors),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "batches": self.batches,
+                "mean_batch_size": self.batched_queries / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_batch_seen,
+            }
@@ -0,0 +1,203 @@
+"""
+Spatial index over the landmark coordinates, for "near X" suggestions.
+
+Retrieval used to ignore the Latitude/Longitude columns of the structured
+data. GeoIndex is a small KD-tree answering k-nearest and radius queries in
+great-circle (haversine) distance, in microseconds and without any LLM or
+vector call. Points are stored as 3D unit vectors: the straight-line (chord)
+distance between two of them grows with the great-circle distance, so the
+Euclidean KD-tree gives exact haversine results.
+
+suggest_locations uses it to keep the suggestions close to a municipality the
+user names ("beaches near Fajardo") or to the places already locked.
+"""
+import math
+import os
+
+from landmarks import landmarks_by_id, load_landmarks, load_municipalities, location_id, normalize_name
+
+EARTH_RADIUS_KM = 6371.0088
+
+# 🔹 Default radius of "near" for suggestions (Puerto Rico is ~180 x 65 km)
+NEARBY_RADIUS_KM = float(os.getenv("NEARBY_RADIUS_KM", "25"))
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km between two (lat, lon) points in degrees.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _unit_vector(lat, lon):
+    lat, lon = math.radians(lat), math.radians(lon)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord(km):
+    # Straight-line distance between unit vectors that are `km` apart on the surface
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+def _km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class GeoIndex:
+    """
+    KD-tree over (id, latitude, longitude) points.
+
+    Parameters:
+    points (list): (id, latitude, longitude) tuples; points without coordinates are skipped.
+    leaf_size (int): Points per leaf, scanned linearly.
+    """
+
+    def __init__(self, points, leaf_size=8):
+        self.points = [(point_id, lat, lon) for point_id, lat, lon in points if lat is not None and lon is not None]
+        self.vectors = [_unit_vector(lat, lon) for _, lat, lon in self.points]
+        self.leaf_size = leaf_size
+        self.root = self._build(list(range(len(self.points))), 0)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, rows, depth):
+        # Node: ("leaf", rows) or ("split", axis, value, left, right)
+        if len(rows) <= self.leaf_size:
+            return ("leaf", rows)
+        axis = depth % 3
+        rows.sort(key=lambda row: self.vectors[row][axis])
+        middle = len(rows) // 2
+        value = self.vectors[rows[middle]][axis]
+        return ("split", axis, value, self._build(rows[:middle], depth + 1), self._build(rows[middle:], depth + 1))
+
+    def _squared(self, row, query):
+        x, y, z = self.vectors[row]
+        return (x - query[0]) ** 2 + (y - query[1]) ** 2 + (z - query[2]) ** 2
+
+    def within(self, lat, lon, radius_km):
+        """
+        (id, distance km) of every point within radius_km, nearest first.
+        """
+        query = _unit_vector(lat, lon)
+        limit = _chord(radius_km) ** 2
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node[0] == "leaf":
+                for row in node[1]:
+                    squared = self._squared(row, query)
+                    if squared <= limit:
+                        found.append((squared, row))
+                continue
+            _, axis, value, left, right = node
+            gap = query[axis] - value
+            if gap < 0 or gap * gap <= limit:
+                stack.append(left)
+            if gap >= 0 or gap * gap <= limit:
+                stack.append(right)
+        found.sort()
+        return [(self.points[row][0], _km(math.sqrt(squared))) for squared, row in found]
+
+    def nearest(self, lat, lon, k=5):
+        """
+        (id, distance km) of the k nearest points, nearest first.
+        """
+        query = _unit_vector(lat, lon)
+        best = []  # sorted (squared chord, row), at most k
+
+        def visit(node):
+            if node[0] == "leaf":
+                for row in node[1]:
+                    squared = self._squared(row, query)
+                    if len(best) < k or squared < best[-1][0]:
+                        best.append((squared, row))
+                        best.sort()
+                        del best[k:]
+                return
+            _, axis, value, left, right = node
+            gap = query[axis] - value
+            near, far = (left, right) if gap < 0 else (right, left)
+            visit(near)
+            if len(best) < k or gap * gap < best[-1][0]:
+                visit(far)
+
+        if k > 0:
+            visit(self.root)
+        return [(self.points[row][0], _km(math.sqrt(squared))) for squared, row in best]
+
+
+_landmark_geo_index = None
+
+
+def landmark_geo_index():
+    """
+    Shared GeoIndex of the landmarks (ids as in landmarks.py).
+    """
+    global _landmark_geo_index
+    if _landmark_geo_index is None:
+        _landmark_geo_index = GeoIndex(
+            [(landmark["id"], landmark["latitude"], landmark["longitude"]) for landmark in load_landmarks()]
+        )
+    return _landmark_geo_index
+
+
+def municipality_coordinates(name):
+    """
+    (latitude, longitude) of a municipality by name, or None.
+    """
+    key = normalize_name(name)
+    for municipality in load_municipalities():
+        if normalize_name(municipality["name"]) == key:
+            return municipality["latitude"], municipality["longitude"]
+    return None
+
+
+def location_coordinates(location):
+    """
+    (latitude, longitude) of a location dict from conversation_state, or None.
+    """
+    landmark = landmarks_by_id().get(location_id(location))
+    if landmark is None or landmark["latitude"] is None:
+        return None
+    return landmark["latitude"], landmark["longitude"]
+
+
+def distances_from(anchors, radius_km=NEARBY_RADIUS_KM):
+    """
+    {landmark id: km to the closest anchor} for every landmark within radius_km
+    of at least one of the (lat, lon) anchors.
+    """
+    index = landmark_geo_index()
+    distances = {}
+    for lat, lon in anchors:
+        for landmark_id, km in index.within(lat, lon, radius_km):
+            if km < distances.get(landmark_id, math.inf):
+                distances[landmark_id] = km
+    return distances
+
+
+def nearby_first(locations, anchors, radius_km=NEARBY_RADIUS_KM, min_keep=3):
+    """
+    Keep the locations within radius_km of an anchor, closest first. If fewer
+    than min_keep are that close, the rest follow in their original order, so a
+    sparse area never leaves the user without suggestions.
+
+    Parameters:
+    locations (list): Location dicts ({"page_content", "metadata"}), e.g. search results.
+    anchors (list): (lat, lon) points the suggestions should be near.
+
+    Returns:
+    list: The reordered (and possibly shortened) locations.
+    """
+    if not anchors:
+        return locations
+    distances = distances_from(anchors, radius_km)
+    near = [location for location in locations if location_id(location) in distances]
+    near.sort(key=lambda location: distances[location_id(location)])
+    if len(near) >= min_keep:
+        return near
+    return near + [location for location in locations if location_id(location) not in distances]
@@ -0,0 +1,136 @@
+"""
+Token-budgeted conversation history for chat().
+
+chat() used to send the whole conversation_state["messages"] list with every
+completion, so prompt size (and cost and latency) grew with every turn. The
+HistoryManager keeps the last few turns verbatim and folds everything older
+into a running summary. The summary is stored in the conversation state
+(so it's cached per session) and is only recomputed when the verbatim part
+goes over the token budget.
+
+State keys it adds to conversation_state:
+    history_summary    running summary of the folded turns ("" at first)
+    summarized_upto    number of messages already folded into the summary
+    last_prompt_tokens prompt size of the last chat() call
+"""
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o / gpt-4o-mini tokenizer
+except Exception:  # not installed, or the encoding can't be downloaded
+    _encoding = None
+
+
+def count_tokens(messages):
+    """
+    Approximate prompt tokens of a list of chat messages (exact with tiktoken,
+    ~4 characters per token without it).
+    """
+    total = 0
+    for message in messages:
+        content = message.get("content") or ""
+        total += 4 + (len(_encoding.encode(content)) if _encoding else len(content) // 4 + 1)
+    return total + 2
+
+
+class HistoryManager:
+    """
+    Parameters:
+    client: OpenAI client used to write the summaries.
+    budget_tokens (int): Max tokens of verbatim history before older turns are folded.
+    keep_turns (int): Turns (user message + reply) always kept verbatim.
+    summary_max_tokens (int): Length limit of the summary.
+    """
+
+    def __init__(self, client, budget_tokens=2000, keep_turns=4, summary_max_tokens=300):
+        self.client = client
+        self.budget_tokens = budget_tokens
+        self.keep_turns = keep_turns
+        self.summary_max_tokens = summary_max_tokens
+
+    def _recent(self, conversation_state):
+        messages = conversation_state.get("messages", [])
+        return messages[conversation_state.get("summarized_upto", 0):]
+
+    def needs_compaction(self, conversation_state):
+        recent = self._recent(conversation_state)
+        return len(recent) > 2 * self.keep_turns and count_tokens(recent) > self.budget_tokens
+
+    def summary_request(self, conversation_state):
+        """
+        Messages for the summarization call, and the new summarized_upto.
+        Folds every verbatim message except the last keep_turns turns.
+        """
+        messages = conversation_state.get("messages", [])
+        start = conversation_state.get("summarized_upto", 0)
+        upto = len(messages) - 2 * self.keep_turns
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages[start:upto])
+        prompt = f"""You are summarizing a conversation between a Puerto Rico tourism chatbot and a user.
+        Update the summary below with the new part of the conversation. Keep every fact needed to continue
+        helping the user: travel dates, interests, places suggested, accepted, declined or locked, and open questions.
+        Be brief.
+
+        Current summary: {conversation_state.get("history_summary") or "(none)"}
+
+        New part of the conversation:
+        {transcript}"""
+        return [{"role": "user", "content": prompt}], upto
+
+    def apply_summary(self, conversation_state, summary, upto):
+        conversation_state["history_summary"] = summary
+        conversation_state["summarized_upto"] = upto
+        return conversation_state
+
+    def compact(self, conversation_state):
+        """
+        Fold older turns into the summary if the verbatim history is over budget.
+        """
+        if not self.needs_compaction(conversation_state):
+            return conversation_state
+        messages, upto = self.summary_request(conversation_state)
+        response = self.client.chat.completions.create(
+            span_name="compact",
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=self.summary_max_tokens,
+            temperature=0
+        )
+        print(f"history compacted: {upto} messages folded into the summary")
+        return self.apply_summary(conversation_state, response.choices[0].message.content, upto)
+
+    async def compact_async(self, conversation_state, aclient):
+        """
+        Async version of compact, for async_app.py.
+        """
+        if not self.needs_compaction(conversation_state):
+            return conversation_state
+        messages, upto = self.summary_request(conversation_state)
+        response = await aclient.chat.completions.create(
+            span_name="compact",
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=self.summary_max_tokens,
+            temperature=0
+        )
+        return self.apply_summary(conversation_state, response.choices[0].message.content, upto)
+
+    def prompt_history(self, conversation_state):
+        """
+        History to send with chat(): the summary (if any) plus the verbatim recent turns.
+        """
+        history = []
+        if conversation_state.get("history_summary"):
+            history.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation: {conversation_state['history_summary']}"
+            })
+        return history + self._recent(conversation_state)
+
+    def report(self, conversation_state, messages):
+        """
+        Record and print the prompt size of this turn.
+        """
+        tokens = count_tokens(messages)
+        conversation_state["last_prompt_tokens"] = tokens
+        print(f"prompt tokens: {tokens} ({len(messages)} messages, "
+              f"{conversation_state.get('summarized_upto', 0)} folded into the summary)")
+        return tokens
@@ -0,0 +1,278 @@
+"""
+Incremental builder for the vector index (the numpy index directory of
+vector_index.py, or a Chroma persist directory).
+
+chroma_db was built once in the notebook with Chroma.from_documents over the
+whole merged pickle, so any edited landmark description or new batch of news
+meant re-embedding all ~2,300 documents. This builder keeps a manifest of
+document id -> content hash next to the index and, on each run:
+
+- embeds only the new and changed documents, in batches;
+- reuses the stored vectors of the unchanged ones and drops the removed ones;
+- writes the result to a new staging directory, then swaps it in by
+  replacing a symlink (an atomic rename), so a running app never sees a
+  half-written index. Workers keep the version they opened until restarted.
+
+The output path is a symlink to the current version (<path>.<timestamp>); the
+previous version is kept and older ones are deleted. Document ids are
+"<source>/<filename>" (e.g. "landmarks/el_morro.txt"), unique in the corpus.
+
+Run from the flask folder (embeddings picked as in the app, see onnx_embeddings.py):
+    python index_builder.py --out ../vector_index
+    python index_builder.py --backend chroma --out ../chroma_db
+    python index_builder.py --out ../vector_index --dry-run    # only print the diff
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from corpus_store import CORPUS_DIR, MERGED_PKL, CorpusStore
+from vector_index import DOCUMENTS_FILE, VECTOR_INDEX_DIR, VECTORS_FILE, save_index
+
+MANIFEST_FILE = 'manifest.json'
+# Collection name langchain_chroma.Chroma opens by default
+CHROMA_COLLECTION = "langchain"
+
+IndexDiff = namedtuple("IndexDiff", ["added", "changed", "removed", "unchanged"])
+
+
+def document_id(metadata):
+    return f"{metadata.get('source')}/{metadata.get('filename')}"
+
+
+def content_hash(page_content, metadata):
+    """
+    sha256 of the text and metadata, so editing either re-embeds or rewrites the document.
+    """
+    payload = json.dumps([page_content, metadata], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_corpus(path=None):
+    """
+    {id: (page_content, metadata)} of the documents in a corpus store directory
+    (see corpus_store.py) or a pickled list of Documents. Default: saves/corpus
+    if it was converted, otherwise the merged pickle.
+    """
+    path = path or (CORPUS_DIR if os.path.isdir(CORPUS_DIR) else MERGED_PKL)
+    if os.path.isdir(path):
+        store = CorpusStore(path)
+        return {store.ids[row]: (store.text(row), store.metadata(row)) for row in range(len(store))}
+    with open(path, 'rb') as f:
+        documents = pickle.load(f)
+    return {document_id(doc.metadata): (doc.page_content, dict(doc.metadata)) for doc in documents}
+
+
+def embeddings_tag():
+    """
+    Name of the embedding model in use; a different one means re-embedding everything.
+    """
+    if os.getenv("EMBEDDINGS_BACKEND", "pickle") == "onnx":
+        return f"onnx:{os.getenv('EMBEDDINGS_ONNX_FILE', 'model.onnx')}"
+    return "pickle:all-MiniLM-L6-v2"
+
+
+def read_manifest(index_dir):
+    path = os.path.join(index_dir, MANIFEST_FILE) if index_dir else None
+    if path is None or not os.path.exists(path):
+        return {"embeddings": None, "hashes": {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_manifest(index_dir, tag, hashes):
+    with open(os.path.join(index_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"embeddings": tag, "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "hashes": hashes}, f)
+
+
+def diff_corpus(old_hashes, hashes):
+    """
+    Which document ids were added, changed, removed or left unchanged.
+    """
+    added = [doc_id for doc_id in hashes if doc_id not in old_hashes]
+    changed = [doc_id for doc_id in hashes if doc_id in old_hashes and old_hashes[doc_id] != hashes[doc_id]]
+    removed = [doc_id for doc_id in old_hashes if doc_id not in hashes]
+    unchanged = [doc_id for doc_id in hashes if old_hashes.get(doc_id) == hashes[doc_id]]
+    return IndexDiff(added, changed, removed, unchanged)
+
+
+def embed_in_batches(embeddings, texts, batch_size=64):
+    """
+    float32 matrix of the embeddings of the texts, encoded batch_size at a time.
+    """
+    rows = []
+    for start in range(0, len(texts), batch_size):
+        rows.extend(embeddings.embed_documents(texts[start:start + batch_size]))
+        print(f"Embedded {min(start + batch_size, len(texts))}/{len(texts)} documents")
+    return np.asarray(rows, dtype=np.float32)
+
+
+# 🔹 Versioned directories behind a symlink
+def current_version(path):
+    """
+    Directory the index path points to, or None if there is no index yet.
+    """
+    return os.path.realpath(path) if os.path.exists(path) else None
+
+
+def staging_dir(path):
+    staging = f"{os.path.abspath(path)}.{time.strftime('%Y%m%d-%H%M%S')}"
+    suffix = 1
+    while os.path.exists(staging):
+        staging = f"{os.path.abspath(path)}.{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        suffix += 1
+    return staging
+
+
+def adopt_in_place_index(path):
+    """
+    Turn an index written in place (e.g. by vector_index.py) into the first
+    version behind a symlink. Only this first time is the path briefly missing.
+    """
+    path = os.path.abspath(path)
+    if os.path.isdir(path) and not os.path.islink(path):
+        os.rename(path, f"{path}.initial")
+        os.symlink(os.path.basename(f"{path}.initial"), path)
+
+
+def swap_in(path, staging):
+    """
+    Point `path` at the staging directory with an atomic symlink replace.
+    """
+    path = os.path.abspath(path)
+    link = f"{path}.swap"
+    if os.path.lexists(link):
+        os.unlink(link)
+    os.symlink(os.path.basename(staging), link)
+    os.replace(link, path)
+    print(f"{path} -> {os.path.basename(staging)}")
+
+
+def prune_versions(path, keep):
+    """
+    Delete old version directories of the index, keeping the given ones.
+    """
+    path = os.path.abspath(path)
+    folder, name = os.path.split(path)
+    for entry in os.listdir(folder):
+        version = os.path.join(folder, entry)
+        if entry.startswith(name + ".") and os.path.isdir(version) and not os.path.islink(version) \
+                and version not in keep:
+            shutil.rmtree(version)
+            print(f"Removed old index version {entry}")
+
+
+# 🔹 Backends
+def build_numpy(staging, previous, corpus, index_diff, new_vectors):
+    """
+    Write a numpy index directory: stored vectors for unchanged documents, new ones for the rest.
+    """
+    old_rows = {}
+    old_vectors = None
+    if previous is not None and index_diff.unchanged:
+        with open(os.path.join(previous, DOCUMENTS_FILE), encoding='utf-8') as f:
+            old_rows = {doc_id: row for row, doc_id in enumerate(json.load(f)["ids"])}
+        old_vectors = np.load(os.path.join(previous, VECTORS_FILE), mmap_mode='r')
+
+    ids = list(corpus)
+    dim = new_vectors.shape[1] if len(new_vectors) else old_vectors.shape[1]
+    vectors = np.empty((len(ids), dim), dtype=np.float32)
+    new_rows = {doc_id: i for i, doc_id in enumerate(index_diff.added + index_diff.changed)}
+    for row, doc_id in enumerate(ids):
+        vectors[row] = new_vectors[new_rows[doc_id]] if doc_id in new_rows else old_vectors[old_rows[doc_id]]
+    save_index(staging, ids, vectors, [corpus[i][0] for i in ids], [corpus[i][1] for i in ids])
+
+
+def build_chroma(staging, previous, corpus, index_diff, new_vectors, batch_size=256):
+    """
+    Copy the current Chroma directory to staging (when there is one) and
+    upsert/delete the documents that differ.
+    """
+    import chromadb
+
+    if previous is not None and index_diff.unchanged:
+        shutil.copytree(previous, staging)
+    collection = chromadb.PersistentClient(path=staging).get_or_create_collection(CHROMA_COLLECTION)
+    if index_diff.removed:
+        collection.delete(ids=index_diff.removed)
+    upserts = index_diff.added + index_diff.changed
+    for start in range(0, len(upserts), batch_size):
+        batch = upserts[start:start + batch_size]
+        collection.upsert(
+            ids=batch,
+            embeddings=new_vectors[start:start + batch_size].tolist(),
+            documents=[corpus[doc_id][0] for doc_id in batch],
+            metadatas=[corpus[doc_id][1] for doc_id in batch],
+        )
+    print(f"Chroma collection at {staging}: {collection.count()} documents")
+
+
+def build_index(path, corpus, embeddings, backend="numpy", batch_size=64, full=False, dry_run=False):
+    """
+    Bring the index at `path` up to date with the corpus.
+
+    Parameters:
+    corpus (dict): {id: (page_content, metadata)}, see load_corpus.
+    embeddings: Embeddings object (embed_documents), or None for a dry run.
+    full (bool): Re-embed everything even if the manifest matches.
+
+    Returns:
+    IndexDiff: What changed.
+    """
+    previous = current_version(path)
+    manifest = read_manifest(previous)
+    tag = embeddings_tag()
+    if full or manifest["embeddings"] != tag:
+        manifest = {"embeddings": tag, "hashes": {}}  # no usable vectors: start over
+    hashes = {doc_id: content_hash(text, metadata) for doc_id, (text, metadata) in corpus.items()}
+    index_diff = diff_corpus(manifest["hashes"], hashes)
+    print(f"{len(index_diff.added)} new, {len(index_diff.changed)} changed, {len(index_diff.removed)} removed, "
+          f"{len(index_diff.unchanged)} unchanged documents")
+    if dry_run or not (index_diff.added or index_diff.changed or index_diff.removed):
+        return index_diff
+
+    start = time.perf_counter()
+    adopt_in_place_index(path)
+    previous = current_version(path)
+    to_embed = index_diff.added + index_diff.changed
+    new_vectors = embed_in_batches(embeddings, [corpus[doc_id][0] for doc_id in to_embed], batch_size)
+
+    staging = staging_dir(path)
+    if backend == "chroma":
+        build_chroma(staging, previous, corpus, index_diff, new_vectors)
+    else:
+        build_numpy(staging, previous, corpus, index_diff, new_vectors)
+    write_manifest(staging, tag, hashes)
+    swap_in(path, staging)
+    prune_versions(path, keep={staging, previous})
+    print(f"Index rebuilt in {time.perf_counter() - start:.1f} s")
+    return index_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally (re)build the vector index")
+    parser.add_argument("--backend", choices=["numpy", "chroma"], default="numpy")
+    parser.add_argument("--out", default=VECTOR_INDEX_DIR, help="index path (a symlink to the current version)")
+    parser.add_argument("--corpus", default=None, help="corpus store directory or pickled list of Documents")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--full", action="store_true", help="re-embed every document")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would change")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    embeddings = None
+    if not args.dry_run:
+        from onnx_embeddings import load_embeddings
+        embeddings = load_embeddings()
+    build_index(args.out, corpus, embeddings, args.backend, args.batch_size, args.full, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
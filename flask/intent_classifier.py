@@ -0,0 +1,184 @@
+"""
+Local yes/no classifier for the user's replies to confirmation questions
+("Do you want to lock this location?", "Do you want to add another visit?").
+
+Most replies are things like "yes", "sure", "no thanks" or "sí, claro", which
+don't need an OpenAI round trip. classify() answers right away when it's
+confident and returns None otherwise, so the caller can fall back to the LLM.
+
+It works in two stages:
+1. A lexicon of English and Spanish confirm/reject words and phrases. "Another
+   one" / "otro" depends on the question: it rejects the current location when
+   asked to lock it, but means yes to "Do you want to add another visit?".
+2. A nearest-centroid model on the sentence-transformer embeddings (optional):
+   the reply is compared with the mean embedding of example confirmations and
+   of example rejections.
+"""
+import re
+import threading
+
+import numpy as np
+
+from llm_cache import normalize_text
+
+# 🔹 Whole replies that are unambiguous on their own
+CONFIRM_PHRASES = {
+    "yes", "y", "yeah", "yea", "yep", "yup", "sure", "ok", "okay", "k", "of course", "absolutely",
+    "definitely", "certainly", "please", "yes please", "sounds good", "sounds great", "lets do it",
+    "lets go", "lock it", "lock it in", "go ahead", "do it", "why not", "i do", "i want to", "perfect",
+    "great", "cool", "alright", "all right", "fine", "correct", "that works",
+    "si", "sip", "claro", "claro que si", "dale", "por supuesto", "vale", "perfecto", "de acuerdo",
+    "esta bien", "bueno", "si por favor", "si claro", "seguro", "me parece bien", "adelante", "vamos",
+}
+REJECT_PHRASES = {
+    "no", "n", "nope", "nah", "no thanks", "no thank you", "not really", "never mind", "nevermind",
+    "skip", "pass", "i dont", "i dont want to", "not interested", "no way", "negative", "not now",
+    "maybe not", "im good", "im done", "thats all", "that is all", "nothing else", "no more",
+    "no gracias", "para nada", "mejor no", "nunca", "ya no", "eso es todo", "nada mas",
+    "no quiero", "no me interesa", "paso", "estoy bien",
+}
+# 🔹 Idioms that start with "no" but aren't a rejection, rewritten before the word rules
+IDIOMS = {
+    "no problem": "sure", "no worries": "sure", "no doubt": "sure", "sin problema": "sure",
+    "no hay problema": "sure", "no se": "unsure", "no idea": "unsure", "not sure": "unsure",
+    "no estoy seguro": "unsure", "no estoy segura": "unsure", "not bad": "good", "no esta mal": "good",
+    "im good": "nope", "estoy bien": "nope", "no me gusta": "nope",
+}
+
+# 🔹 Words that push a longer reply one way or the other
+CONFIRM_WORDS = {
+    "yes", "yeah", "yep", "sure", "ok", "okay", "absolutely", "definitely", "lock", "love", "great",
+    "perfect", "si", "claro", "dale", "vale", "perfecto", "encanta", "seguro",
+}
+REJECT_WORDS = {
+    "no", "nope", "nah", "not", "dont", "never", "skip", "pass", "nunca", "nada", "tampoco",
+}
+# 🔹 Words that still lean yes after an opening "no" ("no, I like it", "never been, let's go")
+POSITIVE_CUES = {
+    "like", "love", "want", "lets", "go", "good", "nice", "fun", "cool", "awesome", "interesting", "add",
+    "gusta", "encanta", "quiero", "vamos", "bien", "bueno",
+}
+# 🔹 "Show me another one": no to this location, but yes to adding another visit
+ANOTHER_WORDS = {"another", "else", "different", "otro", "otra", "otros", "otras"}
+# Steps whose question is "Do you want to add another visit?"
+ADD_ANOTHER_STEPS = {"end_or_suggest_alternatives"}
+# 🔹 Replies with these are hedges ("not sure", "maybe", "depends") and go to the LLM
+HEDGE_WORDS = {"maybe", "perhaps", "depends", "unsure", "quizas", "talvez", "depende", "but", "pero"}
+
+# 🔹 Examples used to build the embedding centroids
+CONFIRM_EXAMPLES = [
+    "yes", "yes please", "sure, lock it in", "that sounds great, let's go there", "I'd love to visit it",
+    "of course", "ok let's do it", "add it to my trip", "absolutely, I want to go", "yeah why not",
+    "sí", "sí, claro", "dale, vamos", "me encantaría ir", "por supuesto que sí", "de acuerdo, añádelo",
+]
+REJECT_EXAMPLES = [
+    "no", "no thanks", "not really", "I don't want to go there", "nah, skip it", "I'm done, that's all",
+    "not interested", "no gracias", "mejor no", "no quiero ir", "eso es todo", "para nada",
+]
+
+
+class ConfirmIntentClassifier:
+    """
+    Lexicon + nearest-centroid classifier for confirm/reject replies.
+
+    Parameters:
+    embeddings: Optional LangChain embeddings object (e.g. sentence_transformer_embeddings).
+        Without it only the lexicon is used.
+    min_similarity (float): The reply must be at least this close to one centroid.
+    min_margin (float): ...and this much closer to it than to the other one.
+    max_words (int): Longer replies are left to the LLM.
+    """
+
+    def __init__(self, embeddings=None, min_similarity=0.5, min_margin=0.12, max_words=12):
+        self.embeddings = embeddings
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.max_words = max_words
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def lexicon(self, text, current_step=None):
+        """
+        True/False from the word lists, or None if they don't settle it.
+        """
+        if "?" in text:
+            return None  # a question back ("is it open on sundays?") is for the LLM
+        text = normalize_text(text.replace("'", ""))
+        for idiom, meaning in IDIOMS.items():
+            text = re.sub(rf"\b{idiom}\b", meaning, text)
+        if text in CONFIRM_PHRASES:
+            return True
+        if text in REJECT_PHRASES:
+            return False
+
+        words = text.split()
+        if not words or len(words) > self.max_words or HEDGE_WORDS & set(words):
+            return None
+        if ANOTHER_WORDS & set(words):
+            return self._another(words, current_step)
+        # "yes, lock it" / "no, show me another" - the first word usually carries the answer
+        if words[0] in CONFIRM_WORDS and not REJECT_WORDS & set(words[1:]):
+            return True
+        if words[0] in REJECT_WORDS and not CONFIRM_WORDS & set(words[1:]) and not self._positive_cue(words):
+            return False
+        return None
+
+    @staticmethod
+    def _positive_cue(words):
+        # A cue counts unless a negation between the opening "no" and it covers it
+        # ("no, I like it" leans yes; "no, I don't want to go" doesn't)
+        return any(word in POSITIVE_CUES and not REJECT_WORDS & set(words[1:i])
+                   for i, word in enumerate(words[1:], start=1))
+
+    @staticmethod
+    def _another(words, current_step):
+        # "another one" / "no, muéstrame otro": the meaning depends on the question
+        if current_step is None:
+            return None
+        if current_step in ADD_ANOTHER_STEPS:
+            # "another one" = add another visit; "no, another..." contradicts itself
+            return None if words[0] in REJECT_WORDS else True
+        # Asked about this location: asking for another one declines it
+        return None if words[0] in CONFIRM_WORDS else False
+
+    def _get_centroids(self):
+        with self._lock:
+            if self._centroids is None:
+                centroids = []
+                for examples in (CONFIRM_EXAMPLES, REJECT_EXAMPLES):
+                    vectors = np.asarray(self.embeddings.embed_documents(examples), dtype=np.float32)
+                    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                    centroid = vectors.mean(axis=0)
+                    centroids.append(centroid / np.linalg.norm(centroid))
+                self._centroids = np.stack(centroids)
+            return self._centroids
+
+    def nearest_centroid(self, text):
+        """
+        True/False if the reply's embedding is clearly closer to one centroid, else None.
+        """
+        if self.embeddings is None or len(text.split()) > self.max_words or "?" in text:
+            return None
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        confirm, reject = self._get_centroids() @ vector
+        if max(confirm, reject) >= self.min_similarity and abs(confirm - reject) >= self.min_margin:
+            return bool(confirm > reject)
+        return None
+
+    def classify(self, text, current_step=None):
+        """
+        True (confirm), False (reject) or None (ambiguous, ask the LLM).
+
+        Parameters:
+        text (str): The user's reply.
+        current_step (str): Conversation step the question was asked in
+            ("ask_lock_location", "end_or_suggest_alternatives"...). Without it,
+            replies whose meaning depends on the question go to the LLM.
+        """
+        if not text or not re.search(r"\w", text):
+            return None
+        decision = self.lexicon(text, current_step)
+        if decision is None and not ANOTHER_WORDS & set(normalize_text(text).split()):
+            decision = self.nearest_centroid(text)
+        return decision
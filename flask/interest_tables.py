@@ -0,0 +1,243 @@
+"""
+Precomputed interest -> landmark rankings for suggest_locations.
+
+Every new conversation ran a vector search on the raw user text to suggest
+places, but most users ask for the same few things: beaches, hiking,
+museums, forts, caves, food. The build step below tags every landmark with
+those categories once, from keyword rules on its name and description plus
+the cosine similarity of its embedding to a description of the category, and
+stores a ranked list of landmark ids for each category and for each
+category x municipality pair.
+
+At runtime the extracted interests ("hiking, beaches") are mapped to
+categories and their lists are merged by reciprocal rank fusion: no
+embedding, no vector query. Interests that match no category ("jazz bars")
+still go to the vector search, whose results are fused with the tables.
+
+Build (or rebuild) the tables from the flask folder:
+    python interest_tables.py
+    python interest_tables.py --keywords-only    # without the embedding model
+
+The committed saves/interest_tables.json was built with --keywords-only;
+rebuild it with the embedding model where one is installed.
+"""
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from keyword_index import fold, rrf_fuse, tokenize
+from landmarks import SAVES_DIR, load_landmarks, load_municipalities
+
+INTEREST_TABLES_PATH = os.path.join(SAVES_DIR, 'interest_tables.json')
+
+# 🔹 Categories: a description to embed, words that tag a landmark, extra words users say
+CATEGORIES = {
+    "beaches": {
+        "query": "a beach with sand, sea and swimming on the coast",
+        "keywords": {"beach", "beaches", "playa", "playas", "balneario", "sand", "arena", "swimming", "surf",
+                     "surfing", "snorkeling", "snorkel", "coast", "shore"},
+        "user_words": {"swim", "sun", "sunbathing", "ocean", "sea", "mar"},
+    },
+    "hiking": {
+        "query": "a nature reserve, forest or mountain with hiking trails and waterfalls",
+        "keywords": {"trail", "trails", "sendero", "senderos", "hiking", "hike", "forest", "bosque", "rainforest",
+                     "reserve", "reserva", "mountain", "mountains", "cerro", "peak", "waterfall", "waterfalls",
+                     "salto", "cascada", "canyon", "canon"},
+        "user_words": {"hikes", "hiking", "trek", "trekking", "walk", "walking", "nature", "outdoors", "senderismo"},
+    },
+    "museums": {
+        "query": "a museum or art gallery with exhibits and collections",
+        "keywords": {"museum", "museums", "museo", "gallery", "galeria", "exhibit", "exhibits", "exhibition",
+                     "collection", "art"},
+        "user_words": {"arte", "paintings", "exhibitions"},
+    },
+    "forts": {
+        "query": "a Spanish colonial fort, castle or military fortification",
+        "keywords": {"fort", "forts", "fortress", "fortaleza", "fortin", "castle", "castillo", "battery", "bateria",
+                     "bastion", "garita", "fortification", "fortifications", "morro"},
+        "user_words": {"castles", "castillos", "fuertes", "fuerte"},
+    },
+    "caves": {
+        "query": "a cave or cavern system with underground rivers and karst",
+        "keywords": {"cave", "caves", "cueva", "cuevas", "cavern", "caverns", "caverna", "cavernas", "sinkhole",
+                     "karst"},
+        "user_words": {"caving", "spelunking", "underground"},
+    },
+    "food": {
+        "query": "a place to eat local Puerto Rican food: restaurants, markets, coffee or rum",
+        "keywords": {"restaurant", "restaurants", "food", "cuisine", "culinary", "lechonera", "lechon", "market",
+                     "mercado", "coffee", "cafe", "hacienda", "rum", "distillery", "bakery", "panaderia"},
+        "user_words": {"eat", "eating", "dining", "comida", "gastronomy", "foodie", "lunch", "dinner"},
+    },
+}
+
+# A landmark is tagged when a keyword is in its name or description and the
+# embedding agrees a little ("Braulio Castillo" is an actor, not a castle), or
+# when the embedding alone agrees a lot. Without embeddings, the description
+# must back up the name with keywords other than the name's own words, which
+# a description repeats ("Braulio Castillo Cintrón was a telenovela actor").
+MIN_SIMILARITY_WITH_KEYWORD = 0.2
+MIN_SIMILARITY = 0.45
+NAME_BONUS = 0.3
+TEXT_BONUS = 0.05  # per keyword found in the description, up to MAX_TEXT_HITS
+MAX_TEXT_HITS = 3
+MAX_TEXT_HITS_KEYWORDS_ONLY = 10
+
+
+def category_scores(landmark, similarities=None):
+    """
+    {category: score} of the categories a landmark is tagged with.
+
+    Parameters:
+    landmark (dict): A landmark from load_landmarks.
+    similarities (dict): {category: cosine similarity} of its embedding, or None (keywords only).
+    """
+    name_tokens = set(tokenize(landmark["name"]))
+    text_tokens = tokenize(landmark["description"])
+    scores = {}
+    for category, spec in CATEGORIES.items():
+        in_name = bool(name_tokens & spec["keywords"])
+        in_text = sum(1 for token in text_tokens if token in spec["keywords"])
+        if similarities is None:
+            backing = sum(1 for token in text_tokens if token in spec["keywords"] and token not in name_tokens)
+            if (in_name and backing) or backing >= 2:
+                # More keyword mentions, and a denser description, rank higher (no ties broken by id)
+                scores[category] = (NAME_BONUS * in_name + TEXT_BONUS * min(backing, MAX_TEXT_HITS_KEYWORDS_ONLY)
+                                    + backing / len(text_tokens))
+            continue
+        keyword_score = NAME_BONUS * in_name + TEXT_BONUS * min(in_text, MAX_TEXT_HITS)
+        similarity = similarities[category]
+        if ((in_name or in_text) and similarity >= MIN_SIMILARITY_WITH_KEYWORD) or similarity >= MIN_SIMILARITY:
+            scores[category] = similarity + keyword_score
+    return scores
+
+
+def embedding_similarities(embeddings, landmarks, batch_size=64):
+    """
+    [{category: cosine similarity}] of every landmark to every category description.
+    """
+    from index_builder import embed_in_batches
+
+    texts = [f"{landmark['name']}. {landmark['description']}" for landmark in landmarks]
+    vectors = embed_in_batches(embeddings, texts, batch_size)
+    queries = np.asarray([embeddings.embed_query(spec["query"]) for spec in CATEGORIES.values()], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+    scores = vectors @ queries.T
+    return [dict(zip(CATEGORIES, row.tolist())) for row in scores]
+
+
+def build_interest_tables(embeddings=None, path=INTEREST_TABLES_PATH):
+    """
+    Tag every landmark, rank each category (and each category x municipality)
+    by score and write the tables to `path`. embeddings=None uses the keyword rules only.
+    """
+    landmarks = load_landmarks()
+    similarities = embedding_similarities(embeddings, landmarks) if embeddings is not None else None
+
+    scored = {category: [] for category in CATEGORIES}  # category -> [(score, id, municipality)]
+    for i, landmark in enumerate(landmarks):
+        for category, score in category_scores(landmark, similarities[i] if similarities else None).items():
+            scored[category].append((score, landmark["id"], landmark["municipality"]))
+
+    categories = {}
+    by_municipality = {}
+    for category, rows in scored.items():
+        rows.sort(key=lambda row: (-row[0], row[1]))
+        categories[category] = [landmark_id for _, landmark_id, _ in rows]
+        by_municipality[category] = {}
+        for _, landmark_id, municipality in rows:
+            if municipality:
+                by_municipality[category].setdefault(fold(municipality), []).append(landmark_id)
+        print(f"{category}: {len(rows)} landmarks in {len(by_municipality[category])} municipalities")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"embeddings": embeddings is not None, "categories": categories,
+                   "by_municipality": by_municipality}, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Saved interest tables for {len(landmarks)} landmarks to {path}")
+
+
+@lru_cache(maxsize=None)
+def _municipality_names():
+    return {fold(municipality["name"]) for municipality in load_municipalities()}
+
+
+class InterestTables:
+    """
+    Lookup side of the tables written by build_interest_tables.
+
+    Parameters:
+    path (str): JSON file of the tables. If it doesn't exist yet every
+        interest is "ad hoc" and suggestions come from the vector search.
+    """
+
+    def __init__(self, path=INTEREST_TABLES_PATH):
+        self.categories = {}
+        self.by_municipality = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                tables = json.load(f)
+            self.categories = tables["categories"]
+            self.by_municipality = tables["by_municipality"]
+        self._words = {}  # word -> category
+        for category, spec in CATEGORIES.items():
+            if category in self.categories:
+                for word in spec["keywords"] | spec["user_words"]:
+                    self._words.setdefault(word, category)
+
+    def categorize(self, interests):
+        """
+        Split the extracted interests ("hiking, beaches and jazz") into known
+        categories and ad-hoc terms. Terms that are just a municipality name
+        ("beaches, Cabo Rojo") are neither.
+
+        Returns:
+        tuple: (categories, ad_hoc_terms), both in the order the user gave them.
+        """
+        categories, ad_hoc = [], []
+        for term in re.split(r",|;|/|\band\b|\by\b|&", str(interests or "")):
+            tokens = tokenize(term)
+            if not tokens or fold(term).strip() in _municipality_names():
+                continue
+            matched = [self._words[token] for token in tokens if token in self._words]
+            if matched:
+                categories.extend(category for category in matched if category not in categories)
+            else:
+                ad_hoc.append(term.strip())
+        return categories, ad_hoc
+
+    def rankings(self, categories, municipality=None):
+        """
+        Ranked landmark-id lists to fuse for these categories: the
+        category x municipality list (when there is one) and the category list.
+        """
+        rankings = []
+        for category in categories:
+            local = self.by_municipality.get(category, {}).get(fold(municipality)) if municipality else None
+            if local:
+                rankings.append(local)
+            rankings.append(self.categories.get(category, []))
+        return rankings
+
+    def ranked(self, categories, municipality=None, k=7):
+        """
+        Top k landmark ids for the categories, merged by reciprocal rank fusion.
+        """
+        return rrf_fuse(self.rankings(categories, municipality))[:k]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the interest -> landmark ranking tables")
+    parser.add_argument("--keywords-only", action="store_true", help="tag with the keyword rules only")
+    parser.add_argument("--out", default=INTEREST_TABLES_PATH)
+    args = parser.parse_args()
+    embeddings = None
+    if not args.keywords_only:
+        from onnx_embeddings import load_embeddings
+        embeddings = load_embeddings()
+    build_interest_tables(embeddings, args.out)
@@ -0,0 +1,222 @@
+"""
+Day-by-day itinerary for the locked locations.
+
+give_list used to paste str(locked_locations) into the prompt and let the
+model make up an order. build_itinerary() instead:
+
+1. computes the haversine distance matrix of the locked landmarks,
+2. finds a short route through all of them (nearest neighbour + 2-opt),
+3. cuts that route into one segment per travel day, keeping the longest
+   day as short as possible and each day under a distance budget,
+4. reorders each day's stops again with nearest neighbour + 2-opt.
+
+The result is plain JSON that chat() turns into a readable plan. It takes a
+few milliseconds for dozens of stops.
+"""
+import datetime
+import os
+
+import numpy as np
+
+from geo_index import EARTH_RADIUS_KM
+from landmarks import landmarks_by_id, location_id
+
+# 🔹 Max driving distance per day (km) and max stops per day
+DAY_BUDGET_KM = float(os.getenv("ITINERARY_DAY_BUDGET_KM", "120"))
+MAX_STOPS_PER_DAY = int(os.getenv("ITINERARY_MAX_STOPS_PER_DAY", "6"))
+
+
+def distance_matrix(latitudes, longitudes):
+    """
+    Haversine distances in km between every pair of points (n x n numpy array).
+    """
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))[:, None]
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))[:, None]
+    a = np.sin((lat - lat.T) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lon - lon.T) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def path_length(path, distances):
+    return float(sum(distances[a, b] for a, b in zip(path, path[1:])))
+
+
+def nearest_neighbour(nodes, distances, start=None):
+    """
+    Open path through the nodes, always going to the closest unvisited one.
+    """
+    if not nodes:
+        return []
+    remaining = list(nodes)
+    current = remaining.pop(remaining.index(start) if start in remaining else 0)
+    path = [current]
+    while remaining:
+        row = distances[current, remaining]
+        current = remaining.pop(int(np.argmin(row)))
+        path.append(current)
+    return path
+
+
+def two_opt(path, distances, max_passes=20):
+    """
+    Improve an open path by reversing segments while that shortens it.
+    Each pass checks every (i, j) pair, the inner loop vectorized over j.
+    """
+    path = list(path)
+    n = len(path)
+    if n < 4:
+        return path
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            nodes = np.array(path)
+            a, b = nodes[i - 1], nodes[i]
+            j = np.arange(i + 1, n)
+            c = nodes[j]
+            # Reversing path[i:j+1] replaces edges (a,b) and (c,d) with (a,c) and (b,d); the last j has no d
+            d = nodes[np.minimum(j + 1, n - 1)]
+            has_next = j + 1 < n
+            before = distances[a, b] + np.where(has_next, distances[c, d], 0)
+            after = distances[a, c] + np.where(has_next, distances[b, d], 0)
+            gains = before - after
+            best = int(np.argmax(gains))
+            if gains[best] > 1e-9:
+                k = int(j[best])
+                path[i:k + 1] = reversed(path[i:k + 1])
+                improved = True
+        if not improved:
+            break
+    return path
+
+
+def shortest_path(nodes, distances, start=None):
+    """
+    Nearest neighbour + 2-opt order of the nodes.
+    """
+    return two_opt(nearest_neighbour(nodes, distances, start), distances)
+
+
+def _split_count(legs, limit, max_stops):
+    # Greedy: fewest days covering the route with no day over `limit` km or max_stops stops
+    days, day_km, day_stops = 1, 0.0, 1
+    for leg in legs:
+        if day_km + leg > limit or day_stops + 1 > max_stops:
+            days, day_km, day_stops = days + 1, 0.0, 1
+        else:
+            day_km, day_stops = day_km + leg, day_stops + 1
+    return days
+
+
+def split_route(route, distances, n_days=None, budget_km=DAY_BUDGET_KM, max_stops=MAX_STOPS_PER_DAY):
+    """
+    Cut a route into consecutive day segments.
+
+    With n_days, the route is cut into at most n_days segments with the
+    smallest possible longest day (stop limits are relaxed if the trip is too
+    short for them). Without it, a new day starts whenever the budget or the
+    stop limit would be exceeded.
+
+    Returns:
+    list: One list of nodes per day.
+    """
+    if not route:
+        return []
+    legs = [float(distances[a, b]) for a, b in zip(route, route[1:])]
+    if n_days:
+        n_days = min(n_days, len(route))
+        max_stops = max(max_stops, -(-len(route) // n_days))
+        # Binary search on the longest day
+        low, high = 0.0, sum(legs)
+        if _split_count(legs, high, max_stops) > n_days:
+            max_stops = len(route)
+        for _ in range(40):
+            middle = (low + high) / 2
+            if _split_count(legs, middle, max_stops) <= n_days:
+                high = middle
+            else:
+                low = middle
+        limit = high
+    else:
+        limit = budget_km
+
+    days, current, day_km = [], [route[0]], 0.0
+    for node, leg in zip(route[1:], legs):
+        if day_km + leg > limit + 1e-9 or len(current) + 1 > max_stops:
+            days.append(current)
+            current, day_km = [node], 0.0
+        else:
+            current.append(node)
+            day_km += leg
+    days.append(current)
+    return days
+
+
+def trip_days(travel_dates):
+    """
+    Dates of the trip from conversation_state["travel_dates"]: every day between
+    a start and an end date, or the given dates. [] if there are none.
+    """
+    dates = []
+    for value in travel_dates or []:
+        try:
+            dates.append(datetime.date.fromisoformat(str(value)[:10]))
+        except ValueError:
+            continue
+    dates = sorted(set(dates))
+    if len(dates) == 2 and (dates[1] - dates[0]).days > 1:
+        return [dates[0] + datetime.timedelta(days=i) for i in range((dates[1] - dates[0]).days + 1)]
+    return dates
+
+
+def build_itinerary(locked_locations, travel_dates=None, budget_km=DAY_BUDGET_KM, max_stops=MAX_STOPS_PER_DAY):
+    """
+    Plan the locked locations into days.
+
+    Parameters:
+    locked_locations (list): Location dicts from conversation_state["locked_locations"].
+    travel_dates (list): conversation_state["travel_dates"] (ISO date strings), optional.
+
+    Returns:
+    dict: {"days": [{"day", "date", "stops": [{"name", "municipality", "leg_km"}],
+    "distance_km", "over_budget"}], "total_km", "budget_km", "unplaced": [names]}
+    """
+    stops, unplaced, seen = [], [], set()
+    for location in locked_locations:
+        landmark = landmarks_by_id().get(location_id(location))
+        if landmark is None or landmark["latitude"] is None:
+            metadata = location.get("metadata", {}) if isinstance(location, dict) else {}
+            unplaced.append(metadata.get("landmark") or metadata.get("municipality") or str(location))
+            continue
+        if landmark["id"] not in seen:  # a location can be locked twice
+            seen.add(landmark["id"])
+            stops.append(landmark)
+
+    dates = trip_days(travel_dates)
+    days = []
+    if stops:
+        distances = distance_matrix([s["latitude"] for s in stops], [s["longitude"] for s in stops])
+        route = shortest_path(list(range(len(stops))), distances)
+        segments = split_route(route, distances, n_days=len(dates) or None, budget_km=budget_km, max_stops=max_stops)
+        for number, segment in enumerate(segments, start=1):
+            order = shortest_path(segment, distances, start=segment[0])
+            day_km = path_length(order, distances)
+            days.append({
+                "day": number,
+                "date": str(dates[number - 1]) if number <= len(dates) else None,
+                "stops": [
+                    {
+                        "name": stops[node]["name"],
+                        "municipality": stops[node]["municipality"],
+                        "leg_km": round(float(distances[previous, node]), 1) if previous is not None else 0.0,
+                    }
+                    for previous, node in zip([None] + order[:-1], order)
+                ],
+                "distance_km": round(day_km, 1),
+                "over_budget": day_km > budget_km,
+            })
+
+    return {
+        "days": days,
+        "total_km": round(sum(day["distance_km"] for day in days), 1),
+        "budget_km": budget_km,
+        "unplaced": unplaced,
+    }
@@ -0,0 +1,230 @@
+"""
+BM25 keyword index over the landmark and municipality descriptions, and
+hybrid (BM25 + vector) retrieval.
+
+Dense search alone often misses exact proper nouns ("Cueva Ventana",
+"Mayagüez"), which is why received_location first asks gpt_extract_info to
+pull the name out. This module adds:
+
+- KeywordIndex: an accent-folded inverted index with BM25 scoring over the
+  name, municipality and description of every landmark and municipality in
+  structured-information-from-datasets/*.csv. Postings are flat numpy arrays,
+  saved compactly to saves/keyword_index.npz, and a query is a few numpy
+  slice-adds (well under a millisecond).
+- HybridRetriever: wraps the vector store and fuses its landmark results
+  with BM25's by reciprocal rank fusion. Same similarity_search interface.
+
+Build (or rebuild) the index from the flask folder:
+    python keyword_index.py
+"""
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+from landmarks import SAVES_DIR, file_id, landmark_document, load_landmarks, load_municipalities
+
+KEYWORD_INDEX_PATH = os.path.join(SAVES_DIR, 'keyword_index.npz')
+
+# 🔹 Words that carry no meaning for search, in English and Spanish
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is", "it", "its", "of",
+    "on", "or", "that", "the", "to", "was", "were", "with", "i", "me", "my", "want", "like", "go", "visit",
+    "some", "see", "would", "love", "can", "there", "this", "what", "where",
+    "el", "la", "los", "las", "de", "del", "y", "en", "un", "una", "que", "por", "para", "con", "al",
+}
+
+
+def fold(text):
+    """
+    Lowercase, accent-free text ("Mayagüez" and "mayaguez" fold the same).
+    """
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    """
+    Folded word tokens without stopwords.
+    """
+    return [token for token in re.findall(r"\w+", fold(text)) if token not in STOPWORDS]
+
+
+def index_entries():
+    """
+    (doc id, source, name, searchable text) for every landmark and municipality.
+    """
+    entries = []
+    for landmark in load_landmarks():
+        text = f"{landmark['name']} {landmark['name']} {landmark['municipality']} {landmark['description']}"
+        entries.append((landmark["id"], "landmarks", landmark["name"], text))
+    for municipality in load_municipalities():
+        text = f"{municipality['name']} {municipality['name']} {municipality['description']}"
+        entries.append((municipality["id"], "municipalities", municipality["name"], text))
+    return entries
+
+
+class KeywordIndex:
+    """
+    BM25 inverted index. Build it with KeywordIndex.build() or load a saved one
+    with KeywordIndex.load(); get_keyword_index() does whichever is possible.
+
+    Parameters:
+    k1 (float), b (float): BM25 parameters.
+    """
+
+    def __init__(self, ids, sources, names, terms, offsets, postings, frequencies, doc_lengths, k1=1.2, b=0.75):
+        self.ids = list(ids)
+        self.sources = np.asarray(sources)
+        self.names = list(names)
+        self.terms = {term: i for i, term in enumerate(terms)}
+        self.offsets = np.asarray(offsets, dtype=np.int64)  # postings of term i: offsets[i]:offsets[i + 1]
+        self.postings = np.asarray(postings, dtype=np.int32)  # doc rows
+        self.frequencies = np.asarray(frequencies, dtype=np.float32)  # term frequency in that doc
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+
+        n_docs = len(self.ids)
+        doc_freq = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        self.length_norm = k1 * (1 - b + b * self.doc_lengths / max(1.0, self.doc_lengths.mean()))
+        self.rows_by_id = {(source, doc_id): row for row, (doc_id, source) in enumerate(zip(self.ids, self.sources))}
+
+    @classmethod
+    def build(cls, entries=None):
+        entries = entries if entries is not None else index_entries()
+        term_docs = {}
+        doc_lengths = []
+        for row, (_, _, _, text) in enumerate(entries):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                term_docs.setdefault(token, []).append((row, count))
+
+        terms = sorted(term_docs)
+        offsets, postings, frequencies = [0], [], []
+        for term in terms:
+            for row, count in term_docs[term]:
+                postings.append(row)
+                frequencies.append(count)
+            offsets.append(len(postings))
+        return cls(
+            [entry[0] for entry in entries], [entry[1] for entry in entries], [entry[2] for entry in entries],
+            terms, offsets, postings, frequencies, doc_lengths,
+        )
+
+    def save(self, path=KEYWORD_INDEX_PATH):
+        terms = sorted(self.terms, key=self.terms.get)
+        np.savez_compressed(
+            path, ids=np.array(self.ids), sources=self.sources, names=np.array(self.names),
+            terms=np.array(terms), offsets=self.offsets, postings=self.postings,
+            frequencies=self.frequencies.astype(np.uint16), doc_lengths=self.doc_lengths.astype(np.uint32),
+        )
+        print(f"Saved keyword index ({len(self.ids)} documents, {len(terms)} terms) to {path}")
+
+    @classmethod
+    def load(cls, path=KEYWORD_INDEX_PATH):
+        data = np.load(path)
+        return cls(data["ids"].tolist(), data["sources"], data["names"].tolist(), data["terms"].tolist(),
+                   data["offsets"], data["postings"], data["frequencies"], data["doc_lengths"])
+
+    def scores(self, query):
+        """
+        BM25 score of every document for the query.
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for token in set(tokenize(query)):
+            i = self.terms.get(token)
+            if i is None:
+                continue
+            rows = self.postings[self.offsets[i]:self.offsets[i + 1]]
+            tf = self.frequencies[self.offsets[i]:self.offsets[i + 1]]
+            scores[rows] += self.idf[i] * tf * (self.k1 + 1) / (tf + self.length_norm[rows])
+        return scores
+
+    def search(self, query, k=10, source=None):
+        """
+        (doc id, source, score) of the k best documents with a positive score, best first.
+        """
+        scores = self.scores(query)
+        if source is not None:
+            scores = np.where(self.sources == source, scores, 0)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(self.ids[row], str(self.sources[row]), float(scores[row])) for row in candidates]
+
+
+_keyword_index = None
+
+
+def get_keyword_index():
+    """
+    Shared index: the saved one if there is one, otherwise built from the CSVs.
+    """
+    global _keyword_index
+    if _keyword_index is None:
+        _keyword_index = KeywordIndex.load() if os.path.exists(KEYWORD_INDEX_PATH) else KeywordIndex.build()
+    return _keyword_index
+
+
+def rrf_fuse(rankings, k=60):
+    """
+    Reciprocal rank fusion of several ranked lists of keys, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever:
+    """
+    Vector store wrapper that fuses landmark searches with BM25 by reciprocal
+    rank fusion. Other searches (no filter, news, municipalities) go to the
+    vector store unchanged, since BM25 only covers the structured descriptions.
+
+    Parameters:
+    store: Vector store (Chroma or NumpyVectorIndex).
+    keyword_index (KeywordIndex): BM25 index.
+    candidates (int): Results taken from each side before fusing.
+    """
+
+    def __init__(self, store, keyword_index, candidates=20):
+        self.store = store
+        self.keyword_index = keyword_index
+        self.candidates = candidates
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        if filter != {'source': 'landmarks'}:
+            return self.store.similarity_search(query, k=k, filter=filter, **kwargs)
+
+        vector_docs = self.store.similarity_search(query, k=max(k, self.candidates), filter=filter, **kwargs)
+        by_id = {}
+        for doc in vector_docs:
+            by_id.setdefault(file_id(doc.metadata.get("filename", "")), doc)
+        keyword_ids = [doc_id for doc_id, _, _ in self.keyword_index.search(query, self.candidates, source="landmarks")]
+
+        from vector_index import make_document
+        results = []
+        for landmark_id in rrf_fuse([list(by_id), keyword_ids])[:k]:
+            doc = by_id.get(landmark_id)
+            if doc is None:
+                location = landmark_document(landmark_id)
+                doc = make_document(location["page_content"], location["metadata"])
+            results.append(doc)
+        return results
+
+
+if __name__ == "__main__":
+    KeywordIndex.build().save()
@@ -0,0 +1,156 @@
+"""
+Structured landmark and municipality data from
+structured-information-from-datasets/*.csv, loaded once and shared by the
+lookup tables and indexes built on top of it.
+"""
+import csv
+import os
+import unicodedata
+from functools import lru_cache
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASETS_DIR = os.path.join(REPO_DIR, 'structured-information-from-datasets')
+SAVES_DIR = os.path.join(REPO_DIR, 'saves')
+
+LANDMARKS_CSV = os.path.join(DATASETS_DIR, 'landmark_data_combined.csv')
+MUNICIPALITIES_CSV = os.path.join(DATASETS_DIR, 'municipality_data_combined.csv')
+
+
+# Puerto Rico with Mona, Desecheo, Vieques and Culebra: (min, max) latitude and longitude
+PR_LATITUDES = (17.8, 18.6)
+PR_LONGITUDES = (-68.0, -65.1)
+
+
+def _coordinate(value):
+    # 52 landmarks have no coordinates in the CSV
+    return float(value) if value else None
+
+
+def _coordinates(latitude, longitude):
+    """
+    (latitude, longitude) of a CSV row, swapped back if the columns were
+    switched, or (None, None) if missing or outside Puerto Rico.
+    """
+    latitude, longitude = _coordinate(latitude), _coordinate(longitude)
+    if latitude is None or longitude is None:
+        return None, None
+
+    def inside(lat, lon):
+        return PR_LATITUDES[0] <= lat <= PR_LATITUDES[1] and PR_LONGITUDES[0] <= lon <= PR_LONGITUDES[1]
+
+    if inside(latitude, longitude):
+        return latitude, longitude
+    if inside(longitude, latitude):
+        return longitude, latitude
+    return None, None
+
+
+def normalize_name(name):
+    """
+    Lowercase, accent-free, single-spaced version of a place name,
+    so "Mayagüez " and "mayaguez" are the same key.
+    """
+    name = unicodedata.normalize("NFKD", str(name).lower())
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return " ".join(name.split())
+
+
+def file_id(filename):
+    """
+    Id of a landmark/municipality from its source file name: no ".txt" and
+    NFC-normalized (some file names are stored with decomposed accents).
+    """
+    return unicodedata.normalize("NFC", filename[:-len(".txt")] if filename.endswith(".txt") else filename)
+
+
+@lru_cache(maxsize=None)
+def load_landmarks():
+    """
+    Landmarks as a list of dicts with keys id, name, latitude, longitude,
+    municipality, url and description (coordinates and municipality can be
+    missing: None and "" respectively). The id is the source file name
+    (metadata['filename'] in the Chroma documents) without ".txt".
+    """
+    landmarks = []
+    with open(LANDMARKS_CSV, encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            latitude, longitude = _coordinates(row["Latitude"], row["Longitude"])
+            landmarks.append({
+                "id": file_id(row["File Name"]),
+                "name": row["Landmark Name"],
+                "latitude": latitude,
+                "longitude": longitude,
+                "municipality": row["Municipality"],
+                "url": row["Wikipedia URL"],
+                "description": row["Brief Description"].strip(),
+            })
+    return landmarks
+
+
+@lru_cache(maxsize=None)
+def load_municipalities():
+    """
+    Municipalities as a list of dicts with keys id, name, latitude, longitude,
+    url and description.
+    """
+    with open(MUNICIPALITIES_CSV, encoding='utf-8') as f:
+        return [
+            {
+                "id": file_id(row["File Name"]),
+                "name": row["Municipality Name"],
+                "latitude": float(row["Latitude"]),
+                "longitude": float(row["Longitude"]),
+                "url": row["Wikipedia URL"],
+                "description": row["Brief Description"].strip(),
+            }
+            for row in csv.DictReader(f)
+        ]
+
+
+@lru_cache(maxsize=None)
+def landmarks_by_name():
+    """
+    Landmarks keyed by normalize_name(name).
+    """
+    return {normalize_name(landmark["name"]): landmark for landmark in load_landmarks()}
+
+
+@lru_cache(maxsize=None)
+def landmarks_by_id():
+    """
+    Landmarks keyed by id (source file name without ".txt").
+    """
+    return {landmark["id"]: landmark for landmark in load_landmarks()}
+
+
+def location_id(location):
+    """
+    Landmark id of a location dict as stored in conversation_state
+    ({"page_content": ..., "metadata": {...}}), or None.
+    """
+    if not isinstance(location, dict):
+        return None
+    filename = location.get("metadata", {}).get("filename", "")
+    if location.get("metadata", {}).get("source") != "landmarks" or not filename.endswith(".txt"):
+        return None
+    return file_id(filename)
+
+
+def landmark_document(landmark_id):
+    """
+    Rebuild the location dict of a landmark from its id, in the same shape as
+    the Chroma Documents stored in conversation_state.
+    """
+    landmark = landmarks_by_id()[landmark_id]
+    return {
+        "page_content": landmark["description"],
+        "metadata": {
+            "filename": landmark["id"] + ".txt",
+            "landmark": landmark["name"],
+            "latitude": landmark["latitude"],
+            "longitude": landmark["longitude"],
+            "municipality": landmark["municipality"],
+            "url": landmark["url"],
+            "source": "landmarks",
+        },
+    }
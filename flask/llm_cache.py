@@ -0,0 +1,165 @@
+"""
+Response cache for the classifier-style LLM calls in app.py
+(gpt_extract_info, confirm_action). is_weather_dependent answers are
+memoized per place in weather_flags.py instead.
+
+Those calls return short JSON answers and their inputs repeat a lot across
+users ("yes", "no", "beaches", the same landmark...), so the answers are kept
+here keyed on (function, step, normalized input), with a TTL and LRU eviction.
+Optionally, near-duplicate inputs can also hit the cache by comparing their
+embeddings with the ones already cached for the same (function, step). Only
+the steps in SEMANTIC_STEPS do that: embeddings barely see a "not" or a
+different day ("I want to lock it" / "I don't want to lock it", "March 3" /
+"March 8"), so yes/no answers and dates only hit on the exact input.
+
+chat() outputs use temperature=1 and must never be cached here.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+# 🔹 Returned by ResponseCache.get when there is nothing cached (cached values can be False/None)
+MISS = object()
+
+# (function, step) pairs whose answers may come from a similar cached input
+SEMANTIC_STEPS = {("gpt_extract_info", "received_interests")}
+# Even there, inputs must have the same numbers and negations to match
+NEGATIONS = {"no", "not", "dont", "don", "doesn", "isn", "never", "nothing", "none", "without",
+             "nunca", "ni", "nada", "sin"}
+
+
+def normalize_text(text):
+    """
+    Normalize user input for cache keys: lowercase, no accents, no punctuation,
+    single spaces. "Yes!!" and "  yes " give the same key.
+    """
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def same_facts(text, other):
+    """
+    True if two normalized inputs have the same numbers and negation words.
+    """
+    def facts(value):
+        words = value.split()
+        return re.findall(r"\d+", value), {word for word in words if word in NEGATIONS}
+    return facts(text) == facts(other)
+
+
+class ResponseCache:
+    """
+    Thread-safe TTL + LRU cache for LLM answers, with an optional
+    embedding-similarity lookup.
+
+    Parameters:
+    max_entries (int): Number of answers kept before the least recently used is evicted.
+    ttl (float): Seconds an answer stays valid.
+    embeddings: Optional LangChain embeddings object (e.g. sentence_transformer_embeddings).
+        When given, a miss on the exact key falls back to the most similar cached input.
+    similarity_threshold (float): Minimum cosine similarity for a semantic hit.
+    semantic_steps (set): (function, step) pairs where the similarity lookup is used.
+    """
+
+    def __init__(self, max_entries=2048, ttl=3600, embeddings=None, similarity_threshold=0.95,
+                 semantic_steps=SEMANTIC_STEPS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.semantic_steps = set(semantic_steps)
+
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._vectors = {}  # (function, step) -> {key: unit vector}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _embed(self, text):
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _semantic(self, key):
+        return self.embeddings is not None and key[:2] in self.semantic_steps
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        namespace = self._vectors.get(key[:2])
+        if namespace is not None:
+            namespace.pop(key, None)
+
+    def get(self, function, step, user_input):
+        """
+        Get the cached answer for this call, or MISS.
+        """
+        key = (function, step, normalize_text(user_input))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._drop(key)
+            namespace = dict(self._vectors.get(key[:2], {}))
+
+        if namespace and self._semantic(key):
+            # Compare against every cached input of the same function and step
+            keys = list(namespace)
+            scores = np.stack([namespace[k] for k in keys]) @ self._embed(key[2])
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity_threshold and same_facts(key[2], keys[best][2]):
+                with self._lock:
+                    entry = self._entries.get(keys[best])
+                    if entry is not None and entry[0] > now:
+                        self._entries.move_to_end(keys[best])
+                        self.semantic_hits += 1
+                        return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return MISS
+
+    def put(self, function, step, user_input, value):
+        """
+        Cache the answer for this call.
+        """
+        key = (function, step, normalize_text(user_input))
+        vector = self._embed(key[2]) if self._semantic(key) else None
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            if vector is not None:
+                self._vectors.setdefault(key[:2], {})[key] = vector
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+
+    def stats(self):
+        """
+        Hit/miss counters, e.g. for logging or a debug endpoint.
+        """
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
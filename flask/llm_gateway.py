@@ -0,0 +1,464 @@
+"""
+Shared gateway for the outbound OpenAI chat-completions calls.
+
+Every LLM call site (gpt_extract_info, is_weather_dependent, check_weather,
+confirm_action, chat, the single-shot turn, the history summary) used to call
+the OpenAI client directly: no deadline, no retry policy of our own, and no
+limit on concurrent requests, so during an OpenAI slowdown every worker
+piled up on it. The gateway wraps the client (same chat.completions.create
+interface, so the call sites don't change) and adds:
+
+- a bounded semaphore on the number of requests in flight (a streamed reply
+  keeps its slot until it is read, closed or dropped);
+- a deadline per call, covering the wait for a slot and every attempt;
+- retries with jittered exponential backoff on 429, 5xx, timeouts and
+  connection errors (honouring Retry-After), within the deadline;
+- a circuit breaker: after `breaker_failures` calls in a row fail, calls fail
+  fast for `breaker_reset` seconds, then one trial call decides whether to close it;
+- single-flight: identical non-streamed requests in flight at the same time
+  (e.g. is_weather_dependent for a popular place) share one upstream call.
+
+When a call can't be answered it raises LLMUnavailable, which carries the
+canned reply the app sends instead (app.get_completion catches it), so no
+cache or weather flag is ever filled from a made-up answer.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from telemetry import count, metrics
+
+# Canned reply when the LLM can't be reached
+LLM_UNAVAILABLE_REPLY = os.getenv(
+    "LLM_UNAVAILABLE_REPLY",
+    "Sorry, I'm having trouble reaching my planning assistant right now. Please try again in a moment.",
+)
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRY_ERRORS = {"APITimeoutError", "APIConnectionError", "TimeoutException", "ConnectError", "ReadTimeout"}
+
+
+class LLMUnavailable(Exception):
+    """
+    The LLM call failed for good (deadline, retries exhausted or circuit open).
+    `reply` is the canned answer to show the user.
+    """
+
+    def __init__(self, reason, reply=LLM_UNAVAILABLE_REPLY):
+        super().__init__(reason)
+        self.reason = reason
+        self.reply = reply
+
+
+def is_retryable(error):
+    """
+    True for rate limits, server errors, timeouts and connection errors.
+    """
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUS
+    return isinstance(error, TimeoutError) or type(error).__name__ in RETRY_ERRORS
+
+
+def retry_after(error):
+    """
+    Seconds asked by a Retry-After header, or None.
+    """
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failures` failed calls in a row; open -> half-open
+    after `reset_seconds`, when a single trial call is let through.
+    """
+
+    def __init__(self, failures=5, reset_seconds=30):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        "closed" or "trial" if a call may go out now, None if it must fail fast.
+        """
+        with self._lock:
+            if self.state == "closed":
+                return "closed"
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return "trial"
+            return None
+
+    def success(self):
+        with self._lock:
+            if self.state != "closed":
+                print("LLM circuit breaker closed")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_running = False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or (self.state == "closed" and self.consecutive_failures >= self.failures):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                print(f"LLM circuit breaker open for {self.reset_seconds:g} s "
+                      f"after {self.consecutive_failures} failed calls")
+
+    def release(self):
+        # A trial call that ended without a verdict (e.g. a 400) lets the next one try
+        with self._lock:
+            self._trial_running = False
+
+
+class _Completions:
+    def __init__(self, gateway):
+        self._gateway = gateway
+
+    def create(self, **kwargs):
+        if self._gateway.asynchronous:
+            return self._gateway.create_async(kwargs)
+        return self._gateway.create(kwargs)
+
+
+class _SlotStream:
+    """
+    A streamed reply that holds its gateway slot until it has been read to the
+    end, closed or garbage collected (e.g. the client went away before the
+    first token). Errors while reading are raised as LLMUnavailable.
+    """
+
+    def __init__(self, gateway, stream):
+        self._gateway = gateway
+        self._stream = stream
+        self._chunks = iter(stream)
+        self._released = False
+
+    def _release(self):
+        # Idempotent: reading to the end, close() and __del__ may all get here
+        with self._gateway._lock:
+            if self._released:
+                return
+            self._released = True
+        self._gateway._release_slot()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._released:
+            raise StopIteration
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            self._release()
+            raise
+        except Exception as error:
+            self.close()
+            self._gateway._give_up(error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._release()
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            close()
+
+    def __del__(self):
+        self._release()
+
+
+class _AsyncSlotStream(_SlotStream):
+    """
+    Async version of _SlotStream, for AsyncOpenAI streams.
+    """
+
+    def __init__(self, gateway, stream):
+        self._gateway = gateway
+        self._stream = stream
+        self._chunks = stream.__aiter__()
+        self._released = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._released:
+            raise StopAsyncIteration
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self._release()
+            raise
+        except Exception as error:
+            await self.close()
+            self._gateway._give_up(error)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        self._release()
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            await close()
+
+
+class LLMGateway:
+    """
+    OpenAI client wrapper with a concurrency limit, deadlines, retries, a
+    circuit breaker and single-flight (see the module docstring).
+
+    Parameters:
+    client: OpenAI or AsyncOpenAI client (built with max_retries=0: the gateway retries).
+    asynchronous (bool): True for AsyncOpenAI.
+    max_concurrency (int): Max requests in flight to OpenAI from this process.
+    deadline (float): Seconds a call may take in total (queue + attempts + backoff).
+    max_retries (int): Retries after the first attempt.
+    backoff_base, backoff_max (float): Backoff before retry n is uniform in
+        [0, min(backoff_max, backoff_base * 2**n)] seconds.
+    """
+
+    def __init__(self, client, asynchronous=False, max_concurrency=16, deadline=30.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, breaker_failures=5, breaker_reset=30.0):
+        self._client = client
+        self.asynchronous = asynchronous
+        self.max_concurrency = max_concurrency
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self._slots = asyncio.Semaphore(max_concurrency) if asynchronous else threading.BoundedSemaphore(max_concurrency)
+        self._inflight = {}  # request key -> Future of the leader's call
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.chat = type("Chat", (), {"completions": _Completions(self)})()
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        asked = retry_after(error)
+        return max(delay, asked) if asked is not None else delay
+
+    @staticmethod
+    def _key(kwargs):
+        if kwargs.get("stream"):
+            return None
+        return json.dumps(kwargs, sort_keys=True, default=str)
+
+    def _admit(self):
+        # True if this call is the breaker's trial call
+        admitted = self.breaker.allow()
+        if admitted is None:
+            count("chatbot_llm_gateway_total", outcome="circuit_open")
+            raise LLMUnavailable("circuit open")
+        return admitted == "trial"
+
+    def _no_verdict(self, trial):
+        if trial:
+            self.breaker.release()
+
+    def _take_slot(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def _release_slot(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _give_up(self, error):
+        self.breaker.failure()
+        count("chatbot_llm_gateway_total", outcome="failed")
+        raise LLMUnavailable(f"{type(error).__name__}: {error}") from error
+
+    # 🔹 Sync path
+    def create(self, kwargs):
+        """
+        chat.completions.create through the gateway. Raises LLMUnavailable
+        instead of waiting past the deadline.
+        """
+        deadline = time.monotonic() + self.deadline
+        key = self._key(kwargs)
+        if key is None:
+            return self._call(kwargs, deadline)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            count("chatbot_llm_gateway_total", outcome="coalesced")
+            try:
+                return future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                raise LLMUnavailable("deadline exceeded waiting for an identical request") from None
+
+        try:
+            response = self._call(kwargs, deadline)
+            future.set_result(response)
+            return response
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _call(self, kwargs, deadline):
+        trial = self._admit()
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            self._no_verdict(trial)
+            count("chatbot_llm_gateway_total", outcome="queue_timeout")
+            raise LLMUnavailable(f"no free slot among {self.max_concurrency} within the deadline")
+        self._take_slot()
+        streaming = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = self._client.chat.completions.create(
+                        **kwargs, timeout=max(0.1, deadline - time.monotonic()))
+                except Exception as error:
+                    if not is_retryable(error):
+                        self._no_verdict(trial)
+                        raise
+                    delay = self._backoff(attempt, error)
+                    if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                        self._give_up(error)
+                    count("chatbot_llm_gateway_total", outcome="retry")
+                    time.sleep(delay)
+                    continue
+                self.breaker.success()
+                count("chatbot_llm_gateway_total", outcome="ok")
+                if kwargs.get("stream"):
+                    streaming = True
+                    return _SlotStream(self, response)
+                return response
+        finally:
+            if not streaming:
+                self._release_slot()
+
+    # 🔹 Async path
+    async def create_async(self, kwargs):
+        """
+        Async version of create, for AsyncOpenAI.
+        """
+        deadline = time.monotonic() + self.deadline
+        key = self._key(kwargs)
+        if key is None:
+            return await self._call_async(kwargs, deadline)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            count("chatbot_llm_gateway_total", outcome="coalesced")
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise LLMUnavailable("deadline exceeded waiting for an identical request") from None
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await self._call_async(kwargs, deadline)
+            future.set_result(response)
+            return response
+        except BaseException as error:
+            future.set_exception(error)
+            future.exception()  # retrieved, even if nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _call_async(self, kwargs, deadline):
+        trial = self._admit()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._no_verdict(trial)
+            count("chatbot_llm_gateway_total", outcome="queue_timeout")
+            raise LLMUnavailable(f"no free slot among {self.max_concurrency} within the deadline") from None
+        self._take_slot()
+        streaming = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._client.chat.completions.create(
+                        **kwargs, timeout=max(0.1, deadline - time.monotonic()))
+                except Exception as error:
+                    if not is_retryable(error):
+                        self._no_verdict(trial)
+                        raise
+                    delay = self._backoff(attempt, error)
+                    if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                        self._give_up(error)
+                    count("chatbot_llm_gateway_total", outcome="retry")
+                    await asyncio.sleep(delay)
+                    continue
+                self.breaker.success()
+                count("chatbot_llm_gateway_total", outcome="ok")
+                if kwargs.get("stream"):
+                    streaming = True
+                    return _AsyncSlotStream(self, response)
+                return response
+        finally:
+            if not streaming:
+                self._release_slot()
+
+    def status(self):
+        return {"breaker": self.breaker.state, "in_flight": self.in_flight, "max_concurrency": self.max_concurrency}
+
+
+def make_gateway(client, asynchronous=False):
+    """
+    Gateway configured from the environment (LLM_MAX_CONCURRENCY, LLM_DEADLINE,
+    LLM_MAX_RETRIES, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET).
+    """
+    gateway = LLMGateway(
+        client,
+        asynchronous=asynchronous,
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        deadline=float(os.getenv("LLM_DEADLINE", "30")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+        breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        breaker_reset=float(os.getenv("LLM_BREAKER_RESET", "30")),
+    )
+    metrics.add_collector(lambda: [
+        ("chatbot_llm_in_flight", "gauge", "LLM requests in flight.",
+         {"client": "async" if asynchronous else "sync"}, gateway.in_flight),
+        ("chatbot_llm_circuit_open", "gauge", "1 while the LLM circuit breaker is open.",
+         {"client": "async" if asynchronous else "sync"}, int(gateway.breaker.state != "closed")),
+    ])
+    return gateway
+
+
+metrics.describe("chatbot_llm_gateway_total", "counter",
+                 "LLM gateway outcomes: ok, retry, coalesced, failed, circuit_open, queue_timeout.")
@@ -0,0 +1,213 @@
+"""
+Place-name resolution over the municipalities, the landmarks and their
+English translations (saves/landmarks.json).
+
+validate_location used to loop over location_mapping with substring checks
+and stop at the first hit, and it only knew the 78 municipalities, so every
+landmark name went through the LLM. NameResolver is built once and has:
+
+- folding: lowercase, no accents, punctuation as spaces, single spaces;
+  "Mayagüez", "mayaguez" and "MAYAGUEZ " are the same key, and a space-free
+  form makes "sanjuan" find "San Juan".
+- a character trie of every alias, for exact lookups and for finding the
+  longest name written anywhere in a sentence (microseconds).
+- a trigram index for misspellings ("mayaguex", "el yunqe"), scored with the
+  Dice coefficient of the trigram sets.
+
+Aliases of a landmark: its name, its English translation and, when no other
+landmark shares it, its name without the "(Town, Puerto Rico)" qualifier.
+"""
+import json
+import os
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+from landmarks import SAVES_DIR, load_landmarks, load_municipalities
+
+TRANSLATIONS_JSON = os.path.join(SAVES_DIR, 'landmarks.json')
+
+# 🔹 Shortest alias looked up inside sentences, so short words don't match by accident
+MIN_ALIAS_LENGTH = 4
+# 🔹 Minimum trigram score of a fuzzy match
+MIN_FUZZY_SCORE = 0.6
+
+# source is "landmarks" or "municipalities" (same values as the Chroma metadata)
+NameMatch = namedtuple("NameMatch", ["id", "source", "name", "score"])
+
+
+def fold(text):
+    """
+    Lowercase, accent-free, punctuation-free, single-spaced text.
+    """
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]|_", " ", text).split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameResolver:
+    """
+    Parameters:
+    entries (list): (alias, id, source, canonical name) tuples. Earlier entries
+        win when two places share an alias.
+    """
+
+    def __init__(self, entries):
+        self.targets = []  # target index -> NameMatch with score 1.0
+        self.trie = {}  # char -> child node; key None holds the target index
+        self.aliases = []  # (folded alias, target index), for fuzzy matching
+        target_index = {}
+        for alias, place_id, source, name in entries:
+            key = fold(alias)
+            if len(key) < 2:
+                continue
+            target = target_index.get((source, place_id))
+            if target is None:
+                target = target_index[(source, place_id)] = len(self.targets)
+                self.targets.append(NameMatch(place_id, source, name, 1.0))
+            if self._insert(key, target):
+                self.aliases.append((key, target))
+            self._insert(key.replace(" ", ""), target)
+
+        self.trigram_index = {}
+        for position, (key, _) in enumerate(self.aliases):
+            for gram in trigrams(key):
+                self.trigram_index.setdefault(gram, []).append(position)
+        self.alias_grams = [len(trigrams(key)) for key, _ in self.aliases]
+
+    def _insert(self, key, target):
+        node = self.trie
+        for char in key:
+            node = node.setdefault(char, {})
+        if None in node:
+            return False
+        node[None] = target
+        return True
+
+    def _allowed(self, target, sources):
+        return sources is None or self.targets[target].source in sources
+
+    def exact(self, name, sources=None):
+        """
+        NameMatch of a name written exactly (up to folding), or None.
+        """
+        key = fold(name)
+        for candidate in (key, key.replace(" ", "")):
+            node = self.trie
+            for char in candidate:
+                node = node.get(char)
+                if node is None:
+                    break
+            else:
+                target = node.get(None)
+                if target is not None and self._allowed(target, sources):
+                    return self.targets[target]
+        return None
+
+    def fuzzy(self, name, sources=None, min_score=MIN_FUZZY_SCORE):
+        """
+        Best NameMatch by trigram similarity (score in 0-1), or None below min_score.
+        """
+        key = fold(name)
+        grams = trigrams(key)
+        shared = {}
+        for gram in grams:
+            for position in self.trigram_index.get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        best, best_score = None, min_score
+        for position, count in shared.items():
+            score = 2 * count / (len(grams) + self.alias_grams[position])
+            target = self.aliases[position][1]
+            if score > best_score and self._allowed(target, sources):
+                best, best_score = target, score
+        if best is None:
+            return None
+        return self.targets[best]._replace(score=round(best_score, 3))
+
+    def resolve(self, name, sources=None, min_score=MIN_FUZZY_SCORE):
+        """
+        Exact match, else the best fuzzy match, else None.
+        """
+        return self.exact(name, sources) or self.fuzzy(name, sources, min_score)
+
+    def find_in_text(self, text, sources=None):
+        """
+        Longest place name written in a sentence ("I want to go to Cueva
+        Ventana tomorrow"), landmarks first on ties, or None.
+        """
+        key = fold(text)
+        best = None
+        starts = [0] + [m.end() for m in re.finditer(" ", key)]
+        for start in starts:
+            node = self.trie
+            for end in range(start, len(key)):
+                node = node.get(key[end])
+                if node is None:
+                    break
+                boundary = end + 1 == len(key) or key[end + 1] == " "
+                target = node.get(None)
+                if target is None or not boundary or end + 1 - start < MIN_ALIAS_LENGTH:
+                    continue
+                if not self._allowed(target, sources):
+                    continue
+                rank = (end + 1 - start, self.targets[target].source == "landmarks")
+                if best is None or rank > best[0]:
+                    best = (rank, target)
+        return self.targets[best[1]] if best else None
+
+    def find(self, text, sources=None, max_fuzzy_words=6):
+        """
+        find_in_text, falling back to a fuzzy match of the whole input when it is
+        short enough to be just a (misspelled) name.
+        """
+        match = self.find_in_text(text, sources)
+        if match is None and len(fold(text).split()) <= max_fuzzy_words:
+            match = self.fuzzy(text, sources)
+        return match
+
+
+def _without_qualifier(name):
+    # "Ensenada Honda (Culebra, Puerto Rico)" -> "Ensenada Honda"
+    return re.sub(r"\s*\(.*?\)\s*", " ", name).strip()
+
+
+def name_entries():
+    """
+    (alias, id, source, canonical name) for every municipality and landmark.
+    """
+    entries = [(m["name"], m["id"], "municipalities", m["name"]) for m in load_municipalities()]
+    landmarks = load_landmarks()
+    entries += [(l["name"], l["id"], "landmarks", l["name"]) for l in landmarks]
+
+    if os.path.exists(TRANSLATIONS_JSON):
+        with open(TRANSLATIONS_JSON, encoding='utf-8') as f:
+            translations = {fold(name): english for name, english in json.load(f).items()}
+        for landmark in landmarks:
+            english = translations.get(fold(landmark["name"]))
+            if english:
+                entries.append((english, landmark["id"], "landmarks", landmark["name"]))
+
+    # Names without their qualifier, only when they point to one landmark
+    short = {}
+    for landmark in landmarks:
+        alias = _without_qualifier(landmark["name"])
+        if alias != landmark["name"]:
+            short.setdefault(fold(alias), []).append(landmark)
+    for alias, matches in short.items():
+        if len(matches) == 1:
+            entries.append((alias, matches[0]["id"], "landmarks", matches[0]["name"]))
+    return entries
+
+
+@lru_cache(maxsize=None)
+def get_name_resolver():
+    """
+    Shared resolver, built on first use (~50 ms).
+    """
+    return NameResolver(name_entries())
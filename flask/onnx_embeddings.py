@@ -0,0 +1,201 @@
+"""
+all-MiniLM-L6-v2 on ONNX Runtime, as an alternative to unpickling
+sentence_transformer_embeddings.pkl (a whole HuggingFaceEmbeddings object that
+pulls in torch) at startup.
+
+The model is loaded from a plain directory with:
+    model.onnx            (or model_int8.onnx, dynamically quantized)
+    tokenizer.json        fast tokenizer of the same model
+
+and reproduces the sentence-transformers pipeline the notebook used to build
+chroma_db: mean pooling over the attention mask, then L2 normalization. Only
+onnxruntime, tokenizers and numpy are needed at runtime.
+
+Export the weights once (needs torch + transformers, from the flask folder):
+    python onnx_embeddings.py export --out ../models/all-MiniLM-L6-v2 --quantize
+
+Check them against the vectors stored in the index (see vector_index.py):
+    python onnx_embeddings.py verify --model ../models/all-MiniLM-L6-v2 --index ../vector_index
+
+Pick the backend with EMBEDDINGS_BACKEND=pickle (default) or
+EMBEDDINGS_BACKEND=onnx (EMBEDDINGS_MODEL_DIR sets the directory,
+EMBEDDINGS_ONNX_FILE picks model.onnx or model_int8.onnx).
+"""
+import os
+import pickle
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(REPO_DIR, 'models', 'all-MiniLM-L6-v2')
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_LENGTH = 256  # max_seq_length of all-MiniLM-L6-v2 in sentence-transformers
+
+# 🔹 Minimum cosine similarity with the stored vectors for the index to stay valid
+MIN_COSINE = {"model.onnx": 0.999, "model_int8.onnx": 0.98}
+
+
+class OnnxEmbeddings:
+    """
+    LangChain-style embeddings (embed_query/embed_documents) on ONNX Runtime.
+
+    Parameters:
+    model_dir (str): Directory with the .onnx file and tokenizer.json.
+    onnx_file (str): model.onnx (fp32) or model_int8.onnx (quantized).
+    batch_size (int): Texts per inference call; each batch is padded to its longest text.
+    threads (int): intra-op threads of the ONNX session (0 = onnxruntime's default).
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, onnx_file="model.onnx", batch_size=32, threads=0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir
+        self.onnx_file = onnx_file
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")  # pads to the longest text of the batch
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+        # Mean pooling over the real tokens, then unit length
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts):
+        """
+        float32 matrix (len(texts) x 384) of unit vectors.
+        """
+        # Same preprocessing as HuggingFaceEmbeddings
+        texts = [text.replace("\n", " ") for text in texts]
+        if not texts:
+            return np.zeros((0, 384), dtype=np.float32)
+        # Sorting by length keeps the padding of each batch small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = np.empty((len(texts), 384), dtype=np.float32)
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            vectors[rows] = self._encode_batch([texts[i] for i in rows])
+        return vectors
+
+    def embed_documents(self, texts):
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self.encode([text])[0].tolist()
+
+
+def load_embeddings():
+    """
+    Embeddings picked by the EMBEDDINGS_BACKEND environment variable (run from the flask folder).
+    """
+    if os.getenv("EMBEDDINGS_BACKEND", "pickle") == "onnx":
+        return OnnxEmbeddings(
+            os.getenv("EMBEDDINGS_MODEL_DIR", MODEL_DIR),
+            onnx_file=os.getenv("EMBEDDINGS_ONNX_FILE", "model.onnx"),
+        )
+    with open('sentence_transformer_embeddings.pkl', 'rb') as f:
+        return pickle.load(f)
+
+
+def export_model(out_dir, quantize=False):
+    """
+    Write model.onnx (and model_int8.onnx) plus tokenizer.json for all-MiniLM-L6-v2.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    tokenizer.save_pretrained(out_dir)
+    model = AutoModel.from_pretrained(MODEL_NAME).eval()
+
+    sample = tokenizer(["a sample sentence", "another one"], padding=True, return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {"batch": 0, "tokens": 1}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in names), os.path.join(out_dir, "model.onnx"),
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes={**{name: dynamic for name in names}, "last_hidden_state": dynamic},
+            opset_version=14,
+        )
+    print(f"Saved model.onnx and tokenizer to {out_dir}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(os.path.join(out_dir, "model.onnx"), os.path.join(out_dir, "model_int8.onnx"),
+                         weight_type=QuantType.QInt8)
+        print(f"Saved model_int8.onnx to {out_dir}")
+
+
+def verify(embeddings, index_dir, sample=500, k=7, seed=0):
+    """
+    Re-encode a sample of the indexed documents and compare with the stored vectors.
+
+    Returns:
+    dict: min/mean cosine similarity with the stored vectors, and the share of
+    top-k neighbours (searched with the new vectors) that match the stored ones.
+    """
+    from vector_index import NumpyVectorIndex
+
+    index = NumpyVectorIndex(index_dir)
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), size=min(sample, len(index)), replace=False)
+    new = np.asarray(embeddings.embed_documents([index.documents[row] for row in rows]), dtype=np.float32)
+    stored = np.asarray(index.vectors[rows])
+    cosines = (new * stored).sum(axis=1)
+
+    same = 0
+    for new_vector, stored_vector in zip(new, stored):
+        a = {row for row, _ in index.top_k(new_vector, k)}
+        b = {row for row, _ in index.top_k(stored_vector, k)}
+        same += len(a & b)
+    return {
+        "documents": len(rows),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        f"top{k}_agreement": same / (k * len(rows)),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export or verify the ONNX all-MiniLM-L6-v2 backend")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("--out", default=MODEL_DIR)
+    export_parser.add_argument("--quantize", action="store_true", help="also write model_int8.onnx")
+    verify_parser = subparsers.add_parser("verify")
+    verify_parser.add_argument("--model", default=MODEL_DIR)
+    verify_parser.add_argument("--index", default=os.path.join(REPO_DIR, 'vector_index'))
+    verify_parser.add_argument("--sample", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_model(args.out, args.quantize)
+    else:
+        for onnx_file, min_cosine in MIN_COSINE.items():
+            if not os.path.exists(os.path.join(args.model, onnx_file)):
+                continue
+            result = verify(OnnxEmbeddings(args.model, onnx_file), args.index, args.sample)
+            status = "OK" if result["min_cosine"] >= min_cosine else f"FAIL (min cosine below {min_cosine})"
+            print(f"{onnx_file}: {result} {status}")
@@ -0,0 +1,142 @@
+"""
+Lazy, thread-safe registry for the app's heavy resources (OpenAI client,
+embedding model, vector store).
+
+app.py used to build all of them at import time, so a new worker couldn't
+even serve "/" until the model was unpickled and Chroma was opened. Now each
+resource is registered with a factory and built on first use (once, even if
+several requests need it at the same time). The module-level names app.py
+uses (client, db, sentence_transformer_embeddings) are LazyProxy objects that
+build the resource on their first attribute access, so the call sites don't
+change.
+
+warm_up() loads everything in a background thread at boot and runs a first
+query; /readyz reports ready once the resources needed to answer /get are
+loaded and that warm-up is over, and starts (or retries) the warm-up when nothing is loading.
+"""
+import threading
+import time
+
+
+class ResourceRegistry:
+    def __init__(self):
+        self._factories = {}  # name -> factory
+        self._resources = {}  # name -> built resource
+        self._errors = {}  # name -> last exception
+        self._load_ms = {}  # name -> build time
+        self._locks = {}  # name -> lock held while building
+        self._lock = threading.Lock()
+        self._warm_thread = None
+
+    def register(self, name, factory):
+        """
+        Register a factory (no arguments) that builds the resource `name`.
+        """
+        with self._lock:
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        """
+        The resource, built on first call. Concurrent callers wait for the same build.
+        """
+        resource = self._resources.get(name)
+        if resource is not None:
+            return resource
+        with self._locks[name]:
+            resource = self._resources.get(name)
+            if resource is None:
+                start = time.perf_counter()
+                try:
+                    resource = self._factories[name]()
+                except Exception as error:
+                    self._errors[name] = error
+                    raise
+                self._load_ms[name] = (time.perf_counter() - start) * 1000
+                self._errors.pop(name, None)
+                self._resources[name] = resource
+                print(f"resource {name} loaded in {self._load_ms[name]:.0f} ms")
+        return resource
+
+    def loaded(self, name):
+        return name in self._resources
+
+    def ready(self, names=None):
+        """
+        True if all the given resources (default: every registered one) are loaded.
+        """
+        return all(self.loaded(name) for name in (names or self._factories))
+
+    def warming(self):
+        """
+        True while the warm-up thread is still running.
+        """
+        return self._warm_thread is not None and self._warm_thread.is_alive()
+
+    def status(self):
+        """
+        {name: "loaded" / "loading" / "not loaded" / "failed: ..."} plus build times.
+        """
+        status = {}
+        for name in self._factories:
+            if name in self._resources:
+                status[name] = {"state": "loaded", "load_ms": round(self._load_ms[name], 1)}
+            elif name in self._errors:
+                status[name] = {"state": f"failed: {self._errors[name]}"}
+            elif self._locks[name].locked():
+                status[name] = {"state": "loading"}
+            else:
+                status[name] = {"state": "not loaded"}
+        return status
+
+    def proxy(self, name):
+        return LazyProxy(self, name)
+
+    def warm_up(self, names=None, after=None, background=True):
+        """
+        Load the resources (default: all, in registration order), then call `after`
+        (e.g. a first query, so model weights are paged in). Runs in a daemon
+        thread unless background=False. Failures are logged and left for the
+        first request, or the next warm_up call, to retry. While a warm-up thread
+        is running, further calls return that thread.
+        """
+        def run():
+            for name in names or list(self._factories):
+                try:
+                    self.get(name)
+                except Exception as error:
+                    print(f"warm-up of {name} failed: {error}")
+            if after is not None:
+                try:
+                    after()
+                except Exception as error:
+                    print(f"warm-up query failed: {error}")
+
+        if not background:
+            run()
+            return None
+        with self._lock:
+            if not self.warming():
+                self._warm_thread = threading.Thread(target=run, name="warm-up", daemon=True)
+                self._warm_thread.start()
+        return self._warm_thread
+
+
+class LazyProxy:
+    """
+    Stands in for a registry resource and builds it on the first attribute access.
+    """
+
+    def __init__(self, registry, name):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attribute):
+        return getattr(self._registry.get(self._name), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._registry.get(self._name), attribute, value)
+
+    def __repr__(self):
+        state = "loaded" if self._registry.loaded(self._name) else "not loaded"
+        return f"<lazy {self._name} ({state})>"
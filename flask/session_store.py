@@ -0,0 +1,233 @@
+"""
+Server-side conversation store.
+
+The Flask cookie session used to carry the whole conversation_state (every
+message, the 7 suggested Documents with their text, the current location...)
+and send it back and forth on every request. Now the cookie only holds a
+session id, and the state lives here:
+
+- MemorySessionStore: in-process LRU, for a single worker.
+- SQLiteSessionStore: on disk, shared by every worker on the machine. Messages
+  are appended incrementally instead of rewriting the whole history.
+
+Landmarks (suggested, current and locked locations) are stored as landmark ids
+and rebuilt from the structured data on load. Sessions idle for longer than
+`idle_ttl` seconds are expired.
+
+Pick one with SESSION_STORE=memory (default) or SESSION_STORE=sqlite
+(SESSION_DB sets the file, default ./sessions.sqlite3).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from landmarks import landmark_document, landmarks_by_id, location_id
+
+LOCATION_KEYS = ("current_location",)
+LOCATION_LIST_KEYS = ("suggested_locations", "locked_locations")
+
+
+def _pack_location(location):
+    landmark_id = location_id(location)
+    if landmark_id is not None and landmark_id in landmarks_by_id():
+        return {"landmark_id": landmark_id}
+    return location  # not a known landmark: keep it as is
+
+
+def _unpack_location(location):
+    if isinstance(location, dict) and "landmark_id" in location:
+        return landmark_document(location["landmark_id"])
+    return location
+
+
+def dehydrate(conversation_state):
+    """
+    Compact copy of the state, without messages and with landmarks as ids.
+    """
+    state = {key: value for key, value in conversation_state.items() if key != "messages"}
+    for key in LOCATION_KEYS:
+        if state.get(key):
+            state[key] = _pack_location(state[key])
+    for key in LOCATION_LIST_KEYS:
+        state[key] = [_pack_location(location) for location in state.get(key) or []]
+    return state
+
+
+def hydrate(state, messages):
+    """
+    Inverse of dehydrate.
+    """
+    conversation_state = dict(state)
+    for key in LOCATION_KEYS:
+        if conversation_state.get(key):
+            conversation_state[key] = _unpack_location(conversation_state[key])
+    for key in LOCATION_LIST_KEYS:
+        conversation_state[key] = [_unpack_location(location) for location in conversation_state.get(key) or []]
+    conversation_state["messages"] = list(messages)
+    return conversation_state
+
+
+class MemorySessionStore:
+    """
+    In-process LRU session store.
+
+    Parameters:
+    max_sessions (int): Least recently used sessions are dropped past this.
+    idle_ttl (float): Seconds without a request before a session expires.
+    """
+
+    def __init__(self, max_sessions=10000, idle_ttl=3600):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()  # sid -> (last_seen, step, state, messages)
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        """
+        (current_step, conversation_state) of the session, or None if unknown/expired.
+        """
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.idle_ttl:
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            return entry[1], hydrate(entry[2], entry[3])
+
+    def save(self, sid, current_step, conversation_state):
+        entry = (time.time(), current_step, dehydrate(conversation_state), list(conversation_state.get("messages", [])))
+        with self._lock:
+            self._sessions[sid] = entry
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def expire_idle(self):
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            for sid in [sid for sid, entry in self._sessions.items() if entry[0] < cutoff]:
+                del self._sessions[sid]
+
+
+class SQLiteSessionStore:
+    """
+    SQLite-backed session store with incremental message appends.
+
+    Parameters:
+    path (str): Database file.
+    idle_ttl (float): Seconds without a request before a session expires.
+    expire_every (float): How often (seconds) save() sweeps expired sessions.
+    """
+
+    def __init__(self, path="sessions.sqlite3", idle_ttl=3600, expire_every=60):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.expire_every = expire_every
+        self._last_expire = 0
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    step TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    n_messages INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    sid TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    PRIMARY KEY (sid, seq)
+                );
+                CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+            """)
+
+    def _connection(self):
+        # One connection per thread; WAL lets readers and the writer work at the same time
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT step, state, updated_at FROM sessions WHERE sid = ?", (sid,)
+        ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[2] > self.idle_ttl:
+            self.delete(sid)
+            return None
+        messages = [
+            {"role": role, "content": content}
+            for role, content in conn.execute(
+                "SELECT role, content FROM messages WHERE sid = ? ORDER BY seq", (sid,)
+            )
+        ]
+        return row[0], hydrate(json.loads(row[1]), messages)
+
+    def save(self, sid, current_step, conversation_state):
+        messages = conversation_state.get("messages", [])
+        with self._connection() as conn:
+            # Take the write lock before reading the count, so two requests for the
+            # same session (a double submit, /stream and /get) can't both append at it
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT n_messages FROM sessions WHERE sid = ?", (sid,)).fetchone()
+            stored = row[0] if row else 0
+            if stored > len(messages):
+                # History was shortened (e.g. compacted), rewrite it
+                stored = 0
+            conn.execute("DELETE FROM messages WHERE sid = ? AND seq >= ?", (sid, stored))
+            # Only the messages added since the last save are written
+            conn.executemany(
+                "INSERT INTO messages (sid, seq, role, content) VALUES (?, ?, ?, ?)",
+                [(sid, seq, message["role"], message["content"])
+                 for seq, message in enumerate(messages[stored:], start=stored)],
+            )
+            conn.execute(
+                "INSERT INTO sessions (sid, step, state, n_messages, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (sid) DO UPDATE SET step = excluded.step, state = excluded.state, "
+                "n_messages = excluded.n_messages, updated_at = excluded.updated_at",
+                (sid, current_step, json.dumps(dehydrate(conversation_state)), len(messages), time.time()),
+            )
+        if time.time() - self._last_expire > self.expire_every:
+            self.expire_idle()
+
+    def delete(self, sid):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM messages WHERE sid = ?", (sid,))
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def expire_idle(self):
+        self._last_expire = time.time()
+        cutoff = time.time() - self.idle_ttl
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM messages WHERE sid IN (SELECT sid FROM sessions WHERE updated_at < ?)", (cutoff,)
+            )
+            conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+
+
+def make_session_store():
+    """
+    Session store picked by the SESSION_STORE environment variable.
+    """
+    idle_ttl = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+    if os.getenv("SESSION_STORE", "memory") == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB", "sessions.sqlite3"), idle_ttl=idle_ttl)
+    return MemorySessionStore(idle_ttl=idle_ttl)
@@ -0,0 +1,424 @@
+"""
+Timing spans, counters and sampled per-request traces for the chatbot.
+
+The only observability used to be a few prints ("inside chat", "Current
+step:"), so a slow turn couldn't be pinned on OpenAI, retrieval, the weather
+API or the session store. This module records:
+
+- spans: the duration of every LLM call (tagged with the calling function and
+  the conversation step), similarity_search, weather fetch and session
+  load/save, kept as Prometheus histograms (chatbot_span_seconds);
+- counters: LLM tokens in/out, state transitions, requests, plus collectors
+  read at scrape time (cache hits of llm_cache and the embedding cache...);
+- traces: for a sample of requests (TRACE_SAMPLE_RATE, or any request sent
+  with "X-Trace: 1" / "?trace=1") the list of spans of that request, kept in
+  a ring buffer and served by /trace/<request_id>.
+
+Everything is exposed in the Prometheus text format by render_metrics()
+(the /metrics route). With LOG_FORMAT=json every span and request is also
+printed as one JSON line.
+
+The current request and step live in context variables, so spans recorded in
+asyncio tasks and asyncio.to_thread calls land in the right trace; spans
+recorded outside a request (benchmarks, scripts) still update the metrics.
+"""
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+
+# Fraction of requests whose full trace is kept
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+# Number of sampled traces kept in memory
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "500"))
+# LOG_FORMAT=json prints one JSON line per span and per request
+JSON_LOGS = os.getenv("LOG_FORMAT") == "json"
+# Upper bounds (seconds) of the span histogram buckets
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_trace = contextvars.ContextVar("trace", default=None)
+_step = contextvars.ContextVar("step", default="")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe counters and histograms, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, buckets=SPAN_BUCKETS):
+        self.buckets = buckets
+        self._counters = defaultdict(float)  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., count, sum]
+        self._help = {}  # name -> (type, help)
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            counts = self._histograms.get(key)
+            if counts is None:
+                counts = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def add_collector(self, collect):
+        """
+        Register a function called at every scrape; it returns
+        [(name, kind, help, {labels}, value), ...] for values kept elsewhere.
+        """
+        self._collectors.append(collect)
+
+    def counter(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        families = defaultdict(list)  # name -> lines
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                families[name].append(f"{name}{_label_text(labels)} {value:g}")
+            for (name, labels), counts in self._histograms.items():
+                for bound, count in zip(self.buckets, counts):
+                    families[name].append(f"{name}_bucket{_label_text(labels + (('le', f'{bound:g}'),))} {count}")
+                families[name].append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {counts[-2]}")
+                families[name].append(f"{name}_count{_label_text(labels)} {counts[-2]}")
+                families[name].append(f"{name}_sum{_label_text(labels)} {counts[-1]:.6f}")
+        help_texts = dict(self._help)
+        for collect in self._collectors:
+            try:
+                samples = collect()
+            except Exception as error:
+                print(f"metrics collector failed: {error}")
+                continue
+            for name, kind, text, labels, value in samples:
+                help_texts.setdefault(name, (kind, text))
+                families[name].append(f"{name}{_label_text(tuple(sorted(labels.items())))} {value:g}")
+
+        lines = []
+        for name in sorted(families):
+            kind, text = help_texts.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(families[name])
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("chatbot_span_seconds", "histogram", "Duration of LLM calls, retrieval, weather fetches and session I/O.")
+metrics.describe("chatbot_llm_tokens_total", "counter", "LLM tokens sent (in) and generated (out), by calling function.")
+metrics.describe("chatbot_state_transitions_total", "counter", "Conversation step changes.")
+metrics.describe("chatbot_requests_total", "counter", "Requests served, by route and status.")
+metrics.describe("chatbot_request_seconds", "histogram", "Request duration, by route.")
+
+
+# 🔹 Traces
+class Trace:
+    """
+    The spans of one request. Only sampled traces keep their spans.
+    """
+
+    def __init__(self, request_id, route, sampled):
+        self.request_id = request_id
+        self.route = route
+        self.sampled = sampled
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans = []
+        self.tags = {}
+        self.status = 200
+        self.duration_ms = None
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    def to_dict(self):
+        return {
+            "request_id": self.request_id, "route": self.route,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "duration_ms": round(self.duration_ms or self.elapsed_ms(), 3), "tags": self.tags, "spans": list(self.spans),
+        }
+
+
+class TraceStore:
+    """
+    The last `max_traces` sampled traces, by request id. Traces are kept as
+    objects, so spans that end after the request (a streamed reply under
+    Quart) still show up.
+    """
+
+    def __init__(self, max_traces=TRACE_BUFFER):
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace):
+        with self._lock:
+            self._traces[trace.request_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+
+    def get(self, request_id):
+        with self._lock:
+            trace = self._traces.get(request_id)
+        return trace.to_dict() if trace is not None else None
+
+    def recent(self):
+        with self._lock:
+            return list(self._traces)
+
+
+traces = TraceStore()
+
+
+def log_json(event, **fields):
+    if JSON_LOGS:
+        print(json.dumps({"ts": round(time.time(), 3), "event": event, **fields}, default=str))
+
+
+def start_trace(route, request_id=None, force=False):
+    """
+    Start the trace of a request in the current context.
+
+    Parameters:
+    route (str): Route name, e.g. "/get".
+    request_id (str): The caller's id (X-Request-Id header), or None for a new one.
+    force (bool): Keep this trace even if it isn't sampled.
+
+    Returns:
+    Trace: The new trace.
+    """
+    trace = Trace(request_id or uuid.uuid4().hex, route, force or random.random() < TRACE_SAMPLE_RATE)
+    _trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _trace.get()
+
+
+def finish_trace(error=None):
+    """
+    Close the current request's trace: count it, log it and keep it if sampled.
+    """
+    trace = _trace.get()
+    if trace is None:
+        return None
+    _trace.set(None)
+    status = 500 if error is not None else trace.status
+    duration_ms = trace.duration_ms = trace.elapsed_ms()
+    metrics.inc("chatbot_requests_total", route=trace.route, status=status)
+    metrics.observe("chatbot_request_seconds", duration_ms / 1000, route=trace.route)
+    if trace.sampled:
+        traces.add(trace)
+    log_json("request", request_id=trace.request_id, route=trace.route, status=status,
+             duration_ms=round(duration_ms, 3), **trace.tags)
+    return trace
+
+
+def set_step(step):
+    """
+    Conversation step the following spans are tagged with.
+    """
+    _step.set(step or "")
+    trace = _trace.get()
+    if trace is not None:
+        trace.tags.setdefault("step", step)
+
+
+def count(name, amount=1, **labels):
+    metrics.inc(name, amount, **labels)
+
+
+def record_transition(from_step, to_step, action):
+    count("chatbot_state_transitions_total", from_step=from_step, to_step=to_step)
+    trace = _trace.get()
+    if trace is not None:
+        trace.tags.update(action=action, next_step=to_step)
+
+
+# 🔹 Spans
+class Span:
+    """
+    One timed operation. Use span() unless the end isn't in the same block
+    (e.g. a streamed LLM reply).
+    """
+
+    def __init__(self, name, function=None, **tags):
+        self.name = name
+        self.function = function or ""
+        self.step = _step.get()
+        self.tags = tags
+        self.trace = _trace.get()
+        self._start = time.perf_counter()
+
+    def finish(self, error=None):
+        seconds = time.perf_counter() - self._start
+        metrics.observe("chatbot_span_seconds", seconds, span=self.name, function=self.function, step=self.step)
+        record = {"span": self.name, "function": self.function, "step": self.step,
+                  "duration_ms": round(seconds * 1000, 3), **self.tags}
+        if error is not None:
+            record["error"] = type(error).__name__
+        if self.trace is not None:
+            if self.trace.sampled:
+                record["start_ms"] = round((self._start - self.trace._start) * 1000, 3)
+                self.trace.spans.append(record)
+            record["request_id"] = self.trace.request_id
+        log_json("span", **record)
+
+
+@contextmanager
+def span(name, function=None, **tags):
+    """
+    Time the block as a span. Extra tags go to the trace and the JSON logs
+    (not to the metric labels, to keep their number small).
+    """
+    current = Span(name, function, **tags)
+    try:
+        yield current
+    except BaseException as error:
+        current.finish(error)
+        raise
+    current.finish()
+
+
+class Traced:
+    """
+    Proxy that records a span around the given methods of an object, e.g.
+    Traced(store, {"similarity_search": "retrieval"}). Everything else passes through.
+    """
+
+    def __init__(self, target, spans):
+        self._target = target
+        self._spans = spans
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        span_name = self._spans.get(name)
+        if span_name is None or not callable(attribute):
+            return attribute
+
+        def traced_call(*args, **kwargs):
+            with span(span_name, function=name):
+                return attribute(*args, **kwargs)
+        return traced_call
+
+
+# 🔹 LLM calls
+def record_usage(function, usage):
+    """
+    Count the prompt/completion tokens of an OpenAI response's usage.
+    """
+    if usage is None:
+        return
+    count("chatbot_llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, direction="in", function=function)
+    count("chatbot_llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, direction="out", function=function)
+
+
+class _Completions:
+    def __init__(self, completions, asynchronous):
+        self._completions = completions
+        self._asynchronous = asynchronous
+
+    def create(self, span_name="llm", **kwargs):
+        # span_name: the app function the call is for, e.g. "gpt_extract_info" or "chat"
+        function = span_name
+        current = Span("llm", function, model=kwargs.get("model"), stream=bool(kwargs.get("stream")))
+        if self._asynchronous:
+            return self._create_async(current, function, kwargs)
+        try:
+            response = self._completions.create(**kwargs)
+        except BaseException as error:
+            current.finish(error)
+            raise
+        if kwargs.get("stream"):
+            return self._stream(current, function, response)
+        record_usage(function, response.usage)
+        current.finish()
+        return response
+
+    async def _create_async(self, current, function, kwargs):
+        try:
+            response = await self._completions.create(**kwargs)
+        except BaseException as error:
+            current.finish(error)
+            raise
+        if kwargs.get("stream"):
+            return self._stream_async(current, function, response)
+        record_usage(function, response.usage)
+        current.finish()
+        return response
+
+    # Streamed replies have no usage: every content chunk is about one token
+    def _stream(self, current, function, stream):
+        chunks = 0
+        try:
+            for chunk in stream:
+                chunks += 1
+                yield chunk
+        finally:
+            count("chatbot_llm_tokens_total", chunks, direction="out", function=function)
+            current.finish()
+
+    async def _stream_async(self, current, function, stream):
+        chunks = 0
+        try:
+            async for chunk in stream:
+                chunks += 1
+                yield chunk
+        finally:
+            count("chatbot_llm_tokens_total", chunks, direction="out", function=function)
+            current.finish()
+
+
+class TracedLLMClient:
+    """
+    OpenAI client whose chat.completions.create records an "llm" span
+    (calling function, step, model) and the token counts. Callers name the
+    function with create(span_name=...), which is not sent to OpenAI.
+
+    Parameters:
+    client: OpenAI or AsyncOpenAI client.
+    asynchronous (bool): True for AsyncOpenAI.
+    """
+
+    def __init__(self, client, asynchronous=False):
+        self._client = client
+        completions = _Completions(client.chat.completions, asynchronous)
+        self.chat = type("Chat", (), {"completions": completions})()
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def render_metrics():
+    return metrics.render()
+
+
+def get_trace(request_id):
+    return traces.get(request_id)
@@ -0,0 +1,172 @@
+"""
+In-process vector index, an alternative to Chroma for the app's retrieval.
+
+The corpus is small (~2,300 chunks: 574 landmarks, 78 municipalities and the
+El Mundo news), so instead of going through Chroma's persistent client every
+search is one matrix-vector product over all embeddings plus an argpartition.
+
+On disk an index is a directory with:
+    vectors.npy     float32 matrix (n_docs x dim), rows L2-normalized
+    documents.json  ids, page contents and metadatas, in row order
+
+vectors.npy is memory-mapped, so startup doesn't read it all in and every
+worker process shares the same pages. Metadata filters ({'source': 'landmarks'})
+use boolean row masks computed once per (key, value).
+
+Pick the backend with VECTOR_BACKEND=chroma (default) or VECTOR_BACKEND=numpy
+(VECTOR_INDEX_DIR sets the directory, default ../vector_index).
+
+Export the existing Chroma collection from the flask folder:
+    python vector_index.py --chroma ../chroma_db --out ../vector_index
+or build it from the corpus, re-embedding only what changed since the last build:
+    python index_builder.py --out ../vector_index
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VECTOR_INDEX_DIR = os.path.join(REPO_DIR, 'vector_index')
+VECTORS_FILE = 'vectors.npy'
+DOCUMENTS_FILE = 'documents.json'
+
+
+def make_document(page_content, metadata):
+    # Same Document class Chroma returns, so callers can't tell the backends apart
+    from langchain_core.documents import Document
+    return Document(page_content=page_content, metadata=metadata)
+
+
+def normalize_rows(vectors):
+    """
+    float32 copy of the vectors with unit L2 norm (zero rows stay zero).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def save_index(path, ids, vectors, documents, metadatas):
+    """
+    Write an index directory (see the module docstring).
+    """
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, VECTORS_FILE), normalize_rows(vectors))
+    with open(os.path.join(path, DOCUMENTS_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"ids": list(ids), "documents": list(documents), "metadatas": list(metadatas)},
+                  f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Saved {len(ids)} vectors to {path}")
+
+
+def export_chroma(persist_directory, path):
+    """
+    Copy the embeddings, texts and metadatas of a Chroma collection into an index directory.
+    """
+    from langchain_chroma import Chroma
+    data = Chroma(persist_directory=persist_directory).get(include=["embeddings", "documents", "metadatas"])
+    save_index(path, data["ids"], data["embeddings"], data["documents"], data["metadatas"])
+
+
+class NumpyVectorIndex:
+    """
+    Brute-force cosine search over a memory-mapped embedding matrix, with the
+    similarity_search interface app.py uses on Chroma.
+
+    Parameters:
+    path (str): Index directory.
+    embedding_function: Embeddings object (embed_query) used for text queries.
+    mmap (bool): Memory-map vectors.npy instead of reading it into RAM.
+    """
+
+    def __init__(self, path=VECTOR_INDEX_DIR, embedding_function=None, mmap=True):
+        self.path = path
+        self.embedding_function = embedding_function
+        self.vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode='r' if mmap else None)
+        with open(os.path.join(path, DOCUMENTS_FILE), encoding='utf-8') as f:
+            data = json.load(f)
+        self.ids = data["ids"]
+        self.documents = data["documents"]
+        self.metadatas = [metadata or {} for metadata in data["metadatas"]]
+        self._masks = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _mask(self, key, value):
+        # Rows whose metadata[key] == value, computed once
+        mask = self._masks.get((key, value))
+        if mask is None:
+            mask = np.fromiter((metadata.get(key) == value for metadata in self.metadatas),
+                               dtype=bool, count=len(self.metadatas))
+            with self._lock:
+                self._masks[(key, value)] = mask
+        return mask
+
+    def filter_mask(self, filter):
+        """
+        Boolean row mask of a Chroma-style equality filter ({'source': 'landmarks'}), or None.
+        """
+        if not filter:
+            return None
+        mask = None
+        for key, value in filter.items():
+            key_mask = self._mask(key, value)
+            mask = key_mask if mask is None else mask & key_mask
+        return mask
+
+    def top_k(self, query_vector, k=4, filter=None):
+        """
+        (row, cosine similarity) of the k nearest rows, best first.
+        """
+        query = normalize_rows(query_vector).reshape(-1)
+        scores = self.vectors @ query
+        mask = self.filter_mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        rows = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        rows = rows[np.argsort(-scores[rows])]
+        return [(int(row), float(scores[row])) for row in rows]
+
+    def _result(self, row):
+        return make_document(self.documents[row], dict(self.metadatas[row]))
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [self._result(row) for row, _ in self.top_k(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        """
+        (Document, cosine distance) pairs, lower is closer like Chroma's scores.
+        """
+        embedding = self.embedding_function.embed_query(query)
+        return [(self._result(row), 1 - score) for row, score in self.top_k(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k, filter)
+
+
+def make_vector_store(embedding_function, persist_directory='../chroma_db'):
+    """
+    Vector store picked by the VECTOR_BACKEND environment variable.
+    """
+    if os.getenv("VECTOR_BACKEND", "chroma") == "numpy":
+        return NumpyVectorIndex(os.getenv("VECTOR_INDEX_DIR", VECTOR_INDEX_DIR), embedding_function)
+    from langchain_chroma import Chroma
+    return Chroma(persist_directory=persist_directory, embedding_function=embedding_function)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a Chroma collection to a numpy vector index")
+    parser.add_argument("--chroma", default='../chroma_db', help="Chroma persist directory")
+    parser.add_argument("--out", default=VECTOR_INDEX_DIR, help="index directory to write")
+    args = parser.parse_args()
+    export_chroma(args.chroma, args.out)
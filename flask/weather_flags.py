@@ -0,0 +1,192 @@
+"""
+Precomputed "is this place weather dependent?" flags for every landmark.
+
+The landmark set is fixed, so instead of asking gpt-4o-mini each time a user
+locks a location, every landmark is classified once by the build step below
+and the app just looks the answer up by name. The name rules are only a
+fallback, for places that are not in the table (or every place, until the
+table is built); the ones they can't settle go to the LLM, and their answers
+are remembered too.
+
+The app builds the table in the background on first start when it's missing
+(WEATHER_FLAGS_BUILD=0 to skip). Build (or rebuild) it by hand from the flask folder:
+    python weather_flags.py
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from landmarks import SAVES_DIR, load_landmarks, normalize_name
+
+WEATHER_FLAGS_PATH = os.path.join(SAVES_DIR, 'weather_dependence.json')
+
+# 🔹 Words in a landmark name that settle the question without asking the LLM
+OUTDOOR_WORDS = {
+    "beach", "playa", "balneario", "forest", "bosque", "reserve", "reserva", "refuge", "refugio",
+    "island", "isla", "islet", "cayo", "lake", "lago", "laguna", "lagoon", "river", "rio", "bay", "bahia",
+    "punta", "cerro", "mountain", "peak", "trail", "falls", "salto", "cascada", "garden", "jardin",
+    "lighthouse", "light", "faro", "bridge", "puente", "plaza", "fort", "fortin", "reef",
+}
+INDOOR_WORDS = {
+    "museum", "museo", "church", "iglesia", "cathedral", "catedral", "chapel", "capilla", "school",
+    "escuela", "academy", "academia", "university", "universidad", "college", "colegio", "theater",
+    "theatre", "teatro", "library", "biblioteca", "hospital", "hotel", "casino", "building", "edificio",
+    "hall", "archive", "archivo", "residence", "house", "casa", "courthouse", "club",
+}
+
+BATCH_SIZE = 40
+# A build lock older than this is left over from a crashed build
+STALE_BUILD_SECONDS = 3600
+
+
+def rule_based_flag(name):
+    """
+    True/False if the landmark name alone says it's outdoor/indoor, None if unsure.
+    """
+    words = set(re.findall(r"\w+", normalize_name(name)))
+    outdoor = bool(words & OUTDOOR_WORDS)
+    indoor = bool(words & INDOOR_WORDS)
+    if outdoor != indoor:
+        return outdoor
+    return None
+
+
+class WeatherFlags:
+    """
+    O(1) lookup of the weather-dependence flag by place name.
+
+    Parameters:
+    path (str): JSON file written by build_weather_flags. If it doesn't exist
+        yet the table starts empty and every place is "unknown".
+    """
+
+    def __init__(self, path=WEATHER_FLAGS_PATH):
+        self.path = path
+        self.flags = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.flags = json.load(f)
+
+    def build_in_background(self, client):
+        """
+        Build the missing table in a daemon thread and use it once it's written.
+        A lock file next to the table keeps other workers from building it too.
+
+        Returns:
+        threading.Thread or None (table already there, or another worker is building it).
+        """
+        if os.path.exists(self.path):
+            return None
+        lock_path = self.path + ".building"
+        try:
+            if time.time() - os.path.getmtime(lock_path) > STALE_BUILD_SECONDS:
+                os.remove(lock_path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return None
+
+        def run():
+            try:
+                self.flags.update(build_weather_flags(client, self.path))
+            except Exception as error:
+                print(f"weather flags build failed: {error}")
+            finally:
+                os.remove(lock_path)
+
+        thread = threading.Thread(target=run, name="weather-flags-build", daemon=True)
+        thread.start()
+        return thread
+
+    def get(self, name):
+        """
+        The flag for this place: from the table, else from the name rules
+        (so the app works before the table is built), or None if it's unknown.
+        """
+        flag = self.flags.get(normalize_name(name))
+        return flag if flag is not None else rule_based_flag(name)
+
+    def remember(self, name, weather_dependent):
+        """
+        Memoize the answer for a place that wasn't in the table.
+        """
+        self.flags[normalize_name(name)] = bool(weather_dependent)
+
+
+def classify_with_gpt(client, landmarks):
+    """
+    Ask gpt-4o-mini about a batch of landmarks in one request.
+
+    Returns:
+    dict: normalized landmark name -> bool
+    """
+    places = [
+        {"name": landmark["name"], "municipality": landmark["municipality"], "description": landmark["description"][:300]}
+        for landmark in landmarks
+    ]
+    prompt = f"""For each place below, decide if visiting it is highly dependent on weather conditions
+    (e.g., outdoor activities, beach, hiking). For example, El Morro is weather dependent, a museum is not.
+    Return a JSON object with the key 'results', mapping each place name (exactly as given) to true or false.
+
+    Places: {json.dumps(places, ensure_ascii=False)}"""
+
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{
+            'role': 'user',
+            'content': prompt
+            }],
+        response_format={
+            "type": "json_object"
+            },
+        max_tokens=40 * len(landmarks),
+        temperature=0
+    )
+    results = json.loads(response.choices[0].message.content)['results']
+    return {normalize_name(name): bool(flag) for name, flag in results.items()}
+
+
+def build_weather_flags(client, path=WEATHER_FLAGS_PATH):
+    """
+    Classify every landmark once (name rules first, then batched GPT calls for
+    the rest) and write the lookup table to `path`.
+    """
+    flags = {}
+    unsure = []
+    for landmark in load_landmarks():
+        flag = rule_based_flag(landmark["name"])
+        if flag is None:
+            unsure.append(landmark)
+        else:
+            flags[normalize_name(landmark["name"])] = flag
+    print(f"{len(flags)} landmarks decided by name, {len(unsure)} sent to GPT")
+
+    for i in range(0, len(unsure), BATCH_SIZE):
+        batch = unsure[i:i + BATCH_SIZE]
+        answers = classify_with_gpt(client, batch)
+        for landmark in batch:
+            key = normalize_name(landmark["name"])
+            # Default to True if the model skipped one: a needless weather check is cheaper than a missing one
+            flags[key] = answers.get(key, True)
+        print(f"classified {min(i + BATCH_SIZE, len(unsure))}/{len(unsure)}")
+
+    # Written to a temporary file and renamed, so a reader never sees half a table
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(dict(sorted(flags.items())), f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    print(f"Saved {len(flags)} flags to {path}")
+    return flags
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from openai import OpenAI
+
+    load_dotenv('../.env')
+    build_weather_flags(OpenAI(api_key=os.getenv("OPENAI_API_KEY")))
@@ -0,0 +1,222 @@
+"""
+Shared OpenWeather forecast service.
+
+find_weather_forecast opens a new connection for every call, downloads the
+whole 5-day / 40-slot forecast and keeps only the first 3-hour slot of the
+requested date. This service instead:
+- reuses pooled HTTP connections,
+- fetches each municipality at most once per refresh window, for all sessions,
+- keeps the full forecast in memory, indexed by date,
+- answers with a daily aggregate (min, max, dominant condition) for the date,
+- can warm all 78 municipalities in one concurrent sweep, in the background.
+
+daily() returns the same shape as find_weather_forecast, so it's a drop-in
+replacement for get_weather / check_weather.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from landmarks import load_municipalities, normalize_name
+from telemetry import span
+
+# OPENWEATHER_FORECAST_URL can point the app at a local stand-in (see benchmarks/mock_api_server.py)
+OPENWEATHER_FORECAST_URL = os.getenv("OPENWEATHER_FORECAST_URL", "https://api.openweathermap.org/data/2.5/forecast")
+
+
+def to_fahrenheit(celsius):
+    return (celsius * 9/5) + 32
+
+
+def index_by_date(data):
+    """
+    Group the 3-hour slots of an OpenWeather forecast response by date (YYYY-MM-DD).
+    """
+    by_date = defaultdict(list)
+    for slot in data['list']:
+        by_date[slot['dt_txt'][:10]].append(slot)
+    return dict(by_date)
+
+
+def daily_aggregate(slots):
+    """
+    Summarize the 3-hour slots of one day: mean/min/max temperature, mean
+    humidity and the most frequent weather description.
+    """
+    temps = [slot['main']['temp'] for slot in slots]
+    conditions = Counter(slot['weather'][0]['description'] for slot in slots)
+    return {
+        'temp': {'value': to_fahrenheit(sum(temps) / len(temps)), 'unit': '°F'},
+        'feels_like': {'value': to_fahrenheit(sum(slot['main']['feels_like'] for slot in slots) / len(slots)), 'unit': '°F'},
+        'temp_min': {'value': to_fahrenheit(min(slot['main']['temp_min'] for slot in slots)), 'unit': '°F'},
+        'temp_max': {'value': to_fahrenheit(max(slot['main']['temp_max'] for slot in slots)), 'unit': '°F'},
+        'pressure': {'value': sum(slot['main']['pressure'] for slot in slots) / len(slots), 'unit': 'hPa'},
+        'humidity': {'value': sum(slot['main']['humidity'] for slot in slots) / len(slots), 'unit': '%'},
+        'weather': conditions.most_common(1)[0][0],
+        'slots': len(slots),
+    }
+
+
+class ForecastService:
+    """
+    Pooled, cached OpenWeather forecast client shared by every session.
+
+    Parameters:
+    api_key (str): OpenWeather API key.
+    refresh_seconds (float): How long a municipality's forecast is reused before refetching.
+    base_url (str): Forecast endpoint (point it at a local stub for tests/benchmarks).
+    pool_size (int): Max pooled connections (and prefetch threads).
+    """
+
+    def __init__(self, api_key, refresh_seconds=3 * 3600, base_url=OPENWEATHER_FORECAST_URL, pool_size=16, timeout=10):
+        self.api_key = api_key
+        self.refresh_seconds = refresh_seconds
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+        # Municipality coordinates, so "Ponce" doesn't resolve to some other Ponce
+        self.coordinates = {
+            normalize_name(m["name"]): (m["latitude"], m["longitude"]) for m in load_municipalities()
+        }
+        self._forecasts = {}  # key -> (fetched_at, {date: [slots]})
+        self._locks = defaultdict(threading.Lock)  # one fetch per municipality at a time
+        self._locks_lock = threading.Lock()
+        self._inflight = {}  # key -> asyncio.Task, for the async path
+        self.fetches = 0
+
+    def _params(self, key, location):
+        params = {'appid': self.api_key, 'units': 'metric', 'cnt': '40'}
+        if key in self.coordinates:
+            params['lat'], params['lon'] = self.coordinates[key]
+        else:
+            params['q'] = location
+        return params
+
+    def _fresh(self, key):
+        cached = self._forecasts.get(key)
+        if cached and time.monotonic() - cached[0] < self.refresh_seconds:
+            return cached[1]
+        return None
+
+    def _store(self, key, data):
+        by_date = index_by_date(data)
+        self._forecasts[key] = (time.monotonic(), by_date)
+        self.fetches += 1
+        return by_date
+
+    def forecast(self, location, force=False):
+        """
+        The full forecast for a municipality, indexed by date. Fetched at most
+        once per refresh window (unless force=True); concurrent callers wait
+        for the same fetch. Returns None if the API call fails.
+        """
+        key = normalize_name(location)
+        by_date = None if force else self._fresh(key)
+        if by_date is not None:
+            return by_date
+
+        with self._locks_lock:
+            lock = self._locks[key]
+        with lock:
+            if not force:
+                by_date = self._fresh(key)  # someone else may have fetched it while we waited
+                if by_date is not None:
+                    return by_date
+            try:
+                with span("weather_fetch", function="forecast", location=key):
+                    response = self.http.get(self.base_url, params=self._params(key, location), timeout=self.timeout)
+            except requests.RequestException:
+                return None
+            if response.status_code != 200:
+                return None
+            return self._store(key, response.json())
+
+    async def forecast_async(self, location, http_client):
+        """
+        Async version of forecast(), using the caller's httpx.AsyncClient.
+        Shares the same cache as the sync path.
+        """
+        key = normalize_name(location)
+        by_date = self._fresh(key)
+        if by_date is not None:
+            return by_date
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_async(key, location, http_client))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await task
+
+    async def _fetch_async(self, key, location, http_client):
+        try:
+            with span("weather_fetch", function="forecast_async", location=key):
+                response = await http_client.get(self.base_url, params=self._params(key, location), timeout=self.timeout)
+        except Exception:
+            return None
+        if response.status_code != 200:
+            return None
+        return self._store(key, response.json())
+
+    @staticmethod
+    def _daily(by_date, date):
+        if by_date is None:
+            return "Error fetching data from OpenWeather API."
+        slots = by_date.get(str(date)[:10])
+        if not slots:
+            return "No forecast available for this date."
+        return daily_aggregate(slots)
+
+    def daily(self, location, date):
+        """
+        Daily aggregate for `location` on `date` (YYYY-MM-DD), or the same error
+        strings as find_weather_forecast.
+        """
+        return self._daily(self.forecast(location), date)
+
+    async def daily_async(self, location, date, http_client):
+        return self._daily(await self.forecast_async(location, http_client), date)
+
+    def prefetch_all(self, locations=None, force=False):
+        """
+        Warm the cache for every municipality (all 78 by default) in one
+        concurrent sweep over the connection pool. force=True refetches even
+        the ones that are still fresh.
+
+        Returns:
+        int: Number of municipalities with a forecast in the cache.
+        """
+        if locations is None:
+            locations = [m["name"] for m in load_municipalities()]
+        with ThreadPoolExecutor(max_workers=self.pool_size) as pool:
+            results = list(pool.map(lambda location: self.forecast(location, force=force), locations))
+        return sum(result is not None for result in results)
+
+    def start_background_prefetch(self, interval=None):
+        """
+        Re-warm every municipality every `interval` seconds (default: the
+        refresh window) on a daemon thread.
+        """
+        interval = interval or self.refresh_seconds
+
+        def loop():
+            while True:
+                warmed = self.prefetch_all(force=True)
+                print(f"weather prefetch: {warmed} municipalities warmed")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name="weather-prefetch", daemon=True)
+        thread.start()
+        return thread